@@ -0,0 +1,162 @@
+import os
+import io
+import json
+import base64
+import hashlib
+import threading
+from typing import Callable, Dict, Tuple
+
+import requests
+from PIL import Image, ImageFilter
+
+# Shared image cache for vision tasks (lesson7 maps, lesson16 photos)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.image_cache')
+
+# Output variants per purpose: size limits, format and optional region-of-interest crop
+VARIANTS = {
+    # Small preview for quick yes/no questions and quality triage
+    "triage": {"max_side": 512, "min_side": None, "format": "JPEG", "quality": 70, "crop": False},
+    # Cropped to the detailed region for person descriptions
+    "description": {"max_side": 1024, "min_side": None, "format": "JPEG", "quality": 85, "crop": True},
+    # Maps keep PNG for legible street names; 768 px short side is what the API uses for detail=high anyway
+    "map": {"max_side": 2048, "min_side": 768, "format": "PNG", "quality": None, "crop": False},
+}
+
+
+class ImagePreprocessor:
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.url_index_path = os.path.join(self.cache_dir, 'url_index.json')
+        self.memo_path = os.path.join(self.cache_dir, 'vision_memo.json')
+        self.url_index = self._load_json(self.url_index_path)
+        self.memo = self._load_json(self.memo_path)
+
+    @staticmethod
+    def _load_json(path: str) -> Dict:
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_json(self, path: str, data: Dict):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def _blob_path(self, digest: str, suffix: str = 'bin') -> str:
+        return os.path.join(self.cache_dir, f"{digest}.{suffix}")
+
+    def _store(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        return digest
+
+    def fetch(self, url: str) -> Tuple[bytes, str]:
+        """Download an image once; later calls with the same URL read it from the cache"""
+        with self.lock:
+            digest = self.url_index.get(url)
+        if digest and os.path.exists(self._blob_path(digest)):
+            with open(self._blob_path(digest), 'rb') as f:
+                return f.read(), digest
+
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        data = response.content
+        digest = self._store(data)
+        with self.lock:
+            self.url_index[url] = digest
+            self._save_json(self.url_index_path, self.url_index)
+        return data, digest
+
+    def load_file(self, path: str) -> Tuple[bytes, str]:
+        """Read a local image and return it with its content hash"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        return data, hashlib.sha256(data).hexdigest()
+
+    def load(self, source: str) -> Tuple[bytes, str]:
+        if source.startswith(('http://', 'https://')):
+            return self.fetch(source)
+        return self.load_file(source)
+
+    @staticmethod
+    def crop_to_roi(image: Image.Image, margin: float = 0.05) -> Image.Image:
+        """Crop away flat borders, keeping the region with visible edges (the subject)"""
+        edges = image.convert('L').filter(ImageFilter.FIND_EDGES).point(lambda v: 255 if v > 40 else 0)
+        # The filter marks the 1 px frame of the image as edges, skip it
+        bbox = edges.crop((1, 1, image.width - 1, image.height - 1)).getbbox()
+        if not bbox:
+            return image
+
+        left, top, right, bottom = (bbox[0] + 1, bbox[1] + 1, bbox[2] + 1, bbox[3] + 1)
+        pad_x = int(image.width * margin)
+        pad_y = int(image.height * margin)
+        bbox = (max(left - pad_x, 0), max(top - pad_y, 0),
+                min(right + pad_x, image.width), min(bottom + pad_y, image.height))
+        return image.crop(bbox)
+
+    def variant(self, source: str, purpose: str) -> Tuple[bytes, str, str]:
+        """Return (image bytes, mime type, content hash of the original) resized for the given purpose"""
+        spec = VARIANTS[purpose]
+        data, digest = self.load(source)
+        extension = 'jpg' if spec["format"] == 'JPEG' else 'png'
+        mime = f"image/{'jpeg' if spec['format'] == 'JPEG' else 'png'}"
+        variant_path = self._blob_path(f"{digest}_{purpose}", extension)
+
+        if os.path.exists(variant_path):
+            with open(variant_path, 'rb') as f:
+                return f.read(), mime, digest
+
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert('RGB') if spec["format"] == 'JPEG' else image.copy()
+            if spec["crop"]:
+                image = self.crop_to_roi(image)
+
+            scale = spec["max_side"] / max(image.size)
+            if spec["min_side"]:
+                scale = min(scale, spec["min_side"] / min(image.size))
+            if scale < 1:
+                image = image.resize((max(int(image.width * scale), 1), max(int(image.height * scale), 1)),
+                                     Image.LANCZOS)
+
+            output = io.BytesIO()
+            if spec["format"] == 'JPEG':
+                image.save(output, 'JPEG', quality=spec["quality"], optimize=True)
+            else:
+                image.save(output, 'PNG', optimize=True)
+
+        variant_data = output.getvalue()
+        with open(variant_path, 'wb') as f:
+            f.write(variant_data)
+        return variant_data, mime, digest
+
+    def data_url(self, source: str, purpose: str) -> Tuple[str, str]:
+        """Return (data: URL of the resized image, content hash of the original)"""
+        variant_data, mime, digest = self.variant(source, purpose)
+        return f"data:{mime};base64,{base64.b64encode(variant_data).decode('utf-8')}", digest
+
+    def memoize(self, key_parts, compute: Callable):
+        """Return a stored vision result for these image hashes/prompt, or compute and store it"""
+        key = hashlib.sha256("\n".join(key_parts).encode('utf-8')).hexdigest()
+        with self.lock:
+            if key in self.memo:
+                return self.memo[key]
+
+        result = compute()
+        if result is not None:
+            with self.lock:
+                self.memo[key] = result
+                self._save_json(self.memo_path, self.memo)
+        return result
+
+
+def prompt_key(*texts: str) -> str:
+    """Short hash of a prompt (and model name) to include in memo keys"""
+    return hashlib.sha256("\n".join(texts).encode('utf-8')).hexdigest()[:16]
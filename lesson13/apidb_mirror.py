@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Lokalne lustro bazy apidb - Lesson 13
+Pobiera tabele z /apidb stronicowanymi zapytaniami do lokalnego pliku SQLite,
+tak żeby wygenerowane zapytania SQL można było wykonywać lokalnie.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import time
+
+# Mapowanie typów MySQL na typy SQLite (według prefiksu nazwy typu)
+MYSQL_TYPE_MAP = [
+    (("tinyint", "smallint", "mediumint", "bigint", "int", "integer", "bit", "bool", "boolean", "year"), "INTEGER"),
+    (("decimal", "numeric", "float", "double", "real"), "REAL"),
+    (("blob", "tinyblob", "mediumblob", "longblob", "binary", "varbinary"), "BLOB"),
+]
+
+META_TABLE = "_mirror_meta"
+
+COLUMN_PATTERN = re.compile(r"`(\w+)`\s+(\w+(?:\([^)]*\))?)(.*)")
+
+
+def extract_create_statement(schema_reply):
+    """Wyciąga tekst CREATE TABLE z odpowiedzi na SHOW CREATE TABLE"""
+    if isinstance(schema_reply, str):
+        return schema_reply
+    if isinstance(schema_reply, dict):
+        for key, value in schema_reply.items():
+            if 'create' in key.lower():
+                return value
+        return None
+    if isinstance(schema_reply, list):
+        for row in schema_reply:
+            statement = extract_create_statement(row)
+            if statement:
+                return statement
+    return None
+
+
+def mysql_type_to_sqlite(mysql_type):
+    """Zamienia typ kolumny MySQL na typ SQLite"""
+    base_type = mysql_type.lower().split('(')[0].strip()
+    for prefixes, sqlite_type in MYSQL_TYPE_MAP:
+        if base_type in prefixes:
+            return sqlite_type
+    # char, varchar, text, enum, set, json, date, datetime, timestamp...
+    return "TEXT"
+
+
+def table_columns(create_statement):
+    """Lista (nazwa_kolumny, typ_mysql) z CREATE TABLE"""
+    header = re.match(r"\s*CREATE\s+TABLE\s+`?\w+`?\s*\(", create_statement, re.IGNORECASE)
+    if not header:
+        return []
+    body = create_statement[header.end():create_statement.rfind(')')]
+    columns = []
+    for line in body.split('\n'):
+        column_match = COLUMN_PATTERN.match(line.strip().rstrip(','))
+        if column_match:
+            columns.append((column_match.group(1), column_match.group(2)))
+    return columns
+
+
+def sql_literal(value, mysql_type):
+    """Wartość klucza jako literał SQL - liczba dla kolumn liczbowych, inaczej tekst z escapowaniem"""
+    if mysql_type_to_sqlite(mysql_type) in ("INTEGER", "REAL"):
+        if isinstance(value, (int, float)):
+            return str(value)
+        try:
+            return str(int(value))
+        except (TypeError, ValueError):
+            return repr(float(value))
+    text = str(value).replace('\\', '\\\\').replace("'", "\\'")
+    return f"'{text}'"
+
+
+def parenthesized(text, start):
+    """Zawartość nawiasu otwartego na pozycji start, z zagnieżdżonymi nawiasami, np. `kolumna`(10)"""
+    depth = 0
+    for position in range(start, len(text)):
+        if text[position] == '(':
+            depth += 1
+        elif text[position] == ')':
+            depth -= 1
+            if depth == 0:
+                return text[start + 1:position]
+    raise ValueError(f"Niezamknięty nawias: {text[start:start + 80]}")
+
+
+def key_columns(key_definition):
+    """
+    Kolumny z listy klucza bez długości prefiksu i kierunku sortowania:
+    "`access_level`(10), `is_active` DESC" -> ['access_level', 'is_active'].
+    None dla indeksów na wyrażeniach, których SQLite nie odtworzy.
+    """
+    key_definition = re.sub(r"\(\s*\d+\s*\)", "", key_definition)
+    if '(' in key_definition:
+        return None
+    return [re.match(r"\s*`?(\w+)`?", part).group(1) for part in key_definition.split(',')]
+
+
+def translate_create_table(create_statement):
+    """
+    Tłumaczy CREATE TABLE z MySQL na SQLite.
+    Zwraca (ddl_tabeli, lista_ddl_indeksów, kolumny_klucza_głównego)
+    """
+    header = re.match(r"\s*CREATE\s+TABLE\s+`?(\w+)`?\s*\(", create_statement, re.IGNORECASE)
+    if not header:
+        raise ValueError(f"Nie rozpoznano CREATE TABLE: {create_statement[:80]}")
+    table_name = header.group(1)
+
+    body = create_statement[header.end():create_statement.rfind(')')]
+
+    columns = []
+    primary_key = []
+    indexes = []
+
+    for line in body.split('\n'):
+        line = line.strip().rstrip(',')
+        if not line:
+            continue
+
+        column_match = COLUMN_PATTERN.match(line)
+        if column_match:
+            column_name, column_type, rest = column_match.groups()
+            definition = f'"{column_name}" {mysql_type_to_sqlite(column_type)}'
+            if re.search(r"\bNOT NULL\b", rest, re.IGNORECASE):
+                definition += " NOT NULL"
+            columns.append(definition)
+            continue
+
+        pk_match = re.match(r"PRIMARY KEY\s*(?=\()", line, re.IGNORECASE)
+        if pk_match:
+            primary_key = key_columns(parenthesized(line, pk_match.end())) or []
+            continue
+
+        index_match = re.match(r"(UNIQUE\s+)?(?:KEY|INDEX)\s+`?(\w+)`?\s*(?=\()", line, re.IGNORECASE)
+        if index_match:
+            unique, index_name = index_match.groups()
+            columns_list = key_columns(parenthesized(line, index_match.end()))
+            if not columns_list:
+                continue
+            index_columns = ", ".join(f'"{c}"' for c in columns_list)
+            indexes.append(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS '
+                f'"{table_name}_{index_name}" ON "{table_name}" ({index_columns})'
+            )
+        # CONSTRAINT / FOREIGN KEY pomijamy - lustro jest tylko do odczytu
+
+    if primary_key:
+        columns.append("PRIMARY KEY (" + ", ".join(f'"{c}"' for c in primary_key) + ")")
+
+    table_ddl = f'CREATE TABLE "{table_name}" (\n  ' + ",\n  ".join(columns) + "\n)"
+    return table_ddl, indexes, primary_key
+
+
+class ApiDbMirror:
+    def __init__(self, execute_query, db_path=None, page_size=500):
+        """
+        execute_query - funkcja wykonująca zapytanie na zdalnej bazie (np. DatabaseTaskSolver.execute_db_query)
+        db_path - ścieżka do lokalnego pliku SQLite
+        page_size - liczba wierszy pobieranych jednym zapytaniem
+        """
+        self.execute_query = execute_query
+        self.db_path = db_path or os.path.join(os.path.dirname(__file__), 'apidb_mirror.sqlite')
+        self.page_size = page_size
+        # Czy baza pozwala na sumę kontrolną zawartości (None - jeszcze nie sprawdzono)
+        self.content_checksum_supported = None
+
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {META_TABLE} (
+                table_name TEXT PRIMARY KEY,
+                ddl_hash TEXT,
+                signature TEXT,
+                row_count INTEGER,
+                synced_at REAL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def _remote_rows(self, query):
+        """Wykonuje zapytanie zdalnie i zwraca listę wierszy (lub None przy błędzie)"""
+        result = self.execute_query(query)
+        if not result or 'reply' not in result or result['reply'] is None:
+            return None
+        return result['reply']
+
+    def _remote_signature(self, table_name, primary_key, columns):
+        """
+        Sygnatura zawartości tabeli: liczba wierszy, maksymalny klucz i suma kontrolna wszystkich kolumn,
+        więc wykrywa też UPDATE (np. zmianę is_active), a nie tylko dodane/usunięte wiersze.
+        Zwraca (sygnatura, liczba_wierszy); sygnatura None oznacza pełną synchronizację.
+        """
+        aggregates = ["COUNT(*) AS row_count"]
+        if len(primary_key) == 1:
+            aggregates.append(f"MAX(`{primary_key[0]}`) AS max_key")
+
+        if columns and self.content_checksum_supported is not False:
+            # NULL zapisany jawnie, żeby NULL i pusty tekst dawały różne sumy
+            row_text = ", ".join(f"IFNULL(`{name}`, '\\N')" for name, _ in columns)
+            query = (f"SELECT {', '.join(aggregates)}, SUM(CRC32(CONCAT_WS('|', {row_text}))) AS checksum "
+                     f"FROM `{table_name}`")
+            rows = self._remote_rows(query)
+            if rows:
+                self.content_checksum_supported = True
+                return self._signature_from_row(rows[0])
+            print(f"Suma kontrolna zawartości niedostępna dla {table_name}, próbuję CHECKSUM TABLE")
+
+        rows = self._remote_rows(f"SELECT {', '.join(aggregates)} FROM `{table_name}`")
+        if not rows:
+            return None, None
+        signature, row_count = self._signature_from_row(rows[0])
+
+        checksum = None
+        if self.content_checksum_supported is not False:
+            checksum = self._checksum_value(self._remote_rows(f"CHECKSUM TABLE `{table_name}`"))
+        if checksum is None:
+            # Bez składnika zależnego od treści zmiany wierszy są niewidoczne - zawsze pełna synchronizacja
+            self.content_checksum_supported = False
+            print(f"Brak sumy kontrolnej dla {table_name} - pełna synchronizacja")
+            return None, row_count
+        return json.dumps([signature, checksum], default=str), row_count
+
+    @staticmethod
+    def _signature_from_row(row):
+        values = list(row.values()) if isinstance(row, dict) else list(row)
+        return json.dumps(values, sort_keys=True, default=str), int(values[0])
+
+    @staticmethod
+    def _checksum_value(rows):
+        """Wartość z odpowiedzi CHECKSUM TABLE (kolumna Checksum) lub None"""
+        for row in rows or []:
+            if isinstance(row, dict):
+                for key, value in row.items():
+                    if key.lower() == 'checksum' and value is not None:
+                        return str(value)
+        return None
+
+    def _stored_meta(self, table_name):
+        return self.connection.execute(
+            f"SELECT ddl_hash, signature FROM {META_TABLE} WHERE table_name = ?", (table_name,)
+        ).fetchone()
+
+    def _fetch_pages(self, table_name, primary_key, column_types):
+        """Generator stron wierszy tabeli - po kluczu głównym jeśli to możliwe, inaczej LIMIT/OFFSET"""
+        keyset_column = primary_key[0] if len(primary_key) == 1 else None
+        last_key = None
+        offset = 0
+
+        while True:
+            if keyset_column:
+                where = ""
+                if last_key is not None:
+                    literal = sql_literal(last_key, column_types.get(keyset_column, "text"))
+                    where = f" WHERE `{keyset_column}` > {literal}"
+                query = (f"SELECT * FROM `{table_name}`{where} "
+                         f"ORDER BY `{keyset_column}` LIMIT {self.page_size}")
+            else:
+                query = f"SELECT * FROM `{table_name}` LIMIT {self.page_size} OFFSET {offset}"
+
+            rows = self._remote_rows(query)
+            if rows is None:
+                raise RuntimeError(f"Nie udało się pobrać strony tabeli {table_name}")
+            if not rows:
+                return
+
+            yield rows
+
+            if len(rows) < self.page_size:
+                return
+            if keyset_column:
+                last_key = rows[-1][keyset_column]
+            offset += len(rows)
+
+    def _sync_table(self, table_name, create_statement, signature):
+        """Odtwarza tabelę w lustrze na podstawie zdalnego DDL i danych"""
+        table_ddl, index_ddls, primary_key = translate_create_table(create_statement)
+
+        cursor = self.connection.cursor()
+        cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        cursor.execute(table_ddl)
+        for index_ddl in index_ddls:
+            cursor.execute(index_ddl)
+
+        row_count = 0
+        column_types = dict(table_columns(create_statement))
+        for rows in self._fetch_pages(table_name, primary_key, column_types):
+            columns = list(rows[0].keys())
+            placeholders = ", ".join("?" for _ in columns)
+            column_list = ", ".join(f'"{c}"' for c in columns)
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO "{table_name}" ({column_list}) VALUES ({placeholders})',
+                [tuple(row.get(c) for c in columns) for row in rows]
+            )
+            row_count += len(rows)
+
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {META_TABLE} (table_name, ddl_hash, signature, row_count, synced_at) "
+            f"VALUES (?, ?, ?, ?, ?)",
+            (table_name, hashlib.sha256(create_statement.encode('utf-8')).hexdigest(),
+             signature, row_count, time.time())
+        )
+        self.connection.commit()
+        return row_count
+
+    def sync(self, table_schemas, force=False):
+        """
+        Synchronizuje lustro z bazą zdalną.
+        table_schemas - słownik {tabela: odpowiedź SHOW CREATE TABLE}
+        Pobierane są tylko tabele, których DDL lub sygnatura zawartości się zmieniły.
+        """
+        print("\n=== SYNCHRONIZACJA LOKALNEGO LUSTRA BAZY ===")
+        start_time = time.time()
+        refreshed = []
+
+        for table_name, schema_reply in table_schemas.items():
+            create_statement = extract_create_statement(schema_reply)
+            if not create_statement:
+                print(f"Pomijam tabelę {table_name} - brak CREATE TABLE")
+                continue
+
+            _, _, primary_key = translate_create_table(create_statement)
+            signature, remote_count = self._remote_signature(table_name, primary_key,
+                                                             table_columns(create_statement))
+            ddl_hash = hashlib.sha256(create_statement.encode('utf-8')).hexdigest()
+
+            stored = self._stored_meta(table_name)
+            if (not force and stored and signature is not None
+                    and stored['ddl_hash'] == ddl_hash and stored['signature'] == signature):
+                print(f"Tabela {table_name} bez zmian ({remote_count} wierszy) - pomijam")
+                continue
+
+            row_count = self._sync_table(table_name, create_statement, signature)
+            refreshed.append(table_name)
+            print(f"✅ Zsynchronizowano tabelę {table_name}: {row_count} wierszy")
+
+        print(f"Synchronizacja zakończona w {time.time() - start_time:.2f}s, odświeżone tabele: {refreshed}")
+        return refreshed
+
+    def execute_local_query(self, query):
+        """Wykonuje zapytanie na lokalnym lustrze, zwraca wynik w formacie odpowiedzi /apidb"""
+        try:
+            rows = self.connection.execute(query).fetchall()
+            return {"reply": [dict(row) for row in rows], "error": "OK"}
+        except sqlite3.Error as e:
+            print(f"Błąd lokalnego zapytania: {e}")
+            return None
+
+    def explain(self, query):
+        """Zwraca opisy kroków planu zapytania (EXPLAIN QUERY PLAN) lub None przy błędzie"""
+        try:
+            rows = self.connection.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+            return [row['detail'] for row in rows]
+        except sqlite3.Error as e:
+            print(f"Błąd EXPLAIN na lustrze: {e}")
+            return None
+
+    def table_row_count(self, table_name):
+        """Liczba wierszy tabeli zapisana przy ostatniej synchronizacji"""
+        row = self.connection.execute(
+            f"SELECT row_count FROM {META_TABLE} WHERE table_name = ?", (table_name,)
+        ).fetchone()
+        return row['row_count'] if row else 0
+
+    @staticmethod
+    def _normalize_rows(result):
+        """Sprowadza wiersze do porównywalnej postaci (wartości jako tekst, bez kolejności)"""
+        normalized = []
+        for row in result.get('reply') or []:
+            values = row.values() if isinstance(row, dict) else row
+            normalized.append(tuple(str(v) for v in values))
+        return sorted(normalized)
+
+    def cross_check(self, query, local_result=None):
+        """Porównuje wynik lokalny z wynikiem z bazy zdalnej"""
+        print("\n=== WERYFIKACJA WYNIKU Z BAZĄ ZDALNĄ ===")
+        local_result = local_result or self.execute_local_query(query)
+        remote_result = self.execute_query(query)
+
+        if not local_result or not remote_result:
+            print("❌ Nie udało się wykonać zapytania lokalnie lub zdalnie")
+            return False
+
+        matches = self._normalize_rows(local_result) == self._normalize_rows(remote_result)
+        if matches:
+            print("✅ Wynik lokalny zgodny z bazą zdalną")
+        else:
+            print("❌ Wynik lokalny różni się od bazy zdalnej - warto wymusić pełną synchronizację")
+        return matches
+
+    def close(self):
+        self.connection.close()
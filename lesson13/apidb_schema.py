@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Odkrywanie schematu bazy apidb - Lesson 13
+Równoległe pobieranie SHOW CREATE TABLE, cache schematu na dysku
+i zwięzłe podsumowanie schematu dla promptów LLM.
+"""
+
+import os
+import re
+import json
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apidb_mirror import extract_create_statement
+
+# Wersja formatu cache - starsze wpisy miały odcisk liczony tylko z listy tabel
+CACHE_VERSION = 2
+# Licznik AUTO_INCREMENT zmienia się przy każdym INSERT i nie jest zmianą schematu
+AUTO_INCREMENT_PATTERN = re.compile(r"\s*AUTO_INCREMENT=\d+", re.IGNORECASE)
+
+
+def parse_table_name(row):
+    """Wyciąga nazwę tabeli z wiersza odpowiedzi SHOW TABLES"""
+    if isinstance(row, dict):
+        return list(row.values())[0]
+    if isinstance(row, list):
+        return row[0]
+    return str(row)
+
+
+def summarize_create_table(table_name, create_statement):
+    """
+    Zamienia CREATE TABLE na jedną linię w stylu:
+    users(id int PK, username varchar, is_active int)
+    """
+    columns = re.findall(r"^\s*`(\w+)`\s+(\w+)", create_statement, re.MULTILINE)
+    pk_match = re.search(r"PRIMARY KEY\s*\(([^)]*)\)", create_statement, re.IGNORECASE)
+    primary_key = set(re.findall(r"`?(\w+)`?", pk_match.group(1))) if pk_match else set()
+
+    parts = []
+    for column_name, column_type in columns:
+        part = f"{column_name} {column_type.lower()}"
+        if column_name in primary_key:
+            part += " PK"
+        parts.append(part)
+    return f"{table_name}({', '.join(parts)})"
+
+
+class SchemaIntrospector:
+    def __init__(self, execute_query, cache_path=None, max_workers=8, cache_ttl=24 * 3600):
+        """
+        execute_query - funkcja wykonująca zapytanie na bazie zdalnej
+        cache_path - plik JSON z zapamiętanymi schematami
+        max_workers - liczba równoległych zapytań SHOW CREATE TABLE
+        cache_ttl - po ilu sekundach schemat z cache trzeba porównać z bazą
+        """
+        self.execute_query = execute_query
+        self.cache_path = cache_path or os.path.join(os.path.dirname(__file__), 'apidb_schema_cache.json')
+        self.max_workers = max_workers
+        self.cache_ttl = cache_ttl
+        self.fingerprint = None
+
+    @staticmethod
+    def compute_fingerprint(table_schemas):
+        """
+        Odcisk schematu z treści DDL wszystkich tabel - zmienia się przy dodaniu, usunięciu
+        lub zmianie typu kolumny, a nie tylko przy zmianie listy tabel
+        """
+        digest = hashlib.sha256()
+        for table_name in sorted(table_schemas):
+            create_statement = extract_create_statement(table_schemas[table_name])
+            if create_statement is None:
+                create_statement = json.dumps(table_schemas[table_name], sort_keys=True, ensure_ascii=False)
+            digest.update(f"{table_name}\n{AUTO_INCREMENT_PATTERN.sub('', create_statement)}\n".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def _load_cache(self):
+        empty = {"version": CACHE_VERSION, "latest": None, "entries": {}}
+        if not os.path.exists(self.cache_path):
+            return empty
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Nie udało się odczytać cache schematu: {e}")
+            return empty
+        if cache.get("version") != CACHE_VERSION:
+            print("Cache schematu w starym formacie - pobieram schemat od nowa")
+            return empty
+        return cache
+
+    def _save_cache(self, cache):
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"Nie udało się zapisać cache schematu: {e}")
+
+    def list_tables(self):
+        """Pobiera listę tabel (SHOW TABLES)"""
+        tables_result = self.execute_query("SHOW TABLES")
+        if not tables_result or 'reply' not in tables_result:
+            print("Błąd: Nie udało się pobrać listy tabel")
+            return None
+        return [parse_table_name(row) for row in tables_result['reply']]
+
+    def _fetch_create_table(self, table):
+        schema_result = self.execute_query(f"SHOW CREATE TABLE {table}")
+        if schema_result and 'reply' in schema_result:
+            return table, schema_result['reply']
+        print(f"Błąd: Nie udało się pobrać struktury tabeli {table}")
+        return table, None
+
+    def fetch_schemas(self, tables):
+        """Pobiera DDL wszystkich tabel równolegle"""
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(tables), 1))) as executor:
+            results = executor.map(self._fetch_create_table, tables)
+        return {table: schema for table, schema in results if schema is not None}
+
+    def discover(self, refresh=False):
+        """
+        Zwraca słownik {tabela: odpowiedź SHOW CREATE TABLE}.
+        Świeży cache - zero zapytań; po upływie cache_ttl lub przy refresh=True - równoległe pobranie
+        DDL wszystkich tabel i porównanie odcisku treści DDL z zapamiętanym schematem.
+        """
+        cache = self._load_cache()
+        latest = cache["entries"].get(cache.get("latest")) if cache.get("latest") else None
+
+        if latest and not refresh and time.time() - latest["fetched_at"] < self.cache_ttl:
+            self.fingerprint = cache["latest"]
+            print(f"Schemat z cache ({len(latest['schemas'])} tabel, odcisk {self.fingerprint})")
+            return latest["schemas"]
+
+        tables = self.list_tables()
+        if tables is None:
+            return None
+        print(f"Znalezione tabele: {tables}")
+
+        start_time = time.time()
+        schemas = self.fetch_schemas(tables)
+        print(f"Pobrano strukturę {len(schemas)} tabel w {time.time() - start_time:.2f}s")
+        if len(schemas) != len(tables):
+            # Niepełnego schematu nie zapisujemy i nie używamy z nim cache zapytań
+            self.fingerprint = None
+            return schemas
+
+        fingerprint = self.compute_fingerprint(schemas)
+        entry = cache["entries"].get(fingerprint)
+        if entry:
+            print(f"Schemat bez zmian (odcisk {fingerprint})")
+            entry["fetched_at"] = time.time()
+        else:
+            if latest:
+                print(f"Schemat zmienił się (odcisk {cache['latest']} -> {fingerprint})")
+            entry = {"tables": tables, "schemas": schemas, "fetched_at": time.time()}
+            cache["entries"][fingerprint] = entry
+
+        cache["latest"] = fingerprint
+        self._save_cache(cache)
+        self.fingerprint = fingerprint
+        return schemas
+
+    @staticmethod
+    def summarize(table_schemas):
+        """Zwięzłe podsumowanie schematu - jedna linia na tabelę"""
+        lines = []
+        for table_name, schema_reply in table_schemas.items():
+            create_statement = extract_create_statement(schema_reply)
+            if create_statement:
+                lines.append(summarize_create_table(table_name, create_statement))
+            else:
+                lines.append(f"{table_name}: {json.dumps(schema_reply, ensure_ascii=False)}")
+        return "\n".join(lines)
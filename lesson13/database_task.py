@@ -7,15 +7,29 @@ Zadanie: Znajdź DC_ID aktywnych datacenter, których menadżerowie są nieaktyw
 import os
 import sys
 import json
+import argparse
 import requests
 from dotenv import load_dotenv
 from openai import OpenAI
+from apidb_mirror import ApiDbMirror
+from apidb_schema import SchemaIntrospector
+from sql_plan_cache import QueryPlanCache, strip_sql_markdown, validate_sql, estimate_query_cost, DEFAULT_MAX_COST
 
 # Ładowanie zmiennych środowiskowych
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
+# Treść zadania dla LLM - razem z odciskiem schematu jest kluczem cache zapytań
+TASK_DESCRIPTION = """Zadanie: Napisz zapytanie SQL, które zwróci DC_ID aktywnych datacenter, których menadżerowie (z tabeli users) są nieaktywni.
+
+Wskazówki:
+- Datacenter jest aktywny, jeśli ma odpowiedni status (prawdopodobnie is_active = 1 lub podobne pole)
+- Menadżer jest nieaktywny, jeśli ma odpowiedni status w tabeli users (prawdopodobnie is_active = 0 lub podobne pole)
+- Musisz połączyć tabele przez odpowiednie klucze obce (prawdopodobnie manager_id w tabeli datacenter odpowiada id w tabeli users)
+"""
+
 class DatabaseTaskSolver:
-    def __init__(self):
+    def __init__(self, use_mirror=False, cross_check=False, mirror_path=None, refresh_schema=False,
+                 use_query_cache=True, max_query_cost=DEFAULT_MAX_COST):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         self.centrala_api_key = os.getenv('CENTRALA_API_KEY')
         
@@ -28,7 +42,20 @@ class DatabaseTaskSolver:
         self.db_api_url = "https://c3ntrala.ag3nts.org/apidb"
         self.centrala_url = "https://c3ntrala.ag3nts.org/report"
         
-    def execute_db_query(self, query):
+        # Schemat bazy - równoległe pobieranie i cache na dysku
+        self.schema = SchemaIntrospector(self.execute_paged_query)
+        self.refresh_schema = refresh_schema
+        
+        # Cache wygenerowanych zapytań i próg kosztu (EXPLAIN na lustrze)
+        self.query_cache = QueryPlanCache() if use_query_cache else None
+        self.max_query_cost = max_query_cost
+        
+        # Lokalne lustro bazy (SQLite) - zapytania wykonywane lokalnie
+        self.use_mirror = use_mirror
+        self.cross_check = cross_check
+        self.mirror = ApiDbMirror(self.execute_paged_query, db_path=mirror_path) if use_mirror else None
+        
+    def execute_db_query(self, query, verbose=True):
         """Wykonuje zapytanie SQL przez API bazy danych"""
         payload = {
             "task": "database",
@@ -42,71 +69,57 @@ class DatabaseTaskSolver:
             response = requests.post(self.db_api_url, json=payload)
             response.raise_for_status()
             result = response.json()
-            print(f"Odpowiedź z bazy: {json.dumps(result, indent=2)}")
+            if verbose:
+                print(f"Odpowiedź z bazy: {json.dumps(result, indent=2)}")
             return result
         except requests.exceptions.RequestException as e:
             print(f"Błąd podczas wykonywania zapytania: {e}")
             return None
     
+    def execute_paged_query(self, query):
+        """Wykonuje zapytanie bez wypisywania całej odpowiedzi (strony danych lustra)"""
+        return self.execute_db_query(query, verbose=False)
+    
+    def run_query(self, sql_query):
+        """Wykonuje wygenerowane zapytanie - lokalnie na lustrze lub zdalnie"""
+        if not self.mirror:
+            return self.execute_db_query(sql_query)
+        
+        print(f"Wykonuję zapytanie lokalnie: {sql_query}")
+        query_result = self.mirror.execute_local_query(sql_query)
+        if query_result is None:
+            print("Zapytanie nie działa lokalnie - wykonuję je na bazie zdalnej")
+            return self.execute_db_query(sql_query)
+        
+        print(f"Odpowiedź z lustra: {json.dumps(query_result, indent=2)}")
+        if self.cross_check:
+            self.mirror.cross_check(sql_query, query_result)
+        return query_result
+    
     def discover_database_structure(self):
         """Odkrywa strukturę bazy danych"""
         print("=== ODKRYWANIE STRUKTURY BAZY DANYCH ===")
         
-        # 1. Pobierz listę tabel
-        print("\n1. Pobieranie listy tabel...")
-        tables_result = self.execute_db_query("SHOW TABLES")
-        
-        if not tables_result or 'reply' not in tables_result:
-            print("Błąd: Nie udało się pobrać listy tabel")
+        table_schemas = self.schema.discover(refresh=self.refresh_schema)
+        if not table_schemas:
+            print("Błąd: Nie udało się pobrać struktury tabel")
             return None
         
-        tables = []
-        for row in tables_result['reply']:
-            if isinstance(row, dict):
-                # Znajdź pierwszą wartość w słowniku (nazwa tabeli)
-                table_name = list(row.values())[0]
-                tables.append(table_name)
-            elif isinstance(row, list):
-                tables.append(row[0])
-            else:
-                tables.append(str(row))
-        
-        print(f"Znalezione tabele: {tables}")
-        
-        # 2. Pobierz strukturę każdej tabeli
-        table_schemas = {}
-        for table in tables:
-            print(f"\n2. Pobieranie struktury tabeli: {table}")
-            schema_result = self.execute_db_query(f"SHOW CREATE TABLE {table}")
-            
-            if schema_result and 'reply' in schema_result:
-                table_schemas[table] = schema_result['reply']
-            else:
-                print(f"Błąd: Nie udało się pobrać struktury tabeli {table}")
-        
         return table_schemas
     
     def generate_sql_query(self, table_schemas):
         """Używa LLM do wygenerowania zapytania SQL"""
         print("\n=== GENEROWANIE ZAPYTANIA SQL ===")
         
-        # Przygotuj prompt dla LLM
-        schemas_text = ""
-        for table_name, schema in table_schemas.items():
-            schemas_text += f"\nTabela: {table_name}\n"
-            schemas_text += f"Struktura: {json.dumps(schema, indent=2)}\n"
+        # Przygotuj prompt dla LLM - zwięzły schemat, jedna linia na tabelę
+        schemas_text = self.schema.summarize(table_schemas)
         
         prompt = f"""
 Masz dostęp do następujących tabel w bazie danych:
 
 {schemas_text}
 
-Zadanie: Napisz zapytanie SQL, które zwróci DC_ID aktywnych datacenter, których menadżerowie (z tabeli users) są nieaktywni.
-
-Wskazówki:
-- Datacenter jest aktywny, jeśli ma odpowiedni status (prawdopodobnie is_active = 1 lub podobne pole)
-- Menadżer jest nieaktywny, jeśli ma odpowiedni status w tabeli users (prawdopodobnie is_active = 0 lub podobne pole)
-- Musisz połączyć tabele przez odpowiednie klucze obce (prawdopodobnie manager_id w tabeli datacenter odpowiada id w tabeli users)
+{TASK_DESCRIPTION}
 
 BARDZO WAŻNE: Zwróć TYLKO surowy tekst zapytania SQL, bez żadnych dodatkowych opisów, wyjaśnień czy formatowania Markdown. Nie dodawaj żadnych komentarzy ani dodatkowego tekstu.
 """
@@ -121,17 +134,8 @@ BARDZO WAŻNE: Zwróć TYLKO surowy tekst zapytania SQL, bez żadnych dodatkowyc
                 temperature=0
             )
             
-            sql_query = response.choices[0].message.content.strip()
-            
             # Usuń ewentualne formatowanie markdown
-            if sql_query.startswith("```sql"):
-                sql_query = sql_query[6:]
-            if sql_query.startswith("```"):
-                sql_query = sql_query[3:]
-            if sql_query.endswith("```"):
-                sql_query = sql_query[:-3]
-            
-            sql_query = sql_query.strip()
+            sql_query = strip_sql_markdown(response.choices[0].message.content)
             
             print(f"Wygenerowane zapytanie SQL: {sql_query}")
             return sql_query
@@ -140,6 +144,43 @@ BARDZO WAŻNE: Zwróć TYLKO surowy tekst zapytania SQL, bez żadnych dodatkowyc
             print(f"Błąd podczas generowania zapytania SQL: {e}")
             return None
     
+    def check_sql_query(self, sql_query, table_schemas):
+        """Waliduje zapytanie lokalnie i (jeśli jest lustro) sprawdza jego koszt przez EXPLAIN"""
+        is_valid, error = validate_sql(sql_query, known_tables=table_schemas.keys())
+        if not is_valid:
+            print(f"❌ Zapytanie odrzucone przez walidator: {error}")
+            return False
+        
+        if self.mirror:
+            cost, scanned = estimate_query_cost(self.mirror, sql_query)
+            if cost is None:
+                print(f"Nie udało się oszacować kosztu zapytania: {scanned}")
+            elif cost > self.max_query_cost:
+                print(f"❌ Zapytanie zbyt kosztowne: ~{cost} wierszy (pełne skany: {scanned})")
+                return False
+            else:
+                print(f"Szacowany koszt zapytania: ~{cost} wierszy (pełne skany: {scanned})")
+        
+        return True
+    
+    def get_sql_query(self, table_schemas):
+        """Zwraca zapytanie z cache lub generuje nowe przez LLM i waliduje je przed użyciem"""
+        fingerprint = self.schema.fingerprint
+        
+        if self.query_cache and fingerprint:
+            cached_query = self.query_cache.get(TASK_DESCRIPTION, fingerprint)
+            if cached_query and self.check_sql_query(cached_query, table_schemas):
+                print(f"Zapytanie SQL z cache: {cached_query}")
+                return cached_query
+        
+        sql_query = self.generate_sql_query(table_schemas)
+        if not sql_query or not self.check_sql_query(sql_query, table_schemas):
+            return None
+        
+        if self.query_cache and fingerprint:
+            self.query_cache.put(TASK_DESCRIPTION, fingerprint, sql_query)
+        return sql_query
+    
     def extract_dc_ids(self, query_result):
         """Wyodrębnia listę DC_ID z wyniku zapytania"""
         if not query_result or 'reply' not in query_result:
@@ -197,15 +238,23 @@ BARDZO WAŻNE: Zwróć TYLKO surowy tekst zapytania SQL, bez żadnych dodatkowyc
             print("Błąd: Nie udało się odkryć struktury bazy danych")
             return False
         
+        # 1a. Zsynchronizuj lokalne lustro (tylko zmienione tabele)
+        if self.mirror:
+            try:
+                self.mirror.sync(table_schemas)
+            except Exception as e:
+                print(f"Błąd synchronizacji lustra, używam bazy zdalnej: {e}")
+                self.mirror = None
+        
         # 2. Wygeneruj zapytanie SQL
-        sql_query = self.generate_sql_query(table_schemas)
+        sql_query = self.get_sql_query(table_schemas)
         if not sql_query:
             print("Błąd: Nie udało się wygenerować zapytania SQL")
             return False
         
         # 3. Wykonaj zapytanie SQL
         print(f"\n=== WYKONYWANIE ZAPYTANIA SQL ===")
-        query_result = self.execute_db_query(sql_query)
+        query_result = self.run_query(sql_query)
         if not query_result:
             print("Błąd: Nie udało się wykonać zapytania SQL")
             return False
@@ -226,8 +275,24 @@ BARDZO WAŻNE: Zwróć TYLKO surowy tekst zapytania SQL, bez żadnych dodatkowyc
             return False
 
 def main():
+    parser = argparse.ArgumentParser(description='Zadanie database - DC_ID aktywnych datacenter z nieaktywnymi menadżerami')
+    parser.add_argument('--mirror', action='store_true', help='synchronizuj bazę do lokalnego SQLite i wykonuj zapytania lokalnie')
+    parser.add_argument('--cross-check', action='store_true', help='porównaj wynik lokalny z bazą zdalną')
+    parser.add_argument('--mirror-path', help='ścieżka do pliku SQLite lustra')
+    parser.add_argument('--refresh-schema', action='store_true', help='pomiń cache schematu i pobierz strukturę tabel od nowa')
+    parser.add_argument('--no-query-cache', action='store_true', help='zawsze generuj zapytanie SQL przez LLM')
+    parser.add_argument('--max-query-cost', type=int, default=DEFAULT_MAX_COST, help='maksymalny szacowany koszt zapytania (wiersze)')
+    args = parser.parse_args()
+    
     try:
-        solver = DatabaseTaskSolver()
+        solver = DatabaseTaskSolver(
+            use_mirror=args.mirror,
+            cross_check=args.cross_check,
+            mirror_path=args.mirror_path,
+            refresh_schema=args.refresh_schema,
+            use_query_cache=not args.no_query_cache,
+            max_query_cost=args.max_query_cost
+        )
         success = solver.solve()
         
         if success:
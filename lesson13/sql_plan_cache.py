@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Cache i walidacja zapytań SQL generowanych przez LLM - Lesson 13
+Zapytania są zapamiętywane według (treść zadania, odcisk schematu),
+sprawdzane lokalnym parserem i szacowane przez EXPLAIN na lokalnym lustrze.
+"""
+
+import os
+import re
+import json
+import hashlib
+import time
+
+# Instrukcje, które nie mogą być główną instrukcją zapytania tylko do odczytu.
+# Sprawdzane jest tylko słowo rozpoczynające instrukcję (po WITH - po definicjach CTE),
+# więc funkcje o tej samej nazwie (REPLACE()) i takie identyfikatory są dozwolone.
+FORBIDDEN_KEYWORDS = (
+    "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "TRUNCATE",
+    "REPLACE", "GRANT", "REVOKE", "RENAME", "LOCK", "CALL", "LOAD", "HANDLER",
+)
+
+# Słowa, które mogą wystąpić zaraz po nazwie tabeli zamiast aliasu
+SQL_CLAUSE_KEYWORDS = (
+    "ON", "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "CROSS", "NATURAL", "FULL", "OUTER",
+    "GROUP", "ORDER", "LIMIT", "HAVING", "USING", "UNION",
+)
+
+# Domyślny próg szacowanej liczby odczytanych wierszy
+DEFAULT_MAX_COST = 1_000_000
+
+
+def strip_sql_markdown(text):
+    """Usuwa formatowanie Markdown (```sql ... ```) z odpowiedzi LLM"""
+    text = text.strip()
+    fence = re.search(r"```(?:sql|mysql)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    if fence:
+        text = fence.group(1)
+    return text.strip()
+
+
+def _strip_literals(query):
+    """Zastępuje literały tekstowe i identyfikatory w cudzysłowach, żeby nie mylić ich ze słowami kluczowymi"""
+    return re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"", "''", query)
+
+
+def _top_level_words(statement):
+    """Słowa instrukcji poza nawiasami (bez podzapytań, treści CTE i argumentów funkcji)"""
+    words = []
+    depth = 0
+    for token in re.findall(r"`[^`]*`|\w+|[()]", statement):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            words.append(token.upper())
+    return words
+
+
+def _main_statement_keyword(words):
+    """Słowo rozpoczynające właściwą instrukcję: pierwsze słowo albo pierwsza instrukcja po definicjach WITH"""
+    if not words or words[0] != "WITH":
+        return words[0] if words else None
+    for word in words[1:]:
+        if word == "SELECT" or word in FORBIDDEN_KEYWORDS:
+            return word
+    return None
+
+
+def validate_sql(query, known_tables=None):
+    """
+    Sprawdza wygenerowane zapytanie bez wysyłania go do bazy.
+    Zwraca (czy_poprawne, opis_błędu).
+    """
+    if not query:
+        return False, "puste zapytanie"
+
+    # Niedomknięty cudzysłów psuje całe dalsze sprawdzanie
+    for quote in ("'", '"', "`"):
+        if query.count(quote) % 2:
+            return False, f"niedomknięty znak {quote}"
+
+    bare = _strip_literals(query)
+
+    if bare.count("(") != bare.count(")"):
+        return False, "niezbalansowane nawiasy"
+
+    statements = [s for s in bare.split(";") if s.strip()]
+    if len(statements) != 1:
+        return False, "zapytanie musi zawierać dokładnie jedną instrukcję"
+
+    statement = statements[0].strip()
+    words = _top_level_words(statement)
+    keyword = _main_statement_keyword(words)
+    if keyword in FORBIDDEN_KEYWORDS:
+        return False, f"niedozwolona instrukcja {keyword}"
+    if keyword != "SELECT":
+        return False, "dozwolone są tylko zapytania SELECT"
+
+    # SELECT ... INTO OUTFILE/DUMPFILE zapisuje plik na serwerze
+    if "INTO" in words:
+        return False, "niedozwolone SELECT ... INTO"
+
+    if known_tables is not None:
+        known = {t.lower() for t in known_tables}
+        # Nazwy CTE z WITH też są poprawnymi źródłami danych
+        if keyword == "SELECT" and words[0] == "WITH":
+            known.update(name.lower() for name in re.findall(r"`?(\w+)`?\s+AS\s*\(", statement, re.IGNORECASE))
+        referenced = re.findall(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", statement, re.IGNORECASE)
+        unknown = [t for t in referenced if t.lower() not in known]
+        if unknown:
+            return False, f"nieznane tabele: {unknown}"
+
+    return True, None
+
+
+def estimate_query_cost(mirror, query):
+    """
+    Szacuje koszt zapytania na podstawie EXPLAIN QUERY PLAN lokalnego lustra.
+    Pełne skany mnożą się (pętle zagnieżdżone), wyszukiwania po indeksie są pomijane.
+    Zwraca (koszt, lista_skanowanych_tabel) lub (None, opis_błędu).
+    """
+    plan = mirror.explain(query)
+    if plan is None:
+        return None, "lustro nie potrafi wykonać EXPLAIN dla tego zapytania"
+
+    # EXPLAIN podaje aliasy tabel, więc trzeba je zamienić na nazwy tabel
+    aliases = {}
+    for table_name, alias in re.findall(r"\b(?:FROM|JOIN)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(\w+)`?)?",
+                                        _strip_literals(query), re.IGNORECASE):
+        aliases[table_name] = table_name
+        if alias and alias.upper() not in SQL_CLAUSE_KEYWORDS:
+            aliases[alias] = table_name
+
+    cost = 1
+    scanned = []
+    for detail in plan:
+        scan = re.match(r"SCAN (?:TABLE )?(\w+)", detail)
+        if scan and "COVERING INDEX" not in detail:
+            table_name = aliases.get(scan.group(1), scan.group(1))
+            scanned.append(table_name)
+            cost *= max(mirror.table_row_count(table_name), 1)
+    return cost, scanned
+
+
+class QueryPlanCache:
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or os.path.join(os.path.dirname(__file__), 'sql_plan_cache.json')
+        self.entries = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Nie udało się odczytać cache zapytań: {e}")
+            return {}
+
+    @staticmethod
+    def make_key(task_text, schema_fingerprint):
+        return hashlib.sha256(f"{schema_fingerprint}\n{task_text}".encode('utf-8')).hexdigest()
+
+    def get(self, task_text, schema_fingerprint):
+        entry = self.entries.get(self.make_key(task_text, schema_fingerprint))
+        return entry["query"] if entry else None
+
+    def put(self, task_text, schema_fingerprint, query):
+        self.entries[self.make_key(task_text, schema_fingerprint)] = {
+            "query": query,
+            "schema_fingerprint": schema_fingerprint,
+            "created_at": time.time()
+        }
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            print(f"Nie udało się zapisać cache zapytań: {e}")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Testy tłumaczenia CREATE TABLE z MySQL na SQLite - Lesson 13
+
+Uruchomienie:
+    python -m pytest test_apidb_mirror.py
+"""
+
+import sqlite3
+
+from apidb_mirror import translate_create_table, key_columns
+
+USERS_DDL = """CREATE TABLE `users` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `username` varchar(20) DEFAULT NULL,
+  `access_level` varchar(20) DEFAULT 'user',
+  `is_active` int(11) DEFAULT 1,
+  `lastlog` date DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `username` (`username`(10)),
+  KEY `k` (`access_level`(10), `is_active`),
+  KEY `active_desc` (`is_active` DESC, `lastlog`)
+) ENGINE=InnoDB AUTO_INCREMENT=98 DEFAULT CHARSET=utf8mb4"""
+
+
+def test_key_columns_strip_prefix_lengths_and_order():
+    assert key_columns("`access_level`(10), `is_active`") == ['access_level', 'is_active']
+    assert key_columns("`is_active` DESC,`lastlog`") == ['is_active', 'lastlog']
+    assert key_columns("(lower(`username`))") is None
+
+
+def test_prefix_and_multi_column_indexes():
+    table_ddl, indexes, primary_key = translate_create_table(USERS_DDL)
+
+    assert primary_key == ['id']
+    assert indexes == [
+        'CREATE UNIQUE INDEX IF NOT EXISTS "users_username" ON "users" ("username")',
+        'CREATE INDEX IF NOT EXISTS "users_k" ON "users" ("access_level", "is_active")',
+        'CREATE INDEX IF NOT EXISTS "users_active_desc" ON "users" ("is_active", "lastlog")',
+    ]
+
+    # Wygenerowany DDL musi dać się wykonać w SQLite
+    db = sqlite3.connect(':memory:')
+    db.execute(table_ddl)
+    for index_ddl in indexes:
+        db.execute(index_ddl)
+    index_columns = [row[2] for row in db.execute("PRAGMA index_info('users_k')")]
+    assert index_columns == ['access_level', 'is_active']
+
+
+def test_composite_primary_key_with_prefix():
+    _, _, primary_key = translate_create_table(
+        "CREATE TABLE `tags` (\n  `name` varchar(200) NOT NULL,\n  `kind` int(11) NOT NULL,\n"
+        "  PRIMARY KEY (`name`(50),`kind`)\n) ENGINE=InnoDB"
+    )
+    assert primary_key == ['name', 'kind']
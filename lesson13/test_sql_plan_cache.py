@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Testy walidacji zapytań SQL - Lesson 13
+
+Uruchomienie:
+    python -m pytest test_sql_plan_cache.py
+"""
+
+from sql_plan_cache import validate_sql
+
+TABLES = ["users", "datacenters", "connections"]
+
+
+def test_read_only_queries_with_keyword_like_names_are_valid():
+    for query in (
+        "SELECT REPLACE(username, 'a', 'b') FROM users",
+        "SELECT dc_id FROM datacenters WHERE is_active = 1 AND manager IN (SELECT id FROM users WHERE is_active = 0)",
+        "SELECT load_level, `update` FROM datacenters",
+        "WITH active AS (SELECT id FROM users WHERE is_active = 1) SELECT dc_id FROM datacenters JOIN active ON manager = active.id",
+        "SELECT 'DELETE FROM users' AS note FROM users",
+    ):
+        assert validate_sql(query, TABLES) == (True, None), query
+
+
+def test_write_statements_are_rejected():
+    for query, error in (
+        ("DELETE FROM users", "niedozwolona instrukcja DELETE"),
+        ("REPLACE INTO users VALUES (1, 'x')", "niedozwolona instrukcja REPLACE"),
+        ("WITH old AS (SELECT id FROM users) DELETE FROM users", "niedozwolona instrukcja DELETE"),
+        ("SELECT 1 FROM users; DROP TABLE users", "zapytanie musi zawierać dokładnie jedną instrukcję"),
+        ("SELECT * FROM users INTO OUTFILE '/tmp/users'", "niedozwolone SELECT ... INTO"),
+        ("SHOW TABLES", "dozwolone są tylko zapytania SELECT"),
+    ):
+        assert validate_sql(query, TABLES) == (False, error), query
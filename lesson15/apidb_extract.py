@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Apidb Extract - Lesson 15
+Stronicowane, równoległe pobieranie tabel z /apidb prosto do plików NDJSON
+z możliwością wznowienia od ostatniego punktu kontrolnego.
+"""
+
+import os
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PagedExtractor:
+    def __init__(self, execute_query, page_size=1000, max_workers=4):
+        """
+        execute_query - funkcja wykonująca zapytanie na /apidb i zwracająca odpowiedź JSON
+        page_size - szerokość zakresu klucza pobieranego jednym zapytaniem
+        max_workers - liczba stron pobieranych równolegle
+        """
+        self.execute_query = execute_query
+        self.page_size = page_size
+        self.max_workers = max_workers
+
+    def key_bounds(self, table, key_column):
+        """Zwraca (min, max) kolumny klucza lub (None, None) dla pustej tabeli"""
+        result = self.execute_query(f"SELECT MIN({key_column}) AS lo, MAX({key_column}) AS hi FROM {table}")
+        if not result or not result.get('reply'):
+            raise RuntimeError(f"Nie udało się pobrać zakresu klucza tabeli {table}")
+        row = result['reply'][0]
+        lo, hi = (row['lo'], row['hi']) if isinstance(row, dict) else (row[0], row[1])
+        if lo is None or hi is None:
+            return None, None
+        return int(lo), int(hi)
+
+    def fetch_range(self, table, key_column, columns, start, end):
+        """Pobiera wiersze z zakresu klucza [start, end)"""
+        query = (f"SELECT {columns} FROM {table} "
+                 f"WHERE {key_column} >= {start} AND {key_column} < {end} ORDER BY {key_column}")
+        result = self.execute_query(query)
+        if not result or 'reply' not in result or result['reply'] is None:
+            raise RuntimeError(f"Nie udało się pobrać zakresu {start}-{end} tabeli {table}")
+        return result['reply']
+
+    @staticmethod
+    def checkpoint_path(output_path):
+        return output_path + '.checkpoint'
+
+    def load_checkpoint(self, output_path, table):
+        path = self.checkpoint_path(output_path)
+        if not os.path.exists(path) or not os.path.exists(output_path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        return checkpoint if checkpoint.get('table') == table else None
+
+    def save_checkpoint(self, output_path, table, next_key, rows, output_size):
+        with open(self.checkpoint_path(output_path), 'w', encoding='utf-8') as f:
+            json.dump({"table": table, "next_key": next_key, "rows": rows, "output_size": output_size}, f)
+
+    def extract(self, table, key_column, columns, output_path, row_parser=None):
+        """
+        Pobiera tabelę do pliku NDJSON (jeden wiersz JSON na linię).
+        Strony są pobierane równolegle, ale zapisywane w kolejności klucza,
+        a po każdej stronie zapisywany jest punkt kontrolny.
+        Zwraca liczbę zapisanych wierszy (0 dla pustej tabeli).
+        """
+        start_time = time.time()
+        lo, hi = self.key_bounds(table, key_column)
+
+        checkpoint = self.load_checkpoint(output_path, table)
+        if checkpoint:
+            next_key = checkpoint['next_key']
+            rows_written = checkpoint['rows']
+            # Odcinamy ewentualnie niedopisaną końcówkę pliku
+            with open(output_path, 'ab') as f:
+                f.truncate(checkpoint['output_size'])
+            print(f"Wznawiam pobieranie {table} od klucza {next_key} ({rows_written} wierszy już zapisanych)")
+            mode = 'ab'
+        else:
+            next_key = lo
+            rows_written = 0
+            mode = 'wb'
+
+        if lo is None:
+            # Pusta tabela (także gdy opróżniono ją od przerwanego pobierania) - punkt kontrolny jest nieaktualny
+            open(output_path, 'wb').close()
+            if checkpoint:
+                os.remove(self.checkpoint_path(output_path))
+            print(f"✅ Tabela {table} jest pusta")
+            return 0
+
+        range_starts = iter(range(next_key, hi + 1, self.page_size))
+
+        with open(output_path, mode) as f, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = deque()
+            while True:
+                # Utrzymujemy ograniczoną liczbę stron w locie, żeby pamięć nie rosła z rozmiarem tabeli
+                for start in range_starts:
+                    end = min(start + self.page_size, hi + 1)
+                    in_flight.append((end, executor.submit(self.fetch_range, table, key_column, columns, start, end)))
+                    if len(in_flight) >= self.max_workers * 2:
+                        break
+                if not in_flight:
+                    break
+
+                end, future = in_flight.popleft()
+                for row in future.result():
+                    if row_parser:
+                        row = row_parser(row)
+                        if row is None:
+                            continue
+                    f.write((json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8'))
+                    rows_written += 1
+                f.flush()
+                self.save_checkpoint(output_path, table, end, rows_written, f.tell())
+
+        os.remove(self.checkpoint_path(output_path))
+        elapsed = time.time() - start_time
+        print(f"✅ Pobrano {rows_written} wierszy z {table} do {os.path.basename(output_path)} w {elapsed:.2f}s")
+        return rows_written
+
+
+def read_ndjson(path):
+    """Czyta plik NDJSON wiersz po wierszu"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
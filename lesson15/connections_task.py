@@ -10,8 +10,17 @@ import json
 import requests
 from dotenv import load_dotenv
 from openai import OpenAI
-from neo4j import GraphDatabase
 import time
+import re
+import hashlib
+from graph_engine import InMemoryGraph, normalize_name
+from apidb_extract import PagedExtractor, read_ndjson
+
+try:
+    from neo4j import GraphDatabase
+except ImportError:
+    # Bez sterownika Neo4j zadanie rozwiązywane jest silnikiem w pamięci
+    GraphDatabase = None
 
 # Ładowanie zmiennych środowiskowych
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
@@ -23,6 +32,15 @@ class ConnectionsTaskSolver:
         self.neo4j_uri = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
         self.neo4j_user = os.getenv('NEO4J_USER', 'neo4j')
         self.neo4j_password = os.getenv('NEO4J_PASSWORD', 'neo4j')
+        self.batch_size = int(os.getenv('NEO4J_BATCH_SIZE', '10000'))
+        # Synchronizacja z Neo4j: incremental (tylko różnice względem migawki) lub full
+        self.sync_mode = os.getenv('NEO4J_SYNC_MODE', 'incremental')
+        self.snapshot_file = os.path.join(os.path.dirname(__file__), 'neo4j_snapshot.json')
+        # APIDB_REFRESH=1 - pobiera tabele z MySQL od nowa zamiast czytać pliki lokalne
+        self.refresh_data = os.getenv('APIDB_REFRESH', '') not in ('', '0')
+        # Silnik grafu: auto (lokalny dla małych grafów lub bez Neo4j), neo4j, local
+        self.graph_engine = os.getenv('GRAPH_ENGINE', 'auto')
+        self.local_graph_max_edges = int(os.getenv('LOCAL_GRAPH_MAX_EDGES', '100000'))
         
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
@@ -36,8 +54,24 @@ class ConnectionsTaskSolver:
         # Neo4j connection
         self.neo4j_driver = None
         
+        # Dane pobierane stronami do NDJSON (starsze pliki JSON są nadal czytane)
+        data_dir = os.path.dirname(__file__)
+        self.users_file = os.path.join(data_dir, 'users_data.ndjson')
+        self.connections_file = os.path.join(data_dir, 'connections_data.ndjson')
+        self.legacy_users_file = os.path.join(data_dir, 'users_data.json')
+        self.legacy_connections_file = os.path.join(data_dir, 'connections_data.json')
+        self.extractor = PagedExtractor(
+            lambda query: self.execute_db_query(query, verbose=False),
+            page_size=int(os.getenv('APIDB_PAGE_SIZE', '1000')),
+            max_workers=int(os.getenv('APIDB_WORKERS', '4'))
+        )
+        
     def connect_to_neo4j(self):
         """Łączy się z bazą Neo4j"""
+        if GraphDatabase is None:
+            print("❌ Brak pakietu neo4j - zainstaluj go: pip install neo4j")
+            return False
+        
         try:
             self.neo4j_driver = GraphDatabase.driver(
                 self.neo4j_uri, 
@@ -53,7 +87,7 @@ class ConnectionsTaskSolver:
             print("Upewnij się, że Neo4j jest uruchomiony i dane logowania są poprawne")
             return False
     
-    def execute_db_query(self, query):
+    def execute_db_query(self, query, verbose=True):
         """Wykonuje zapytanie SQL przez API bazy danych"""
         payload = {
             "task": "database",
@@ -67,111 +101,117 @@ class ConnectionsTaskSolver:
             response = requests.post(self.db_api_url, json=payload)
             response.raise_for_status()
             result = response.json()
-            print(f"Odpowiedź z bazy: {json.dumps(result, indent=2)}")
+            if verbose:
+                print(f"Odpowiedź z bazy: {json.dumps(result, indent=2)}")
             return result
         except requests.exceptions.RequestException as e:
             print(f"Błąd podczas wykonywania zapytania: {e}")
             return None
     
+    @staticmethod
+    def parse_user_row(row):
+        """Zamienia wiersz tabeli users na {"id", "username"} (None dla niepełnego wiersza)"""
+        if isinstance(row, dict):
+            user_id = None
+            username = None
+            for key, value in row.items():
+                if 'id' in key.lower():
+                    user_id = int(value)
+                elif 'username' in key.lower() or 'name' in key.lower():
+                    username = str(value)
+            
+            if user_id is not None and username:
+                return {"id": user_id, "username": username}
+        elif isinstance(row, list) and len(row) >= 2:
+            return {"id": int(row[0]), "username": str(row[1])}
+        return None
+    
+    @staticmethod
+    def parse_connection_row(row):
+        """Zamienia wiersz tabeli connections na {"user1_id", "user2_id"} (None dla niepełnego wiersza)"""
+        if isinstance(row, dict):
+            user1_id = None
+            user2_id = None
+            for key, value in row.items():
+                if 'user1' in key.lower():
+                    user1_id = int(value)
+                elif 'user2' in key.lower():
+                    user2_id = int(value)
+            
+            if user1_id is not None and user2_id is not None:
+                return {"user1_id": user1_id, "user2_id": user2_id}
+        elif isinstance(row, list) and len(row) >= 2:
+            return {"user1_id": int(row[0]), "user2_id": int(row[1])}
+        return None
+    
     def fetch_users_data(self):
-        """Pobiera dane użytkowników z bazy MySQL"""
+        """Pobiera dane użytkowników z bazy MySQL stronami prosto do pliku NDJSON"""
         print("\n=== POBIERANIE DANYCH UŻYTKOWNIKÓW ===")
         
-        query = "SELECT id, username FROM users"
-        result = self.execute_db_query(query)
-        
-        if not result or 'reply' not in result:
-            print("Błąd: Nie udało się pobrać danych użytkowników")
+        try:
+            return self.extractor.extract('users', 'id', 'id, username', self.users_file, self.parse_user_row)
+        except Exception as e:
+            print(f"Błąd: Nie udało się pobrać danych użytkowników: {e}")
             return None
-        
-        users = []
-        for row in result['reply']:
-            if isinstance(row, dict):
-                user_id = None
-                username = None
-                for key, value in row.items():
-                    if 'id' in key.lower():
-                        user_id = int(value)
-                    elif 'username' in key.lower() or 'name' in key.lower():
-                        username = str(value)
-                
-                if user_id is not None and username:
-                    users.append({"id": user_id, "username": username})
-            elif isinstance(row, list) and len(row) >= 2:
-                users.append({"id": int(row[0]), "username": str(row[1])})
-        
-        print(f"Pobrano {len(users)} użytkowników")
-        return users
     
     def fetch_connections_data(self):
-        """Pobiera dane połączeń z bazy MySQL"""
+        """Pobiera dane połączeń z bazy MySQL stronami prosto do pliku NDJSON"""
         print("\n=== POBIERANIE DANYCH POŁĄCZEŃ ===")
         
-        query = "SELECT user1_id, user2_id FROM connections"
-        result = self.execute_db_query(query)
-        
-        if not result or 'reply' not in result:
-            print("Błąd: Nie udało się pobrać danych połączeń")
+        try:
+            return self.extractor.extract('connections', 'user1_id', 'user1_id, user2_id',
+                                          self.connections_file, self.parse_connection_row)
+        except Exception as e:
+            print(f"Błąd: Nie udało się pobrać danych połączeń: {e}")
             return None
-        
-        connections = []
-        for row in result['reply']:
-            if isinstance(row, dict):
-                user1_id = None
-                user2_id = None
-                for key, value in row.items():
-                    if 'user1' in key.lower():
-                        user1_id = int(value)
-                    elif 'user2' in key.lower():
-                        user2_id = int(value)
-                
-                if user1_id is not None and user2_id is not None:
-                    connections.append({"user1_id": user1_id, "user2_id": user2_id})
-            elif isinstance(row, list) and len(row) >= 2:
-                connections.append({"user1_id": int(row[0]), "user2_id": int(row[1])})
-        
-        print(f"Pobrano {len(connections)} połączeń")
-        return connections
     
-    def save_data_locally(self, users, connections):
-        """Zapisuje dane lokalnie do plików JSON"""
-        print("\n=== ZAPISYWANIE DANYCH LOKALNIE ===")
+    @staticmethod
+    def extraction_pending(path):
+        """Czy pobieranie do pliku NDJSON zostało przerwane (istnieje punkt kontrolny)"""
+        return os.path.exists(PagedExtractor.checkpoint_path(path))
+    
+    def extract_from_mysql(self, refresh=False):
+        """
+        Pobiera tabele z MySQL do plików NDJSON i ładuje je.
+        refresh=True - pobiera od nowa także kompletne pliki (świeże wiersze dla synchronizacji przyrostowej)
+        """
+        print("\n=== POBIERANIE DANYCH Z MYSQL ===")
+        # Kompletne pliki NDJSON zostają (chyba że refresh), przerwane pobieranie jest wznawiane
+        # Pusta tabela to 0 wierszy, a nie błąd - błąd pobierania zwraca None
+        if refresh or not os.path.exists(self.users_file) or self.extraction_pending(self.users_file):
+            if self.fetch_users_data() is None:
+                return None, None
         
-        try:
-            # Zapisz użytkowników
-            with open(os.path.join(os.path.dirname(__file__), 'users_data.json'), 'w', encoding='utf-8') as f:
-                json.dump(users, f, indent=2, ensure_ascii=False)
-            
-            # Zapisz połączenia
-            with open(os.path.join(os.path.dirname(__file__), 'connections_data.json'), 'w', encoding='utf-8') as f:
-                json.dump(connections, f, indent=2, ensure_ascii=False)
-            
-            print("✅ Dane zapisane lokalnie")
-            return True
-        except Exception as e:
-            print(f"❌ Błąd podczas zapisywania danych: {e}")
-            return False
+        if refresh or not os.path.exists(self.connections_file) or self.extraction_pending(self.connections_file):
+            if self.fetch_connections_data() is None:
+                return None, None
+        
+        return self.load_data_locally()
     
     def load_data_locally(self):
-        """Ładuje dane z lokalnych plików JSON"""
+        """Ładuje dane z lokalnych plików NDJSON (lub starszych plików JSON)"""
         print("\n=== ŁADOWANIE DANYCH Z PLIKÓW LOKALNYCH ===")
         
         try:
-            users_file = os.path.join(os.path.dirname(__file__), 'users_data.json')
-            connections_file = os.path.join(os.path.dirname(__file__), 'connections_data.json')
+            if self.extraction_pending(self.users_file) or self.extraction_pending(self.connections_file):
+                print("Pliki lokalne są niekompletne - pobieranie zostanie wznowione")
+                return None, None
             
-            if os.path.exists(users_file) and os.path.exists(connections_file):
-                with open(users_file, 'r', encoding='utf-8') as f:
+            if os.path.exists(self.users_file) and os.path.exists(self.connections_file):
+                users = list(read_ndjson(self.users_file))
+                connections = list(read_ndjson(self.connections_file))
+            elif os.path.exists(self.legacy_users_file) and os.path.exists(self.legacy_connections_file):
+                with open(self.legacy_users_file, 'r', encoding='utf-8') as f:
                     users = json.load(f)
                 
-                with open(connections_file, 'r', encoding='utf-8') as f:
+                with open(self.legacy_connections_file, 'r', encoding='utf-8') as f:
                     connections = json.load(f)
-                
-                print(f"✅ Załadowano {len(users)} użytkowników i {len(connections)} połączeń z plików lokalnych")
-                return users, connections
             else:
                 print("Pliki lokalne nie istnieją")
                 return None, None
+            
+            print(f"✅ Załadowano {len(users)} użytkowników i {len(connections)} połączeń z plików lokalnych")
+            return users, connections
         except Exception as e:
             print(f"❌ Błąd podczas ładowania danych z plików: {e}")
             return None, None
@@ -189,20 +229,63 @@ class ConnectionsTaskSolver:
             print(f"❌ Błąd podczas czyszczenia bazy Neo4j: {e}")
             return False
     
+    def create_constraints(self):
+        """Tworzy ograniczenie unikalności userId (a z nim indeks) przed ładowaniem danych"""
+        print("\n=== TWORZENIE OGRANICZEŃ W NEO4J ===")
+        
+        try:
+            with self.neo4j_driver.session() as session:
+                session.run(
+                    "CREATE CONSTRAINT user_id_unique IF NOT EXISTS "
+                    "FOR (u:User) REQUIRE u.userId IS UNIQUE"
+                )
+                # Indeksy do wyszukiwania użytkowników po znormalizowanej nazwie
+                session.run(
+                    "CREATE INDEX user_username_key IF NOT EXISTS "
+                    "FOR (u:User) ON (u.username_key)"
+                )
+                session.run(
+                    "CREATE FULLTEXT INDEX user_username_fulltext IF NOT EXISTS "
+                    "FOR (u:User) ON EACH [u.username_key]"
+                )
+            print("✅ Ograniczenie unikalności userId i indeksy nazw gotowe")
+            return True
+        except Exception as e:
+            print(f"❌ Błąd podczas tworzenia ograniczeń: {e}")
+            return False
+    
+    def run_batched(self, query, rows, label):
+        """Wysyła wiersze paczkami (UNWIND $rows), każda paczka w osobnej transakcji"""
+        start_time = time.time()
+        
+        with self.neo4j_driver.session() as session:
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+        
+        elapsed = time.time() - start_time
+        rate = len(rows) / elapsed if elapsed > 0 else float('inf')
+        print(f"✅ {label}: {len(rows)} wierszy w Neo4j w {elapsed:.2f}s ({rate:.0f} wierszy/s, paczki po {self.batch_size})")
+    
+    @staticmethod
+    def neo4j_user_row(user):
+        """Wiersz użytkownika zapisywany w Neo4j - z kluczem nazwy do wyszukiwania po indeksie"""
+        return {"id": user['id'], "username": user['username'], "username_key": normalize_name(user['username'])}
+    
     def load_users_to_neo4j(self, users):
         """Ładuje użytkowników do bazy Neo4j"""
         print("\n=== ŁADOWANIE UŻYTKOWNIKÓW DO NEO4J ===")
         
         try:
-            with self.neo4j_driver.session() as session:
-                for user in users:
-                    session.run(
-                        "CREATE (u:User {userId: $user_id, username: $username})",
-                        user_id=user['id'],
-                        username=user['username']
-                    )
-            
-            print(f"✅ Załadowano {len(users)} użytkowników do Neo4j")
+            self.run_batched(
+                """
+                UNWIND $rows AS row
+                MERGE (u:User {userId: row.id})
+                SET u.username = row.username, u.username_key = row.username_key
+                """,
+                [self.neo4j_user_row(user) for user in users],
+                "Użytkownicy"
+            )
             return True
         except Exception as e:
             print(f"❌ Błąd podczas ładowania użytkowników do Neo4j: {e}")
@@ -213,24 +296,198 @@ class ConnectionsTaskSolver:
         print("\n=== ŁADOWANIE POŁĄCZEŃ DO NEO4J ===")
         
         try:
-            with self.neo4j_driver.session() as session:
-                for connection in connections:
-                    session.run(
-                        """
-                        MATCH (u1:User {userId: $user1_id})
-                        MATCH (u2:User {userId: $user2_id})
-                        CREATE (u1)-[:KNOWS]->(u2)
-                        """,
-                        user1_id=connection['user1_id'],
-                        user2_id=connection['user2_id']
-                    )
-            
-            print(f"✅ Załadowano {len(connections)} połączeń do Neo4j")
+            self.run_batched(
+                """
+                UNWIND $rows AS row
+                MATCH (u1:User {userId: row.user1_id})
+                MATCH (u2:User {userId: row.user2_id})
+                CREATE (u1)-[:KNOWS]->(u2)
+                """,
+                connections,
+                "Połączenia"
+            )
             return True
         except Exception as e:
             print(f"❌ Błąd podczas ładowania połączeń do Neo4j: {e}")
             return False
     
+    @staticmethod
+    def row_hash(row):
+        """Skrót wiersza do porównywania migawek"""
+        return hashlib.sha1(json.dumps(row, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+    
+    def build_snapshot(self, users, connections):
+        """Migawka stanu załadowanego do Neo4j: skrót wiersza per użytkownik i zbiór krawędzi"""
+        return {
+            "neo4j_uri": self.neo4j_uri,
+            "users": {str(user['id']): self.row_hash(self.neo4j_user_row(user)) for user in users},
+            "connections": sorted({f"{c['user1_id']}:{c['user2_id']}" for c in connections})
+        }
+    
+    def load_snapshot(self):
+        """Ładuje migawkę ostatniej synchronizacji z Neo4j"""
+        if not os.path.exists(self.snapshot_file):
+            return None
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            return snapshot if snapshot.get("neo4j_uri") == self.neo4j_uri else None
+        except Exception as e:
+            print(f"❌ Błąd podczas ładowania migawki: {e}")
+            return None
+    
+    def save_snapshot(self, snapshot):
+        """Zapisuje migawkę po udanej synchronizacji"""
+        try:
+            with open(self.snapshot_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"❌ Błąd podczas zapisywania migawki: {e}")
+    
+    def count_neo4j_users(self):
+        """Liczba węzłów User w Neo4j - do wykrycia rozjazdu z migawką"""
+        with self.neo4j_driver.session() as session:
+            return session.run("MATCH (u:User) RETURN count(u) AS users").single()['users']
+    
+    def full_reload_neo4j(self, users, connections):
+        """Czyści bazę i ładuje wszystkie dane od nowa"""
+        if not self.clear_neo4j_database():
+            return False
+        
+        if not self.create_constraints():
+            return False
+        
+        if not self.load_users_to_neo4j(users):
+            return False
+        
+        return self.load_connections_to_neo4j(connections)
+    
+    def sync_neo4j_incremental(self, users, connections, snapshot):
+        """Wprowadza do Neo4j tylko różnice względem migawki (paczkami UNWIND)"""
+        print("\n=== PRZYROSTOWA SYNCHRONIZACJA NEO4J ===")
+        
+        new_snapshot = self.build_snapshot(users, connections)
+        
+        old_users = snapshot["users"]
+        new_users = new_snapshot["users"]
+        changed_users = [user for user in users if old_users.get(str(user['id'])) != new_users[str(user['id'])]]
+        deleted_user_ids = [int(user_id) for user_id in old_users if user_id not in new_users]
+        
+        old_connections = set(snapshot["connections"])
+        new_connections = set(new_snapshot["connections"])
+        added_connections = [
+            {"user1_id": int(a), "user2_id": int(b)}
+            for a, b in (key.split(':') for key in new_connections - old_connections)
+        ]
+        removed_connections = [
+            {"user1_id": int(a), "user2_id": int(b)}
+            for a, b in (key.split(':') for key in old_connections - new_connections)
+        ]
+        
+        print(f"Użytkownicy: {len(changed_users)} nowych/zmienionych, {len(deleted_user_ids)} usuniętych")
+        print(f"Połączenia: {len(added_connections)} nowych, {len(removed_connections)} usuniętych")
+        
+        try:
+            if removed_connections:
+                self.run_batched(
+                    """
+                    UNWIND $rows AS row
+                    MATCH (:User {userId: row.user1_id})-[r:KNOWS]->(:User {userId: row.user2_id})
+                    DELETE r
+                    """,
+                    removed_connections,
+                    "Usunięte połączenia"
+                )
+            
+            if deleted_user_ids:
+                self.run_batched(
+                    """
+                    UNWIND $rows AS user_id
+                    MATCH (u:User {userId: user_id})
+                    DETACH DELETE u
+                    """,
+                    deleted_user_ids,
+                    "Usunięci użytkownicy"
+                )
+            
+            if changed_users and not self.load_users_to_neo4j(changed_users):
+                return False
+            
+            if added_connections:
+                self.run_batched(
+                    """
+                    UNWIND $rows AS row
+                    MATCH (u1:User {userId: row.user1_id})
+                    MATCH (u2:User {userId: row.user2_id})
+                    MERGE (u1)-[:KNOWS]->(u2)
+                    """,
+                    added_connections,
+                    "Nowe połączenia"
+                )
+        except Exception as e:
+            print(f"❌ Błąd podczas przyrostowej synchronizacji Neo4j: {e}")
+            return False
+        
+        self.save_snapshot(new_snapshot)
+        print("✅ Neo4j zsynchronizowany przyrostowo")
+        return True
+    
+    def sync_neo4j(self, users, connections):
+        """Synchronizuje Neo4j z danymi - przyrostowo, jeśli migawka zgadza się ze stanem bazy"""
+        snapshot = self.load_snapshot() if self.sync_mode == 'incremental' else None
+        
+        if snapshot:
+            try:
+                neo4j_users = self.count_neo4j_users()
+            except Exception as e:
+                print(f"❌ Błąd podczas sprawdzania stanu Neo4j: {e}")
+                neo4j_users = None
+            
+            if neo4j_users == len(snapshot["users"]):
+                return self.create_constraints() and self.sync_neo4j_incremental(users, connections, snapshot)
+            print("Migawka nie zgadza się ze stanem Neo4j - pełne przeładowanie")
+        
+        if not self.full_reload_neo4j(users, connections):
+            return False
+        
+        self.save_snapshot(self.build_snapshot(users, connections))
+        return True
+    
+    @staticmethod
+    def find_users_by_name(session, name):
+        """
+        Znajduje użytkowników po nazwie przez indeksy username_key:
+        dokładne dopasowanie, potem prefiks (indeks zakresowy), na końcu indeks pełnotekstowy z tolerancją literówek
+        """
+        key = normalize_name(name)
+        
+        records = list(session.run(
+            "MATCH (u:User) WHERE u.username_key = $key RETURN u.username AS username, u.userId AS userId",
+            key=key
+        ))
+        if records:
+            return records
+        
+        records = list(session.run(
+            "MATCH (u:User) WHERE u.username_key STARTS WITH $key RETURN u.username AS username, u.userId AS userId",
+            key=key
+        ))
+        if records:
+            return records
+        
+        # Znaki specjalne Lucene trzeba usunąć z zapytania pełnotekstowego
+        fulltext_query = ' '.join(f"{term}~" for term in re.findall(r"\w+", key))
+        if not fulltext_query:
+            return []
+        return list(session.run(
+            """
+            CALL db.index.fulltext.queryNodes('user_username_fulltext', $query) YIELD node, score
+            RETURN node.username AS username, node.userId AS userId
+            ORDER BY score DESC
+            """,
+            query=fulltext_query
+        ))
+    
     def find_shortest_path(self):
         """Znajduje najkrótszą ścieżkę między Rafałem a Barbarą"""
         print("\n=== SZUKANIE NAJKRÓTSZEJ ŚCIEŻKI ===")
@@ -238,38 +495,31 @@ class ConnectionsTaskSolver:
         try:
             with self.neo4j_driver.session() as session:
                 # Najpierw sprawdź czy użytkownicy istnieją
-                rafal_result = session.run(
-                    "MATCH (u:User) WHERE toLower(u.username) CONTAINS toLower('Rafał') OR toLower(u.username) CONTAINS toLower('Rafal') RETURN u.username, u.userId"
-                )
-                rafal_users = list(rafal_result)
+                rafal_users = self.find_users_by_name(session, 'Rafał')
+                barbara_users = self.find_users_by_name(session, 'Barbara')
                 
-                barbara_result = session.run(
-                    "MATCH (u:User) WHERE toLower(u.username) CONTAINS toLower('Barbara') RETURN u.username, u.userId"
-                )
-                barbara_users = list(barbara_result)
-                
-                print(f"Znalezieni użytkownicy podobni do 'Rafał': {[r['u.username'] for r in rafal_users]}")
-                print(f"Znalezieni użytkownicy podobni do 'Barbara': {[b['u.username'] for b in barbara_users]}")
+                print(f"Znalezieni użytkownicy podobni do 'Rafał': {[r['username'] for r in rafal_users]}")
+                print(f"Znalezieni użytkownicy podobni do 'Barbara': {[b['username'] for b in barbara_users]}")
                 
                 if not rafal_users or not barbara_users:
                     print("❌ Nie znaleziono użytkowników Rafał lub Barbara")
                     return None
                 
                 # Użyj pierwszego znalezionego użytkownika
-                rafal_name = rafal_users[0]['u.username']
-                barbara_name = barbara_users[0]['u.username']
+                rafal = rafal_users[0]
+                barbara = barbara_users[0]
                 
-                print(f"Szukam ścieżki między: {rafal_name} -> {barbara_name}")
+                print(f"Szukam ścieżki między: {rafal['username']} -> {barbara['username']}")
                 
-                # Znajdź najkrótszą ścieżkę
+                # Znajdź najkrótszą ścieżkę (węzły końcowe po userId - indeks z ograniczenia unikalności)
                 result = session.run(
                     """
-                    MATCH (start:User {username: $rafal_name}), (end:User {username: $barbara_name})
+                    MATCH (start:User {userId: $rafal_id}), (end:User {userId: $barbara_id})
                     MATCH path = shortestPath((start)-[:KNOWS*]-(end))
                     RETURN [node in nodes(path) | node.username] as path_names
                     """,
-                    rafal_name=rafal_name,
-                    barbara_name=barbara_name
+                    rafal_id=rafal['userId'],
+                    barbara_id=barbara['userId']
                 )
                 
                 paths = list(result)
@@ -286,6 +536,55 @@ class ConnectionsTaskSolver:
             print(f"❌ Błąd podczas szukania ścieżki: {e}")
             return None
     
+    def find_shortest_path_local(self, users, connections):
+        """Znajduje najkrótszą ścieżkę między Rafałem a Barbarą silnikiem grafu w pamięci"""
+        print("\n=== SZUKANIE NAJKRÓTSZEJ ŚCIEŻKI (SILNIK W PAMIĘCI) ===")
+        
+        graph = InMemoryGraph(users, connections)
+        print(f"Graf w pamięci: {len(graph.user_ids)} węzłów, {graph.edge_count} krawędzi")
+        
+        rafal_users = graph.find_users('Rafał')
+        barbara_users = graph.find_users('Barbara')
+        
+        print(f"Znalezieni użytkownicy podobni do 'Rafał': {graph.path_names(rafal_users)}")
+        print(f"Znalezieni użytkownicy podobni do 'Barbara': {graph.path_names(barbara_users)}")
+        
+        if not rafal_users or not barbara_users:
+            print("❌ Nie znaleziono użytkowników Rafał lub Barbara")
+            return None
+        
+        start, end = rafal_users[0], barbara_users[0]
+        print(f"Szukam ścieżki między: {graph.usernames[start]} -> {graph.usernames[end]}")
+        
+        path = graph.shortest_path(start, end)
+        if not path:
+            print("❌ Nie znaleziono ścieżki między użytkownikami")
+            return None
+        
+        path_names = graph.path_names(path)
+        print(f"✅ Znaleziona najkrótsza ścieżka: {' -> '.join(path_names)}")
+        
+        all_paths = graph.all_shortest_paths(start, end)
+        if len(all_paths) > 1:
+            print(f"Uwaga: istnieje {len(all_paths)} najkrótszych ścieżek tej samej długości")
+        
+        return path_names
+    
+    def use_local_graph(self, connections):
+        """Decyduje, czy użyć silnika w pamięci zamiast Neo4j"""
+        if self.graph_engine == 'local':
+            return True
+        if self.graph_engine == 'neo4j':
+            return False
+        
+        if len(connections) <= self.local_graph_max_edges:
+            print(f"Mały graf ({len(connections)} połączeń) - używam silnika w pamięci")
+            return True
+        if not self.connect_to_neo4j():
+            print("Neo4j niedostępny - używam silnika w pamięci")
+            return True
+        return False
+    
     def send_answer_to_centrala(self, path_names):
         """Wysyła odpowiedź do centrali"""
         print("\n=== WYSYŁANIE ODPOWIEDZI DO CENTRALI ===")
@@ -315,41 +614,41 @@ class ConnectionsTaskSolver:
         """Główna metoda rozwiązująca zadanie"""
         print("=== ROZPOCZYNAM ROZWIĄZYWANIE ZADANIA CONNECTIONS ===")
         
-        # 1. Połącz się z Neo4j
-        if not self.connect_to_neo4j():
-            return False
+        # 1. Spróbuj załadować dane z plików lokalnych (APIDB_REFRESH wymusza pobranie z MySQL)
+        users, connections = (None, None) if self.refresh_data else self.load_data_locally()
+        fresh = False
         
-        # 2. Spróbuj załadować dane z plików lokalnych
-        users, connections = self.load_data_locally()
+        # 2. Jeśli nie ma lokalnych danych, pobierz z MySQL
+        if users is None or connections is None:
+            users, connections = self.extract_from_mysql(refresh=self.refresh_data)
+            if users is None or connections is None:
+                return False
+            fresh = True
         
-        # 3. Jeśli nie ma lokalnych danych, pobierz z MySQL
-        if not users or not connections:
-            print("\n=== POBIERANIE DANYCH Z MYSQL ===")
-            users = self.fetch_users_data()
-            if not users:
+        if self.use_local_graph(connections):
+            # 3-5. Znajdź najkrótszą ścieżkę bez Neo4j
+            path_names = self.find_shortest_path_local(users, connections)
+            if not path_names:
+                return False
+        else:
+            # 3. Połącz się z Neo4j
+            if not self.neo4j_driver and not self.connect_to_neo4j():
                 return False
             
-            connections = self.fetch_connections_data()
-            if not connections:
+            # 4. Załaduj dane do Neo4j (tylko różnice, jeśli jest migawka).
+            # Migawkę porównujemy ze świeżymi wierszami z MySQL, a nie z plikami z poprzedniego pobrania
+            if self.sync_mode == 'incremental' and not fresh:
+                users, connections = self.extract_from_mysql(refresh=True)
+                if users is None or connections is None:
+                    return False
+            
+            if not self.sync_neo4j(users, connections):
                 return False
             
-            # Zapisz dane lokalnie
-            self.save_data_locally(users, connections)
-        
-        # 4. Wyczyść i załaduj dane do Neo4j
-        if not self.clear_neo4j_database():
-            return False
-        
-        if not self.load_users_to_neo4j(users):
-            return False
-        
-        if not self.load_connections_to_neo4j(connections):
-            return False
-        
-        # 5. Znajdź najkrótszą ścieżkę
-        path_names = self.find_shortest_path()
-        if not path_names:
-            return False
+            # 5. Znajdź najkrótszą ścieżkę
+            path_names = self.find_shortest_path()
+            if not path_names:
+                return False
         
         # 6. Wyślij odpowiedź do centrali
         result = self.send_answer_to_centrala(path_names)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Graph Engine - Lesson 15
+Lekki silnik grafowy w pamięci - zastępuje Neo4j dla małych grafów
+lub gdy serwer Neo4j jest niedostępny.
+"""
+
+import unicodedata
+from array import array
+from collections import deque
+
+# Litery, których NFKD nie rozkłada na literę bazową i znak diakrytyczny
+SPECIAL_FOLDS = str.maketrans({'ł': 'l', 'Ł': 'L', 'ø': 'o', 'Ø': 'O', 'đ': 'd', 'Đ': 'D', 'ß': 'ss'})
+
+
+def normalize_name(name):
+    """Klucz nazwy bez wielkości liter i znaków diakrytycznych: 'Rafał' -> 'rafal'"""
+    decomposed = unicodedata.normalize('NFKD', name.translate(SPECIAL_FOLDS))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+class InMemoryGraph:
+    def __init__(self, users, connections):
+        """
+        users - lista słowników {"id", "username"}
+        connections - lista słowników {"user1_id", "user2_id"} (relacje traktowane jako nieskierowane)
+        """
+        self.user_ids = [user['id'] for user in users]
+        self.usernames = [user['username'] for user in users]
+        self.username_keys = [normalize_name(username) for username in self.usernames]
+        self.index_of = {user_id: i for i, user_id in enumerate(self.user_ids)}
+
+        # Lista sąsiedztwa w formacie CSR: sąsiedzi węzła i to targets[offsets[i]:offsets[i + 1]]
+        degrees = [0] * len(self.user_ids)
+        edges = []
+        for connection in connections:
+            a = self.index_of.get(connection['user1_id'])
+            b = self.index_of.get(connection['user2_id'])
+            if a is None or b is None:
+                continue
+            edges.append((a, b))
+            degrees[a] += 1
+            degrees[b] += 1
+
+        self.offsets = array('i', [0] * (len(self.user_ids) + 1))
+        for i, degree in enumerate(degrees):
+            self.offsets[i + 1] = self.offsets[i] + degree
+
+        self.targets = array('i', [0] * self.offsets[-1])
+        fill = array('i', self.offsets[:-1])
+        for a, b in edges:
+            self.targets[fill[a]] = b
+            fill[a] += 1
+            self.targets[fill[b]] = a
+            fill[b] += 1
+
+        self.edge_count = len(edges)
+
+    def neighbors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def find_users(self, name):
+        """Zwraca indeksy użytkowników o nazwie równej, a gdy takich brak - zawierającej podaną (bez wielkości liter i diakrytyków)"""
+        key = normalize_name(name)
+        exact = [i for i, username_key in enumerate(self.username_keys) if username_key == key]
+        if exact:
+            return exact
+        return [i for i, username_key in enumerate(self.username_keys) if key in username_key]
+
+    def path_names(self, path):
+        return [self.usernames[node] for node in path]
+
+    def shortest_path(self, start, end, blocked_nodes=None, blocked_edges=None):
+        """Dwukierunkowy BFS - zwraca listę indeksów węzłów lub None"""
+        if start == end:
+            return [start]
+
+        blocked_nodes = blocked_nodes or set()
+        blocked_edges = blocked_edges or set()
+        if start in blocked_nodes or end in blocked_nodes:
+            return None
+
+        parents_forward = {start: None}
+        parents_backward = {end: None}
+        frontier_forward = [start]
+        frontier_backward = [end]
+
+        while frontier_forward and frontier_backward:
+            # Rozwijamy mniejszy front
+            expand_forward = len(frontier_forward) <= len(frontier_backward)
+            frontier = frontier_forward if expand_forward else frontier_backward
+            parents = parents_forward if expand_forward else parents_backward
+            other_parents = parents_backward if expand_forward else parents_forward
+
+            next_frontier = []
+            meeting_node = None
+            for node in frontier:
+                for neighbor in self.neighbors(node):
+                    if neighbor in parents or neighbor in blocked_nodes:
+                        continue
+                    if (node, neighbor) in blocked_edges or (neighbor, node) in blocked_edges:
+                        continue
+                    parents[neighbor] = node
+                    if neighbor in other_parents:
+                        meeting_node = neighbor
+                        break
+                    next_frontier.append(neighbor)
+                if meeting_node is not None:
+                    break
+
+            if meeting_node is not None:
+                path = []
+                node = meeting_node
+                while node is not None:
+                    path.append(node)
+                    node = parents_forward[node]
+                path.reverse()
+                node = parents_backward[meeting_node]
+                while node is not None:
+                    path.append(node)
+                    node = parents_backward[node]
+                return path
+
+            if expand_forward:
+                frontier_forward = next_frontier
+            else:
+                frontier_backward = next_frontier
+
+        return None
+
+    def all_shortest_paths(self, start, end):
+        """Wszystkie najkrótsze ścieżki (odpowiednik allShortestPaths w Cypher)"""
+        distance = {start: 0}
+        predecessors = {start: []}
+        queue = deque([start])
+
+        while queue:
+            node = queue.popleft()
+            if end in distance and distance[node] >= distance[end]:
+                break
+            for neighbor in self.neighbors(node):
+                if neighbor not in distance:
+                    distance[neighbor] = distance[node] + 1
+                    predecessors[neighbor] = [node]
+                    queue.append(neighbor)
+                elif distance[neighbor] == distance[node] + 1:
+                    predecessors[neighbor].append(node)
+
+        if end not in distance:
+            return []
+
+        paths = []
+        stack = [(end, [end])]
+        while stack:
+            node, suffix = stack.pop()
+            if node == start:
+                paths.append(list(reversed(suffix)))
+                continue
+            for predecessor in predecessors[node]:
+                stack.append((predecessor, suffix + [predecessor]))
+        return paths
+
+    def k_shortest_paths(self, start, end, k):
+        """K najkrótszych ścieżek prostych (algorytm Yena)"""
+        first = self.shortest_path(start, end)
+        if not first:
+            return []
+
+        paths = [first]
+        candidates = []
+
+        while len(paths) < k:
+            previous = paths[-1]
+            for i in range(len(previous) - 1):
+                spur_node = previous[i]
+                root = previous[:i + 1]
+
+                blocked_edges = {
+                    (path[i], path[i + 1]) for path in paths
+                    if len(path) > i + 1 and path[:i + 1] == root
+                }
+                blocked_nodes = set(root[:-1])
+
+                spur = self.shortest_path(spur_node, end, blocked_nodes, blocked_edges)
+                if spur:
+                    candidate = root[:-1] + spur
+                    if candidate not in paths and candidate not in candidates:
+                        candidates.append(candidate)
+
+            if not candidates:
+                break
+            candidates.sort(key=len)
+            paths.append(candidates.pop(0))
+
+        return paths
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test przyrostowej synchronizacji Neo4j - Lesson 15
+Baza MySQL i Neo4j są zastąpione atrapami; sprawdzamy, że drugie uruchomienie
+pobiera świeże wiersze z MySQL i wysyła do Neo4j dokładnie te zmiany, które zaszły w źródle.
+
+Uruchomienie:
+    python -m pytest test_connections_sync.py
+"""
+
+import os
+import re
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('CENTRALA_API_KEY', 'test')
+
+from apidb_extract import PagedExtractor
+from connections_task import ConnectionsTaskSolver
+
+BOUNDS_PATTERN = re.compile(r"SELECT MIN\((\w+)\) AS lo, MAX\(\w+\) AS hi FROM (\w+)")
+RANGE_PATTERN = re.compile(r"SELECT .+ FROM (\w+) WHERE (\w+) >= (\d+) AND \w+ < (\d+)")
+
+
+class FakeApiDb:
+    """Tabele users i connections w pamięci, odpowiadające jak /apidb"""
+
+    def __init__(self, users, connections):
+        self.tables = {"users": users, "connections": connections}
+
+    def __call__(self, query):
+        match = BOUNDS_PATTERN.match(query)
+        if match:
+            column, table = match.groups()
+            keys = [row[column] for row in self.tables[table]]
+            return {"reply": [{"lo": min(keys, default=None), "hi": max(keys, default=None)}]}
+        table, column, start, end = RANGE_PATTERN.match(query).groups()
+        rows = [row for row in self.tables[table] if int(start) <= row[column] < int(end)]
+        return {"reply": sorted(rows, key=lambda row: row[column])}
+
+
+class FakeDriver:
+    def close(self):
+        pass
+
+
+def make_solver(tmp_path, apidb):
+    solver = ConnectionsTaskSolver()
+    solver.users_file = str(tmp_path / 'users_data.ndjson')
+    solver.connections_file = str(tmp_path / 'connections_data.ndjson')
+    solver.legacy_users_file = str(tmp_path / 'users_data.json')
+    solver.legacy_connections_file = str(tmp_path / 'connections_data.json')
+    solver.snapshot_file = str(tmp_path / 'neo4j_snapshot.json')
+    solver.extractor = PagedExtractor(apidb, page_size=2, max_workers=2)
+    solver.graph_engine = 'neo4j'
+    solver.sync_mode = 'incremental'
+    solver.refresh_data = False
+
+    solver.batches = []
+    solver.neo4j_driver = FakeDriver()
+    solver.connect_to_neo4j = lambda: True
+    solver.clear_neo4j_database = lambda: True
+    solver.create_constraints = lambda: True
+    solver.count_neo4j_users = lambda: len(solver.load_snapshot()["users"])
+    solver.run_batched = lambda query, rows, label: solver.batches.append((label, rows))
+    solver.find_shortest_path = lambda: ['Rafał', 'Barbara']
+    solver.send_answer_to_centrala = lambda path_names: {"code": 0}
+    return solver
+
+
+def test_incremental_sync_applies_source_changes(tmp_path):
+    apidb = FakeApiDb(
+        users=[{"id": 1, "username": "Rafał"}, {"id": 2, "username": "Adam"}, {"id": 3, "username": "Barbara"}],
+        connections=[{"user1_id": 1, "user2_id": 2}, {"user1_id": 2, "user2_id": 3}],
+    )
+    assert make_solver(tmp_path, apidb).solve()
+
+    # Zmiany w źródle po pierwszej synchronizacji: nowy użytkownik z połączeniem, usunięte połączenie
+    apidb.tables["users"].append({"id": 4, "username": "Celina"})
+    apidb.tables["connections"].append({"user1_id": 3, "user2_id": 4})
+    apidb.tables["connections"].remove({"user1_id": 1, "user2_id": 2})
+
+    solver = make_solver(tmp_path, apidb)
+    assert solver.solve()
+
+    assert dict(solver.batches) == {
+        "Usunięte połączenia": [{"user1_id": 1, "user2_id": 2}],
+        "Użytkownicy": [{"id": 4, "username": "Celina", "username_key": "celina"}],
+        "Nowe połączenia": [{"user1_id": 3, "user2_id": 4}],
+    }
+    assert len(solver.batches) == 3
+
+
+def test_incremental_sync_deletes_removed_users(tmp_path):
+    apidb = FakeApiDb(
+        users=[{"id": 1, "username": "Rafał"}, {"id": 2, "username": "Adam"}, {"id": 3, "username": "Barbara"}],
+        connections=[{"user1_id": 1, "user2_id": 3}, {"user1_id": 2, "user2_id": 3}],
+    )
+    assert make_solver(tmp_path, apidb).solve()
+
+    apidb.tables["users"].remove({"id": 2, "username": "Adam"})
+    apidb.tables["connections"].remove({"user1_id": 2, "user2_id": 3})
+
+    solver = make_solver(tmp_path, apidb)
+    assert solver.solve()
+
+    assert dict(solver.batches) == {
+        "Usunięte połączenia": [{"user1_id": 2, "user2_id": 3}],
+        "Usunięci użytkownicy": [2],
+    }
+    assert len(solver.batches) == 2
+
+
+def test_empty_table_is_not_a_failure_and_clears_stale_checkpoint(tmp_path):
+    apidb = FakeApiDb(users=[{"id": 1, "username": "Rafał"}], connections=[])
+    solver = make_solver(tmp_path, apidb)
+    # Punkt kontrolny z przerwanego pobierania tabeli, która została w międzyczasie opróżniona
+    with open(solver.connections_file, 'w', encoding='utf-8') as f:
+        f.write('{"user1_id":1,"user2_id":2}\n')
+    solver.extractor.save_checkpoint(solver.connections_file, 'connections', 3, 1, 28)
+
+    assert solver.solve()
+    assert not solver.extraction_pending(solver.connections_file)
+    assert solver.load_data_locally() == ([{"id": 1, "username": "Rafał"}], [])
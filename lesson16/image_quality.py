@@ -0,0 +1,95 @@
+import io
+from typing import Dict, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Thresholds on a 0..1 luminance scale
+DARK_MEAN = 0.25
+BRIGHT_MEAN = 0.75
+CLIP_FRACTION = 0.35
+NOISE_SIGMA = 0.06
+GLITCH_ROWS = 0.02
+# Laplacian variance below this means a blurry photo (about 100 on the 0..255 scale)
+BLUR_VARIANCE = 0.0015
+# Relative distance from a threshold below which the decision is treated as uncertain
+UNCERTAIN_MARGIN = 0.15
+
+
+def load_luminance(image_bytes: bytes) -> np.ndarray:
+    """Decode an image and return its luminance as a float32 array in 0..1"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return np.asarray(image.convert('L'), dtype=np.float32) / 255.0
+
+
+def measure_quality(gray: np.ndarray) -> Dict[str, float]:
+    """Compute brightness, clipping, blur, noise and glitch metrics for a luminance image"""
+    center = gray[1:-1, 1:-1]
+
+    if center.size:
+        # Laplacian variance - low values mean a blurry image
+        laplacian = (4 * center - gray[:-2, 1:-1] - gray[2:, 1:-1]
+                     - gray[1:-1, :-2] - gray[1:-1, 2:])
+        laplacian_variance = float(laplacian.var())
+
+        # Noise sigma (Immerkaer): response to a kernel that cancels smooth image structure
+        noise_response = (4 * center
+                          - 2 * (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:])
+                          + gray[:-2, :-2] + gray[:-2, 2:] + gray[2:, :-2] + gray[2:, 2:])
+        noise_sigma = float(np.sqrt(np.pi / 2) * np.abs(noise_response).mean() / 6)
+    else:
+        # Images thinner than 3 pixels have no 3x3 neighbourhoods - no detail and no measurable noise
+        laplacian_variance = 0.0
+        noise_sigma = 0.0
+
+    # Glitches show up as rows that differ sharply from the row above
+    row_jumps = np.abs(np.diff(gray, axis=0)).mean(axis=1)
+    glitch_rows = 0.0
+    if row_jumps.size:
+        jump_threshold = 4 * float(np.median(row_jumps)) + 0.02
+        glitch_rows = float((row_jumps > jump_threshold).mean())
+
+    return {
+        "mean_luminance": float(gray.mean()),
+        "dark_clip": float((gray < 0.05).mean()),
+        "bright_clip": float((gray > 0.95).mean()),
+        "laplacian_variance": laplacian_variance,
+        "noise_sigma": noise_sigma,
+        "glitch_rows": glitch_rows,
+    }
+
+
+def _margin(value: float, threshold: float) -> float:
+    """Relative distance of a value from its decision threshold"""
+    return abs(value - threshold) / threshold
+
+
+def suggest_operation(metrics: Dict[str, float]) -> Tuple[str, str]:
+    """
+    Map quality metrics to an automaton operation.
+    Returns (REPAIR/BRIGHTEN/DARKEN/NONE, wysoka/niska) - 'niska' means the vision model should decide.
+    Blur has no dedicated operation, so a blurry photo is reported as REPAIR with 'niska' confidence.
+    """
+    checks = [
+        ("REPAIR", metrics["glitch_rows"], GLITCH_ROWS, True),
+        ("BRIGHTEN", metrics["mean_luminance"], DARK_MEAN, False),
+        ("DARKEN", metrics["mean_luminance"], BRIGHT_MEAN, True),
+        ("BRIGHTEN", metrics["dark_clip"], CLIP_FRACTION, True),
+        ("DARKEN", metrics["bright_clip"], CLIP_FRACTION, True),
+        ("REPAIR", metrics["noise_sigma"], NOISE_SIGMA, True),
+    ]
+
+    uncertain = False
+    for operation, value, threshold, above in checks:
+        triggered = value > threshold if above else value < threshold
+        near = _margin(value, threshold) < UNCERTAIN_MARGIN
+        if triggered:
+            return operation, "niska" if near else "wysoka"
+        uncertain = uncertain or near
+
+    blur = metrics["laplacian_variance"]
+    if blur < BLUR_VARIANCE:
+        return "REPAIR", "niska"
+    uncertain = uncertain or _margin(blur, BLUR_VARIANCE) < UNCERTAIN_MARGIN
+
+    return "NONE", "niska" if uncertain else "wysoka"
@@ -1,4 +1,6 @@
 import os
+import sys
+import asyncio
 import requests
 import json
 import base64
@@ -8,6 +10,21 @@ from typing import List, Dict, Optional
 import re
 from dotenv import load_dotenv
 
+try:
+    from image_quality import load_luminance, measure_quality, suggest_operation
+    LOCAL_QUALITY_AVAILABLE = True
+except ImportError:
+    # Without NumPy/Pillow every quality decision goes to the vision model
+    LOCAL_QUALITY_AVAILABLE = False
+
+# Shared image cache/preprocessing lives in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+try:
+    from image_prep import ImagePreprocessor
+except ImportError:
+    # Without Pillow photos are sent to the vision model as plain URLs, without memoization
+    ImagePreprocessor = None
+
 # Load environment variables from .env file
 load_dotenv('../.env')
 
@@ -20,10 +37,39 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 # API endpoint
 CENTRALA_URL = "https://centrala.ag3nts.org/report"
 
+# Shared rate limits for concurrent photo processing
+CENTRALA_MAX_CONCURRENT = 2
+CENTRALA_MIN_INTERVAL = 0.5  # seconds between consecutive automaton commands
+VISION_MAX_CONCURRENT = 4
+VISION_MIN_INTERVAL = 0.0
+
+class AsyncRateLimiter:
+    """Limits concurrent calls and spaces their start times by at least min_interval seconds"""
+    
+    def __init__(self, max_concurrent: int, min_interval: float = 0.0):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.min_interval = min_interval
+        self.lock = asyncio.Lock()
+        self.next_slot = 0.0
+    
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking function in a worker thread once a slot is available"""
+        async with self.semaphore:
+            async with self.lock:
+                now = time.monotonic()
+                wait = self.next_slot - now
+                self.next_slot = max(now, self.next_slot) + self.min_interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+            return await asyncio.to_thread(func, *args, **kwargs)
+
 class PhotoProcessor:
     def __init__(self):
         self.processed_photos = []
         self.barbara_photos = []
+        self.centrala_limiter = AsyncRateLimiter(CENTRALA_MAX_CONCURRENT, CENTRALA_MIN_INTERVAL)
+        self.vision_limiter = AsyncRateLimiter(VISION_MAX_CONCURRENT, VISION_MIN_INTERVAL)
+        self.images = ImagePreprocessor() if ImagePreprocessor else None
         
     def send_to_centrala(self, answer: str) -> Dict:
         """Send request to centrala API"""
@@ -47,15 +93,118 @@ class PhotoProcessor:
                     print(f"Error response text: {e.response.text}")
             return None
     
+    def fetch_image(self, image_url: str) -> bytes:
+        """Download raw image bytes (once per URL when the image cache is available)"""
+        if self.images:
+            return self.images.fetch(image_url)[0]
+        response = requests.get(image_url, timeout=30)
+        response.raise_for_status()
+        return response.content
+    
+    def vision_image(self, image_url: str, purpose: str):
+        """Return (URL to send to the vision model, cache key) - a resized data URL when possible"""
+        if not self.images:
+            return image_url, image_url
+        return self.images.data_url(image_url, purpose)
+    
+    def memoize(self, key_parts: List[str], compute):
+        """Reuse vision results for the same image content"""
+        if not self.images:
+            return compute()
+        return self.images.memoize(key_parts, compute)
+    
+    def analyze_image_locally(self, image_url: str) -> Optional[Dict]:
+        """Estimate the needed operation from image statistics, without a vision call"""
+        if not LOCAL_QUALITY_AVAILABLE:
+            return None
+        
+        try:
+            start_time = time.perf_counter()
+            metrics = measure_quality(load_luminance(self.fetch_image(image_url)))
+            operation, confidence = suggest_operation(metrics)
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+        except Exception as e:
+            print(f"Error analyzing image locally: {e}")
+            return None
+        
+        summary = ", ".join(f"{name}={value:.3f}" for name, value in metrics.items())
+        return {
+            "quality_assessment": f"analiza lokalna ({elapsed_ms:.0f} ms): {summary}",
+            "suggested_operation": operation,
+            "confidence": confidence,
+            "contains_person": None,
+            "person_description": ""
+        }
+    
+    def detect_person(self, image_url: str) -> Dict:
+        """Ask the vision model only whether the photo shows a person"""
+        try:
+            image_data_url, image_key = self.vision_image(image_url, "triage")
+            return self.memoize(["person-v1", image_key], lambda: self._request_person_detection(image_data_url))
+        except Exception as e:
+            print(f"Error detecting person: {e}")
+            return {"contains_person": False, "person_description": ""}
+    
+    def _request_person_detection(self, image_data_url: str) -> Dict:
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": """Oceń, czy na zdjęciu widoczna jest osoba. Odpowiedz w formacie JSON:
+{
+    "contains_person": true/false,
+    "person_description": "krótki opis osoby jeśli widoczna"
+}"""
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image_url", "image_url": {"url": image_data_url}}
+                    ]
+                }
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=150
+        )
+        return json.loads(response.choices[0].message.content)
+    
+    async def assess_image(self, image_url: str) -> Dict:
+        """Local quality estimate first; the vision model only for uncertain cases"""
+        analysis = await asyncio.to_thread(self.analyze_image_locally, image_url)
+        if analysis and analysis['confidence'] != 'niska':
+            return analysis
+        return await self.vision_limiter.run(self.analyze_image_quality, image_url)
+    
+    async def contains_person(self, image_url: str, analysis: Optional[Dict] = None) -> bool:
+        """Use the person flag from a vision analysis if present, otherwise ask the vision model"""
+        if analysis and analysis.get('contains_person') is not None:
+            return bool(analysis['contains_person'])
+        result = await self.vision_limiter.run(self.detect_person, image_url)
+        return bool(result.get('contains_person'))
+    
     def analyze_image_quality(self, image_url: str) -> Dict:
         """Analyze image quality and suggest improvements using OpenAI Vision"""
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Jesteś ekspertem w analizie jakości zdjęć. Twoim zadaniem jest ocena jakości zdjęcia i sugerowanie odpowiednich operacji naprawczych.
+            image_data_url, image_key = self.vision_image(image_url, "triage")
+            return self.memoize(["quality-v1", image_key], lambda: self._request_quality_analysis(image_data_url))
+        except Exception as e:
+            print(f"Error analyzing image quality: {e}")
+            return {
+                "quality_assessment": "Błąd analizy",
+                "suggested_operation": "NONE",
+                "confidence": "niska",
+                "contains_person": False,
+                "person_description": ""
+            }
+    
+    def _request_quality_analysis(self, image_data_url: str) -> Dict:
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": """Jesteś ekspertem w analizie jakości zdjęć. Twoim zadaniem jest ocena jakości zdjęcia i sugerowanie odpowiednich operacji naprawczych.
 
 Dostępne operacje:
 - REPAIR: dla zdjęć z szumami, glitchami, artefaktami
@@ -71,54 +220,44 @@ Odpowiedz w formacie JSON:
     "contains_person": true/false,
     "person_description": "krótki opis osoby jeśli widoczna"
 }"""
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "Przeanalizuj jakość tego zdjęcia i zasugeruj odpowiednią operację naprawczą."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": image_url}
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=500
-            )
-            
-            content = response.choices[0].message.content
-            # Try to parse JSON response
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError:
-                # If not JSON, extract operation manually
-                if "REPAIR" in content.upper():
-                    operation = "REPAIR"
-                elif "BRIGHTEN" in content.upper():
-                    operation = "BRIGHTEN"
-                elif "DARKEN" in content.upper():
-                    operation = "DARKEN"
-                else:
-                    operation = "NONE"
-                
-                return {
-                    "quality_assessment": content,
-                    "suggested_operation": operation,
-                    "confidence": "średnia",
-                    "contains_person": "person" in content.lower() or "osoba" in content.lower(),
-                    "person_description": ""
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Przeanalizuj jakość tego zdjęcia i zasugeruj odpowiednią operację naprawczą."
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": image_data_url}
+                        }
+                    ]
                 }
-                
-        except Exception as e:
-            print(f"Error analyzing image quality: {e}")
+            ],
+            max_tokens=500
+        )
+        
+        content = response.choices[0].message.content
+        # Try to parse JSON response
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            # If not JSON, extract operation manually
+            if "REPAIR" in content.upper():
+                operation = "REPAIR"
+            elif "BRIGHTEN" in content.upper():
+                operation = "BRIGHTEN"
+            elif "DARKEN" in content.upper():
+                operation = "DARKEN"
+            else:
+                operation = "NONE"
+            
             return {
-                "quality_assessment": "Błąd analizy",
-                "suggested_operation": "NONE",
-                "confidence": "niska",
-                "contains_person": False,
+                "quality_assessment": content,
+                "suggested_operation": operation,
+                "confidence": "średnia",
+                "contains_person": "person" in content.lower() or "osoba" in content.lower(),
                 "person_description": ""
             }
     
@@ -139,41 +278,43 @@ Odpowiedz w formacie JSON:
         
         return None
     
-    def process_single_photo(self, photo_url: str, filename: str, max_iterations: int = 3) -> Optional[str]:
+    async def process_single_photo(self, photo_url: str, filename: str, max_iterations: int = 3) -> Optional[str]:
         """Process a single photo through multiple repair iterations"""
         current_url = photo_url
         current_filename = filename
+        tag = f"[{filename}]"
         
         print(f"\n=== Przetwarzanie zdjęcia: {filename} ===")
         
         for iteration in range(max_iterations):
-            print(f"\nIteracja {iteration + 1}/{max_iterations}")
-            print(f"Analizuję: {current_url}")
+            print(f"{tag} Iteracja {iteration + 1}/{max_iterations}")
+            print(f"{tag} Analizuję: {current_url}")
             
             # Analyze current image quality
-            analysis = self.analyze_image_quality(current_url)
-            print(f"Ocena jakości: {analysis['quality_assessment']}")
-            print(f"Sugerowana operacja: {analysis['suggested_operation']}")
-            print(f"Zawiera osobę: {analysis['contains_person']}")
+            analysis = await self.assess_image(current_url)
+            print(f"{tag} Ocena jakości: {analysis['quality_assessment']}")
+            print(f"{tag} Sugerowana operacja: {analysis['suggested_operation']}")
             
             if analysis['suggested_operation'] == 'NONE':
-                print("Zdjęcie jest dobrej jakości lub nie wymaga dalszej obróbki.")
-                if analysis['contains_person']:
+                print(f"{tag} Zdjęcie jest dobrej jakości lub nie wymaga dalszej obróbki.")
+                has_person = await self.contains_person(current_url, analysis)
+                print(f"{tag} Zawiera osobę: {has_person}")
+                if has_person:
                     return current_url
                 else:
-                    print("Zdjęcie nie zawiera osoby - pomijam.")
+                    print(f"{tag} Zdjęcie nie zawiera osoby - pomijam.")
                     return None
             
             # Send repair command to automaton
             command = f"{analysis['suggested_operation']} {current_filename}"
-            print(f"Wysyłam polecenie: {command}")
+            print(f"{tag} Wysyłam polecenie: {command}")
             
-            response = self.send_to_centrala(command)
+            response = await self.centrala_limiter.run(self.send_to_centrala, command)
             if not response:
-                print("Błąd komunikacji z automatem.")
+                print(f"{tag} Błąd komunikacji z automatem.")
                 break
                 
-            print(f"Odpowiedź automatu: {response.get('message', '')}")
+            print(f"{tag} Odpowiedź automatu: {response.get('message', '')}")
             
             # Extract new filename from response
             new_filename = self.extract_filename_from_response(response.get('message', ''))
@@ -182,22 +323,27 @@ Odpowiedz w formacie JSON:
                 # Construct new URL (assuming same base URL)
                 base_url = current_url.rsplit('/', 1)[0]
                 current_url = f"{base_url}/{new_filename}"
-                print(f"Nowy plik: {new_filename}")
-                print(f"Nowy URL: {current_url}")
+                print(f"{tag} Nowy plik: {new_filename}")
+                print(f"{tag} Nowy URL: {current_url}")
             else:
-                print("Nie udało się wyodrębnić nazwy nowego pliku.")
+                print(f"{tag} Nie udało się wyodrębnić nazwy nowego pliku.")
                 break
-            
-            # Small delay to avoid rate limits
-            time.sleep(1)
         
         # Final check of the processed image
-        final_analysis = self.analyze_image_quality(current_url)
-        if final_analysis['contains_person']:
+        if await self.contains_person(current_url):
             return current_url
         else:
             return None
     
+    async def process_photos(self, photo_urls: List[str]) -> List[Optional[str]]:
+        """Repair all photos concurrently; results keep the order of photo_urls"""
+        start_time = time.monotonic()
+        results = await asyncio.gather(
+            *(self.process_single_photo(url, url.split('/')[-1]) for url in photo_urls)
+        )
+        print(f"\nPrzetworzono {len(photo_urls)} zdjęć w {time.monotonic() - start_time:.1f}s")
+        return results
+    
     def create_barbara_description(self, photo_urls: List[str]) -> str:
         """Create detailed description of Barbara based on processed photos"""
         if not photo_urls:
@@ -239,21 +385,25 @@ Przykład dobrego rysopisu:
                 }
             ]
             
-            # Add all photos to the message
+            # Add all photos to the message (cropped to the subject and downscaled)
+            image_keys = []
             for i, url in enumerate(photo_urls):
+                image_url, image_key = self.vision_image(url, "description")
+                image_keys.append(image_key)
                 messages[0]["content"] += f"\n\nZdjęcie {i+1}:"
                 messages[1]["content"].append({
                     "type": "image_url",
-                    "image_url": {"url": url}
+                    "image_url": {"url": image_url}
                 })
             
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                max_tokens=1000
+            description = self.memoize(
+                ["barbara-v1", *image_keys],
+                lambda: client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=messages,
+                    max_tokens=1000
+                ).choices[0].message.content
             )
-            
-            description = response.choices[0].message.content
             print(f"\nWygenerowany rysopis Barbary:\n{description}")
             return description
             
@@ -297,8 +447,8 @@ Przykład dobrego rysopisu:
                     full_url = base_url + filename
                     photo_urls.append(full_url)
         
-        # Remove duplicates
-        photo_urls = list(set(photo_urls))
+        # Remove duplicates (keeping the order from the automaton's message)
+        photo_urls = list(dict.fromkeys(photo_urls))
         
         print(f"\nZnalezione zdjęcia ({len(photo_urls)}):")
         for i, url in enumerate(photo_urls, 1):
@@ -313,9 +463,10 @@ Przykład dobrego rysopisu:
         print("\n2. Przetwarzanie zdjęć...")
         barbara_photos = []
         
-        for url in photo_urls:
+        processed_urls = asyncio.run(self.process_photos(photo_urls))
+        
+        for url, processed_url in zip(photo_urls, processed_urls):
             filename = url.split('/')[-1]
-            processed_url = self.process_single_photo(url, filename)
             
             if processed_url:
                 barbara_photos.append(processed_url)
@@ -0,0 +1,187 @@
+"""
+Batch Inference - Lesson 17
+Równoległe wywołania modelu dla wielu wpisów z ponawianiem, opcjonalnym pakowaniem
+wielu linii w jedno zapytanie i dziennikiem wyników (per ID wpisu) pozwalającym wznowić przerwany przebieg.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def data_key(data):
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+
+class ResultLedger:
+    def __init__(self, path):
+        """
+        Dziennik JSONL: jeden wpis {"model", "id", "key", "result"} na sklasyfikowany wpis.
+        Wyniki są przypisane do ID wpisu; key (hash treści) pozwala użyć wyniku dla tej samej treści pod innym ID.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        # (model, ID) -> (hash treści, wynik)
+        self.by_id = {}
+        # (model, hash treści) -> wynik
+        self.by_key = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Niedopisana ostatnia linia po przerwaniu
+                        continue
+                    self.by_key[(entry['model'], entry['key'])] = entry['result']
+                    # Wpisy ze starszych dzienników nie mają ID - służą tylko jako wyniki dla treści
+                    if 'id' in entry:
+                        self.by_id[(entry['model'], entry['id'])] = (entry['key'], entry['result'])
+
+    def get(self, model, entry_id, data):
+        """Wynik zapisany dla ID (o ile treść wpisu się nie zmieniła); None gdy go nie ma"""
+        stored = self.by_id.get((model, entry_id))
+        if stored and stored[0] == data_key(data):
+            return stored[1]
+        return None
+
+    def get_by_content(self, model, data):
+        """Wynik zapisany dla tej samej treści pod dowolnym ID"""
+        return self.by_key.get((model, data_key(data)))
+
+    def record(self, model, entry_ids, data, result):
+        """Zapisuje wynik treści dla wszystkich wpisów o tej treści"""
+        key = data_key(data)
+        with self.lock:
+            self.by_key[(model, key)] = result
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for entry_id in entry_ids:
+                    self.by_id[(model, entry_id)] = (key, result)
+                    f.write(json.dumps({"model": model, "id": entry_id, "key": key, "result": result}) + '\n')
+
+
+def parse_packed_reply(reply, expected):
+    """Wyciąga listę wyników z odpowiedzi {"results": [...]} (lub samej tablicy); None gdy niepoprawna"""
+    try:
+        parsed = json.loads(reply)
+    except json.JSONDecodeError:
+        match = re.search(r'\[.*\]', reply, re.DOTALL)
+        if not match:
+            return None
+        try:
+            parsed = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return None
+
+    results = parsed.get('results') if isinstance(parsed, dict) else parsed
+    if not isinstance(results, list) or len(results) != expected:
+        return None
+    return [str(result).strip() for result in results]
+
+
+class BatchInferenceRunner:
+    def __init__(self, model, classify_one, classify_many=None, ledger_path='validation_ledger.jsonl',
+                 max_workers=8, max_retries=4, base_delay=1.0, pack_size=0):
+        """
+        classify_one(data) -> str - jedno zapytanie dla jednej linii
+        classify_many(list) -> str - jedno zapytanie dla wielu linii, odpowiedź {"results": [...]}
+        pack_size - ile linii pakować w jedno zapytanie (0 - bez pakowania)
+        """
+        self.model = model
+        self.classify_one = classify_one
+        self.classify_many = classify_many
+        self.ledger = ResultLedger(ledger_path)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.pack_size = pack_size if classify_many else 0
+
+    def with_retries(self, call, *args):
+        """Wywołuje funkcję, ponawiając błędy z wykładniczo rosnącym opóźnieniem"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return call(*args)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.base_delay * 2 ** attempt * (1 + random.random())
+                print(f"Błąd zapytania ({e}), ponawiam za {delay:.1f}s...")
+                time.sleep(delay)
+
+    def run_single(self, data, entry_ids):
+        result = self.with_retries(self.classify_one, data)
+        self.ledger.record(self.model, entry_ids, data, result)
+        return dict.fromkeys(entry_ids, result)
+
+    def run_pack(self, pack):
+        """pack - lista (treść, lista ID wpisów o tej treści)"""
+        reply = self.with_retries(self.classify_many, [data for data, _ in pack])
+        results = parse_packed_reply(reply, len(pack))
+        if results is None:
+            # Odpowiedź nie pasuje do paczki - te linie klasyfikujemy pojedynczo
+            print(f"Niepoprawna odpowiedź dla paczki {len(pack)} linii, klasyfikuję je pojedynczo")
+            merged = {}
+            for data, entry_ids in pack:
+                merged.update(self.run_single(data, entry_ids))
+            return merged
+        merged = {}
+        for (data, entry_ids), result in zip(pack, results):
+            self.ledger.record(self.model, entry_ids, data, result)
+            merged.update(dict.fromkeys(entry_ids, result))
+        return merged
+
+    def run(self, entries):
+        """
+        Klasyfikuje wpisy {ID: treść} i zwraca słownik {ID: wynik}.
+        Wpisy zapisane już w dzienniku dla tego modelu nie są wysyłane ponownie;
+        wpisy o tej samej treści (hash treści) wysyłane są jednym zapytaniem.
+        """
+        results = {}
+        # treść -> ID wpisów czekających na wynik
+        pending_ids = {}
+        reused = 0
+        for entry_id, data in entries.items():
+            cached = self.ledger.get(self.model, entry_id, data)
+            if cached is not None:
+                results[entry_id] = cached
+            else:
+                pending_ids.setdefault(data, []).append(entry_id)
+
+        # Ta sama treść sklasyfikowana wcześniej pod innym ID - zapisujemy wynik dla nowych ID
+        for data in list(pending_ids):
+            cached = self.ledger.get_by_content(self.model, data)
+            if cached is not None:
+                entry_ids = pending_ids.pop(data)
+                self.ledger.record(self.model, entry_ids, data, cached)
+                results.update(dict.fromkeys(entry_ids, cached))
+                reused += len(entry_ids)
+
+        pending = list(pending_ids.items())
+        if results:
+            print(f"Wznowienie: {len(results)} wpisów z dziennika ({reused} po treści), "
+                  f"{sum(len(ids) for _, ids in pending)} do sklasyfikowania")
+        if not pending:
+            return results
+
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if self.pack_size > 1:
+                futures = [executor.submit(self.run_pack, pending[i:i + self.pack_size])
+                           for i in range(0, len(pending), self.pack_size)]
+            else:
+                futures = [executor.submit(self.run_single, data, entry_ids) for data, entry_ids in pending]
+
+            for future in as_completed(futures):
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    # Brakujące wpisy zostaną dokończone przy następnym uruchomieniu
+                    print(f"Błąd podczas walidacji: {e}")
+
+        print(f"Sklasyfikowano {len(pending)} unikalnych linii w {time.time() - start_time:.2f}s")
+        return results
@@ -0,0 +1,216 @@
+"""
+Dataset Builder - Lesson 17
+Strumieniowe budowanie danych do finetuningu: deduplikacja po hashu linii,
+warstwowy podział train/validation, wyrównanie klas i pliki JSONL o ograniczonym rozmiarze.
+Przykłady nie są trzymane w pamięci, a hashe linii do deduplikacji trafiają do tymczasowej bazy SQLite
+na dysku - zużycie pamięci nie rośnie z rozmiarem danych.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import tempfile
+
+try:
+    import tiktoken
+    ENCODING = tiktoken.get_encoding("o200k_base")
+except ImportError:
+    # Bez tiktoken liczba tokenów jest szacowana (ok. 4 znaki na token)
+    ENCODING = None
+
+SYSTEM_PROMPT = "validate data"
+# Limit rozmiaru pliku przy przesyłaniu do OpenAI
+MAX_SHARD_BYTES = 512 * 1024 * 1024
+# Pamięć podręczna SQLite dla zbioru hashy (w KiB)
+DEDUP_CACHE_KIB = 16 * 1024
+# Narzut tokenów na wiadomość i na cały przykład w formacie czatu
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_EXAMPLE = 3
+
+
+def count_tokens(text):
+    if ENCODING:
+        return len(ENCODING.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def example_tokens(messages):
+    return TOKENS_PER_EXAMPLE + sum(TOKENS_PER_MESSAGE + count_tokens(m["content"]) for m in messages)
+
+
+def line_hash(line):
+    """64-bitowy hash linii - służy do deduplikacji i do deterministycznego losowania"""
+    return int.from_bytes(hashlib.blake2b(line.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def stream_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def labeled_lines(path, label):
+    for line in stream_lines(path):
+        yield line, label
+
+
+class DigestSet:
+    def __init__(self, directory):
+        """Zbiór 64-bitowych hashy linii w tymczasowej bazie SQLite - w pamięci jest tylko jej cache"""
+        handle, self.path = tempfile.mkstemp(prefix='dedup-', suffix='.sqlite', dir=directory)
+        os.close(handle)
+        self.db = sqlite3.connect(self.path)
+        # Baza jest jednorazowa - bez dziennika i bez fsync
+        self.db.execute("PRAGMA journal_mode=OFF")
+        self.db.execute("PRAGMA synchronous=OFF")
+        self.db.execute(f"PRAGMA cache_size=-{DEDUP_CACHE_KIB}")
+        self.db.execute("CREATE TABLE seen (digest INTEGER PRIMARY KEY) WITHOUT ROWID")
+
+    def add(self, digest):
+        """Dodaje hash; zwraca False, jeśli już był w zbiorze"""
+        # SQLite przechowuje liczby 64-bitowe ze znakiem
+        cursor = self.db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (digest - 2 ** 63,))
+        return cursor.rowcount == 1
+
+    def close(self):
+        self.db.close()
+        os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShardWriter:
+    def __init__(self, output_dir, split, max_bytes=MAX_SHARD_BYTES):
+        self.output_dir = output_dir
+        self.split = split
+        self.max_bytes = max_bytes
+        self.shards = []
+        self.file = None
+
+    def _open_next(self):
+        if self.file:
+            self.file.close()
+        path = os.path.join(self.output_dir, f"{self.split}-{len(self.shards):03d}.jsonl")
+        self.file = open(path, 'wb')
+        self.shards.append({"path": path, "examples": 0, "bytes": 0, "tokens": 0, "labels": {}})
+
+    def write(self, messages, label):
+        data = (json.dumps({"messages": messages}, ensure_ascii=False) + '\n').encode('utf-8')
+        if not self.file or (self.shards[-1]["bytes"] and self.shards[-1]["bytes"] + len(data) > self.max_bytes):
+            self._open_next()
+        self.file.write(data)
+        shard = self.shards[-1]
+        shard["examples"] += 1
+        shard["bytes"] += len(data)
+        shard["tokens"] += example_tokens(messages)
+        shard["labels"][label] = shard["labels"].get(label, 0) + 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class DatasetBuilder:
+    def __init__(self, output_dir='training_data', validation_fraction=0.1, balance=True,
+                 max_shard_bytes=MAX_SHARD_BYTES):
+        """
+        validation_fraction - część przykładów każdej klasy trafiająca do zbioru walidacyjnego
+        balance - czy przerzedzać liczniejsze klasy do liczności najmniejszej
+        """
+        self.output_dir = output_dir
+        self.validation_fraction = validation_fraction
+        self.balance = balance
+        self.max_shard_bytes = max_shard_bytes
+
+    def count_unique(self, sources):
+        """Pierwszy przebieg: liczba unikalnych linii w każdej klasie"""
+        counts = {}
+        with DigestSet(self.output_dir) as seen:
+            for path, label in sources:
+                for line in stream_lines(path):
+                    if seen.add(line_hash(line)):
+                        counts[label] = counts.get(label, 0) + 1
+        return counts
+
+    @staticmethod
+    def interleave(sources):
+        """Czyta źródła na przemian, żeby każdy plik wyjściowy zawierał wszystkie klasy"""
+        streams = [labeled_lines(path, label) for path, label in sources]
+        while streams:
+            active = []
+            for stream in streams:
+                item = next(stream, None)
+                if item is not None:
+                    active.append(stream)
+                    yield item
+            streams = active
+
+    def build(self, sources):
+        """
+        sources - lista (ścieżka pliku, etykieta), np. [('correct.txt', '1'), ('incorect.txt', '0')]
+        Zwraca manifest z opisem plików train/validation (zapisywany też jako manifest.json).
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        keep_ratio = {}
+        counts = self.count_unique(sources)
+        smallest = min(counts.values()) if counts else 0
+        for label, count in counts.items():
+            keep_ratio[label] = smallest / count if self.balance and count else 1.0
+
+        writers = {split: ShardWriter(self.output_dir, split, self.max_shard_bytes)
+                   for split in ("train", "validation")}
+        seen = DigestSet(self.output_dir)
+        stats = {"input": 0, "duplicates": 0, "dropped_for_balance": 0}
+
+        for line, label in self.interleave(sources):
+            stats["input"] += 1
+            digest = line_hash(line)
+            if not seen.add(digest):
+                stats["duplicates"] += 1
+                continue
+
+            # Hash linii wyznacza jednolicie rozłożoną liczbę 0..1 - decyzje są powtarzalne między przebiegami
+            position = (digest % 1_000_003) / 1_000_003
+            if position >= keep_ratio[label]:
+                stats["dropped_for_balance"] += 1
+                continue
+
+            # Podział w obrębie każdej klasy osobno - proporcje klas są takie same w obu zbiorach
+            split_position = ((digest >> 32) % 1_000_003) / 1_000_003
+            split = "validation" if split_position < self.validation_fraction else "train"
+            writers[split].write([
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": line},
+                {"role": "assistant", "content": label}
+            ], label)
+
+        seen.close()
+        for writer in writers.values():
+            writer.close()
+
+        manifest = {"stats": stats, "class_counts": counts,
+                    "token_counter": "tiktoken" if ENCODING else "szacunek",
+                    "train": writers["train"].shards, "validation": writers["validation"].shards}
+        with open(os.path.join(self.output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+
+def print_manifest(manifest):
+    stats = manifest["stats"]
+    print(f"Wczytano {stats['input']} linii: {stats['duplicates']} duplikatów, "
+          f"{stats['dropped_for_balance']} pominiętych dla wyrównania klas")
+    for split in ("train", "validation"):
+        for shard in manifest[split]:
+            labels = ", ".join(f"{label}: {count}" for label, count in sorted(shard["labels"].items()))
+            print(f"- {os.path.basename(shard['path'])}: {shard['examples']} przykładów ({labels}), "
+                  f"{shard['bytes'] / 1024:.1f} KB, {shard['tokens']} tokenów ({manifest['token_counter']})")
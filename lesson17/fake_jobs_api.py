@@ -0,0 +1,124 @@
+"""
+Fake Fine-tuning Jobs API - Lesson 17
+Lokalna imitacja client.fine_tuning.jobs (create/retrieve/list_events) z wirtualnym zegarem.
+Pozwala sprawdzić FineTuneJobMonitor bez wywołań OpenAI i bez czekania.
+
+Uruchomienie: python fake_jobs_api.py
+"""
+
+import os
+import tempfile
+from types import SimpleNamespace
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeFineTuningJobs:
+    def __init__(self, clock, validating=5.0, queued=20.0, training=120.0, step_interval=10.0, fail=False):
+        """
+        clock - obiekt z metodą time(); czasy etapów zadania w sekundach
+        step_interval - co ile sekund treningu pojawia się zdarzenie z krokiem treningu
+        fail - zadanie kończy się statusem failed zamiast succeeded
+        """
+        self.clock = clock
+        self.validating = validating
+        self.queued = queued
+        self.training = training
+        self.step_interval = step_interval
+        self.fail = fail
+        self.jobs = {}
+        self.retrieve_calls = 0
+        self.list_events_calls = 0
+
+    def create(self, training_file, model, suffix=None, **kwargs):
+        job_id = f"ftjob-fake{len(self.jobs) + 1}"
+        self.jobs[job_id] = {"created": self.clock.time(), "model": model, "suffix": suffix}
+        return SimpleNamespace(id=job_id, status="validating_files", fine_tuned_model=None)
+
+    def finished_at(self, job_id):
+        return self.jobs[job_id]["created"] + self.validating + self.queued + self.training
+
+    def _timeline(self, job_id):
+        """Lista (czas, poziom, komunikat) zdarzeń, które już wystąpiły"""
+        job = self.jobs[job_id]
+        start = job["created"]
+        now = self.clock.time()
+        timeline = [(start, "info", "Validating training file")]
+
+        running_at = start + self.validating + self.queued
+        if now >= start + self.validating:
+            timeline.append((start + self.validating, "info", "Files validated, moving job to queued state"))
+        if now >= running_at:
+            timeline.append((running_at, "info", "Fine-tuning job started"))
+            step = 1
+            while running_at + step * self.step_interval < min(now, self.finished_at(job_id)):
+                timeline.append((running_at + step * self.step_interval, "info", f"Step {step}: training loss=0.{99 - step}"))
+                step += 1
+        if now >= self.finished_at(job_id):
+            if self.fail:
+                timeline.append((self.finished_at(job_id), "error", "Fine-tuning job failed"))
+            else:
+                timeline.append((self.finished_at(job_id), "info", "The job has successfully completed"))
+        return timeline
+
+    def retrieve(self, job_id):
+        self.retrieve_calls += 1
+        job = self.jobs[job_id]
+        now = self.clock.time()
+        start = job["created"]
+        fine_tuned_model = None
+        if now < start + self.validating:
+            status = "validating_files"
+        elif now < start + self.validating + self.queued:
+            status = "queued"
+        elif now < self.finished_at(job_id):
+            status = "running"
+        elif self.fail:
+            status = "failed"
+        else:
+            status = "succeeded"
+            fine_tuned_model = f"ft:{job['model']}:fake:{job['suffix']}:{job_id[-5:]}"
+        return SimpleNamespace(id=job_id, status=status, fine_tuned_model=fine_tuned_model)
+
+    def list_events(self, fine_tuning_job_id, limit=20, **kwargs):
+        self.list_events_calls += 1
+        events = [
+            SimpleNamespace(id=f"ftevent-{i}", created_at=created_at, level=level, message=message)
+            for i, (created_at, level, message) in enumerate(self._timeline(fine_tuning_job_id))
+        ]
+        # Jak w API: od najnowszego
+        events.reverse()
+        return SimpleNamespace(data=events[:limit], has_more=len(events) > limit)
+
+
+if __name__ == "__main__":
+    from job_monitor import FineTuneJobMonitor
+
+    clock = VirtualClock()
+    jobs = FakeFineTuningJobs(clock)
+    state_path = os.path.join(tempfile.mkdtemp(), 'fine_tune_state.json')
+
+    job = jobs.create(training_file="file-fake", model="gpt-4o-mini-2024-07-18", suffix="research-validator")
+    monitor = FineTuneJobMonitor(jobs, state_path=state_path, sleep=clock.sleep)
+    monitor.start(job.id, "file-fake")
+
+    # Przerwanie w trakcie treningu i ponowne podłączenie nowym monitorem
+    clock.sleep(40)
+    restarted = FineTuneJobMonitor(jobs, state_path=state_path, sleep=clock.sleep)
+    print(f"Podłączono do trwającego zadania: {restarted.active_job()}")
+
+    model_name = restarted.wait_for_model(restarted.active_job())
+    latency = clock.time() - jobs.finished_at(job.id)
+    print(f"Model: {model_name}")
+    print(f"Opóźnienie wykrycia: {latency:.1f}s, zapytania: {jobs.list_events_calls} list_events, "
+          f"{jobs.retrieve_calls} retrieve")
+    print(f"Zapisany model po restarcie: {FineTuneJobMonitor(jobs, state_path=state_path).finished_model()}")
@@ -0,0 +1,116 @@
+"""
+Fine-tune Job Monitor - Lesson 17
+Śledzi zadanie finetuningu po strumieniu zdarzeń zamiast co 30 sekund pytać o status.
+Stan zadania jest zapisywany na dysku, więc po restarcie skrypt podłącza się do trwającego zadania.
+"""
+
+import os
+import json
+import time
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class FineTuneJobMonitor:
+    def __init__(self, jobs_api, state_path='fine_tune_state.json', initial_delay=1.0, max_delay=60.0,
+                 backoff=2.0, sleep=time.sleep):
+        """
+        jobs_api - obiekt z metodami retrieve(job_id) i list_events(fine_tuning_job_id, limit)
+                   (client.fine_tuning.jobs lub FakeFineTuningJobs)
+        initial_delay/max_delay/backoff - odstęp między odczytami zdarzeń: wraca do initial_delay
+                   po każdym nowym zdarzeniu i rośnie wykładniczo, gdy zdarzeń brak
+        """
+        self.jobs_api = jobs_api
+        self.state_path = state_path
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.sleep = sleep
+        self.state = self.load_state()
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self, **changes):
+        self.state.update(changes)
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+
+    def start(self, job_id, training_file=None):
+        """Zapamiętuje nowo utworzone zadanie"""
+        self.state = {}
+        self.save_state(job_id=job_id, training_file=training_file, status="created",
+                        fine_tuned_model=None, last_event_id=None)
+
+    def active_job(self):
+        """ID zapisanego zadania, które jeszcze trwa, lub None"""
+        if self.state.get('job_id') and self.state.get('status') not in TERMINAL_STATUSES:
+            return self.state['job_id']
+        return None
+
+    def finished_model(self):
+        """Nazwa modelu z zapisanego, zakończonego sukcesem zadania lub None"""
+        if self.state.get('status') == "succeeded":
+            return self.state.get('fine_tuned_model')
+        return None
+
+    def new_events(self, job_id):
+        """Zdarzenia nowsze od ostatnio widzianego, od najstarszego"""
+        last_event_id = self.state.get('last_event_id')
+        page = self.jobs_api.list_events(fine_tuning_job_id=job_id, limit=100)
+        events = []
+        # API zwraca zdarzenia od najnowszego
+        for event in page.data:
+            if event.id == last_event_id:
+                break
+            events.append(event)
+        events.reverse()
+        return events
+
+    def wait_for_model(self, job_id, on_event=None):
+        """
+        Czeka na zakończenie zadania i zwraca nazwę modelu (None, gdy zadanie się nie powiodło).
+        Status jest sprawdzany po każdej porcji nowych zdarzeń, więc model
+        jest wykrywany zaraz po pojawieniu się zdarzenia o zakończeniu.
+        """
+        delay = self.initial_delay
+        while True:
+            try:
+                events = self.new_events(job_id)
+            except Exception as e:
+                print(f"Błąd podczas pobierania zdarzeń: {e}")
+                events = []
+
+            for event in events:
+                if on_event:
+                    on_event(event)
+                else:
+                    print(f"[{event.level}] {event.message}")
+            if events:
+                self.save_state(last_event_id=events[-1].id)
+
+            # Bez nowych zdarzeń status sprawdzamy dopiero przy najdłuższym odstępie
+            if events or delay >= self.max_delay:
+                try:
+                    job = self.jobs_api.retrieve(job_id)
+                except Exception as e:
+                    print(f"Błąd podczas sprawdzania statusu: {e}")
+                    job = None
+
+                if job is not None:
+                    if job.status != self.state.get('status'):
+                        print(f"Status: {job.status}")
+                    self.save_state(status=job.status, fine_tuned_model=job.fine_tuned_model)
+                    if job.status == "succeeded" and job.fine_tuned_model:
+                        return job.fine_tuned_model
+                    if job.status in ("failed", "cancelled"):
+                        return None
+
+            delay = self.initial_delay if events else min(delay * self.backoff, self.max_delay)
+            self.sleep(delay)
@@ -1,10 +1,15 @@
 import os
-import json
+import argparse
 import requests
 from openai import OpenAI
 from dotenv import load_dotenv
 import time
 
+from ngram_classifier import NgramClassifier, load_labeled_lines, stratified_split, accuracy
+from batch_inference import BatchInferenceRunner
+from job_monitor import FineTuneJobMonitor
+from dataset_builder import DatasetBuilder, print_manifest
+
 # Ładowanie zmiennych środowiskowych
 load_dotenv('../.env')
 
@@ -12,76 +17,54 @@ load_dotenv('../.env')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 CENTRALA_API_KEY = os.getenv('CENTRALA_API_KEY')
 
+# Równoległe zapytania do modelu po finetuningu
+VALIDATION_WORKERS = 8
+# Ile linii wysyłać w jednym zapytaniu (0 - jedna linia na zapytanie, tak jak w danych treningowych)
+VALIDATION_PACK_SIZE = 0
+
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 def prepare_training_data():
-    """Przygotowuje plik JSONL z danymi do finetuningu"""
-    training_data = []
-    
-    # Wczytanie prawidłowych danych
-    with open('correct.txt', 'r', encoding='utf-8') as f:
-        correct_lines = f.readlines()
-    
-    # Wczytanie nieprawidłowych danych
-    with open('incorect.txt', 'r', encoding='utf-8') as f:
-        incorrect_lines = f.readlines()
-    
-    # Przygotowanie danych treningowych dla prawidłowych przykładów
-    for line in correct_lines:
-        line = line.strip()
-        if line:
-            training_example = {
-                "messages": [
-                    {"role": "system", "content": "validate data"},
-                    {"role": "user", "content": line},
-                    {"role": "assistant", "content": "1"}
-                ]
-            }
-            training_data.append(training_example)
-    
-    # Przygotowanie danych treningowych dla nieprawidłowych przykładów
-    for line in incorrect_lines:
-        line = line.strip()
-        if line:
-            training_example = {
-                "messages": [
-                    {"role": "system", "content": "validate data"},
-                    {"role": "user", "content": line},
-                    {"role": "assistant", "content": "0"}
-                ]
-            }
-            training_data.append(training_example)
-    
-    # Zapisanie do pliku JSONL
-    with open('training_data.jsonl', 'w', encoding='utf-8') as f:
-        for example in training_data:
-            f.write(json.dumps(example, ensure_ascii=False) + '\n')
-    
-    print(f"Przygotowano {len(training_data)} przykładów treningowych")
-    print(f"- Prawidłowe: {len(correct_lines)}")
-    print(f"- Nieprawidłowe: {len(incorrect_lines)}")
-
-def upload_training_file():
+    """
+    Buduje pliki JSONL do finetuningu strumieniowo z correct.txt i incorect.txt:
+    bez duplikatów, z wyrównanymi klasami i podziałem na train/validation (katalog training_data/).
+    Zwraca manifest z listą plików albo None, gdy dane nie mieszczą się w jednym pliku.
+    """
+    builder = DatasetBuilder()
+    manifest = builder.build([('correct.txt', '1'), ('incorect.txt', '0')])
+    print_manifest(manifest)
+    
+    # Zadanie finetuningu przyjmuje jeden plik treningowy i jeden walidacyjny
+    for split in ("train", "validation"):
+        if len(manifest[split]) > 1:
+            print(f"Błąd: dane {split} podzielono na {len(manifest[split])} pliki, a finetuning przyjmuje jeden - "
+                  f"zmniejsz zbiór danych")
+            return None
+    return manifest
+
+def upload_training_file(path):
     """Przesyła plik treningowy do OpenAI"""
     try:
-        with open('training_data.jsonl', 'rb') as f:
+        with open(path, 'rb') as f:
             response = client.files.create(
                 file=f,
                 purpose='fine-tune'
             )
-        print(f"Plik przesłany pomyślnie. ID: {response.id}")
+        print(f"Plik {os.path.basename(path)} przesłany pomyślnie. ID: {response.id}")
         return response.id
     except Exception as e:
         print(f"Błąd podczas przesyłania pliku: {e}")
         return None
 
-def create_fine_tune_job(file_id):
+def create_fine_tune_job(file_id, validation_file_id=None):
     """Tworzy zadanie finetuningu"""
     try:
+        options = {"validation_file": validation_file_id} if validation_file_id else {}
         response = client.fine_tuning.jobs.create(
             training_file=file_id,
             model="gpt-4o-mini-2024-07-18",
-            suffix="research-validator"
+            suffix="research-validator",
+            **options
         )
         print(f"Zadanie finetuningu utworzone. ID: {response.id}")
         return response.id
@@ -89,18 +72,8 @@ def create_fine_tune_job(file_id):
         print(f"Błąd podczas tworzenia zadania finetuningu: {e}")
         return None
 
-def check_fine_tune_status(job_id):
-    """Sprawdza status zadania finetuningu"""
-    try:
-        response = client.fine_tuning.jobs.retrieve(job_id)
-        return response.status, response.fine_tuned_model
-    except Exception as e:
-        print(f"Błąd podczas sprawdzania statusu: {e}")
-        return None, None
-
-def validate_with_fine_tuned_model(model_name):
-    """Waliduje dane z verify.txt używając wytrenowanego modelu"""
-    # Wczytanie danych do weryfikacji
+def load_verify_data():
+    """Wczytuje verify.txt jako słownik {ID: dane}"""
     verify_data = {}
     with open('verify.txt', 'r', encoding='utf-8') as f:
         for line in f:
@@ -108,30 +81,123 @@ def validate_with_fine_tuned_model(model_name):
             if '=' in line:
                 id_part, data_part = line.split('=', 1)
                 verify_data[id_part] = data_part
+    return verify_data
+
+def classify_with_model(model_name, data):
+    """Zwraca odpowiedź wytrenowanego modelu ("1" lub "0") dla jednej linii"""
+    response = client.chat.completions.create(
+        model=model_name,
+        messages=[
+            {"role": "system", "content": "validate data"},
+            {"role": "user", "content": data}
+        ],
+        max_tokens=10,
+        temperature=0
+    )
+    return response.choices[0].message.content.strip()
+
+def classify_many_with_model(model_name, lines):
+    """Jedno zapytanie dla wielu linii - odpowiedź w formacie {"results": ["1", "0", ...]}"""
+    numbered = "\n".join(f"{i + 1}. {data}" for i, data in enumerate(lines))
+    response = client.chat.completions.create(
+        model=model_name,
+        messages=[
+            {"role": "system", "content": "validate data\n"
+             "Oceń każdą linię osobno. Odpowiedz w JSON: {\"results\": [\"1\" lub \"0\" dla każdej linii, w kolejności]}"},
+            {"role": "user", "content": numbered}
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=10 * len(lines) + 20,
+        temperature=0
+    )
+    return response.choices[0].message.content
+
+def create_inference_runner(model_name, max_workers=VALIDATION_WORKERS, pack_size=VALIDATION_PACK_SIZE):
+    return BatchInferenceRunner(
+        model_name,
+        lambda data: classify_with_model(model_name, data),
+        lambda lines: classify_many_with_model(model_name, lines),
+        max_workers=max_workers,
+        pack_size=pack_size
+    )
+
+def validate_with_fine_tuned_model(model_name, max_workers=VALIDATION_WORKERS, pack_size=VALIDATION_PACK_SIZE):
+    """
+    Waliduje dane z verify.txt używając wytrenowanego modelu.
+    Linie są klasyfikowane równolegle, a wyniki zapisywane w validation_ledger.jsonl,
+    więc przerwany przebieg wznawia się bez ponownych zapytań.
+    """
+    # Wczytanie danych do weryfikacji
+    verify_data = load_verify_data()
+    
+    runner = create_inference_runner(model_name, max_workers, pack_size)
+    results = runner.run(verify_data)
     
     correct_ids = []
     
     for id_val, data in verify_data.items():
-        try:
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": "validate data"},
-                    {"role": "user", "content": data}
-                ],
-                max_tokens=10,
-                temperature=0
-            )
-            
-            result = response.choices[0].message.content.strip()
-            print(f"ID: {id_val}, Data: {data}, Result: {result}")
-            
-            if result == "1":
-                correct_ids.append(id_val)
-                
-        except Exception as e:
-            print(f"Błąd podczas walidacji {id_val}: {e}")
+        result = results.get(id_val)
+        if result is None:
+            print(f"ID: {id_val}, Data: {data}, brak wyniku")
+            continue
+        print(f"ID: {id_val}, Data: {data}, Result: {result}")
+        
+        if result == "1":
+            correct_ids.append(id_val)
+    
+    return correct_ids
+
+def train_local_classifier(test_fraction=0.2):
+    """
+    Trenuje lokalny klasyfikator n-gramowy na correct.txt/incorect.txt.
+    Część przykładów (z zachowaniem proporcji klas) jest odkładana do oceny.
+    Zwraca (klasyfikator, odłożone linie, ich etykiety, przewidywania klasyfikatora).
+    """
+    lines, labels = load_labeled_lines()
+    train_idx, test_idx = stratified_split(labels, test_fraction)
     
+    start_time = time.time()
+    classifier = NgramClassifier().fit([lines[i] for i in train_idx], labels[train_idx])
+    train_time = time.time() - start_time
+    
+    held_out = [lines[i] for i in test_idx]
+    held_out_labels = labels[test_idx]
+    predictions = classifier.predict(held_out)
+    
+    print(f"Lokalny klasyfikator wytrenowany na {len(train_idx)} przykładach w {train_time:.2f}s")
+    print(f"Dokładność na {len(test_idx)} odłożonych przykładach: {accuracy(predictions, held_out_labels):.1%}")
+    return classifier, held_out, held_out_labels, predictions
+
+def compare_with_fine_tuned_model(model_name, held_out, held_out_labels, local_predictions):
+    """Porównuje lokalny klasyfikator z wytrenowanym modelem na odłożonych przykładach"""
+    # Odłożone przykłady nie mają ID z verify.txt - dostają własne
+    held_out_ids = [f"held-out-{i}" for i in range(len(held_out))]
+    results = create_inference_runner(model_name).run(dict(zip(held_out_ids, held_out)))
+    # Linie bez wyniku (-1) liczą się jako błędne
+    model_predictions = [{"1": 1, "0": 0}.get(results.get(entry_id), -1) for entry_id in held_out_ids]
+    
+    print(f"Dokładność lokalnego klasyfikatora: {accuracy(local_predictions, held_out_labels):.1%}")
+    print(f"Dokładność modelu {model_name}: {accuracy(model_predictions, held_out_labels):.1%}")
+    print(f"Zgodność obu modeli: {accuracy(local_predictions, model_predictions):.1%}")
+    # Model po finetuningu widział wszystkie przykłady, także odłożone - jego wynik jest zawyżony
+    print("Uwaga: model po finetuningu był trenowany także na odłożonych przykładach")
+
+def validate_locally(classifier):
+    """Waliduje dane z verify.txt lokalnym klasyfikatorem - jedno wywołanie dla wszystkich linii"""
+    verify_data = load_verify_data()
+    ids = list(verify_data)
+    
+    start_time = time.time()
+    probabilities = classifier.predict_proba([verify_data[id_val] for id_val in ids])
+    elapsed = time.time() - start_time
+    
+    correct_ids = []
+    for id_val, probability in zip(ids, probabilities):
+        print(f"ID: {id_val}, Data: {verify_data[id_val]}, Pewność: {probability:.2f}")
+        if probability >= 0.5:
+            correct_ids.append(id_val)
+    
+    print(f"Sklasyfikowano {len(ids)} linii w {elapsed * 1000:.1f} ms")
     return correct_ids
 
 def send_answer_to_centrala(correct_ids):
@@ -155,48 +221,89 @@ def send_answer_to_centrala(correct_ids):
         print(f"Błąd podczas wysyłania odpowiedzi: {e}")
         return False
 
-def main():
+def main(use_local=False, compare_model=None, model_name=None, workers=VALIDATION_WORKERS,
+         pack_size=VALIDATION_PACK_SIZE, new_job=False):
     print("=== Zadanie Research - Fine-tuning ===")
     
-    # Krok 1: Przygotowanie danych treningowych
-    print("\n1. Przygotowywanie danych treningowych...")
-    prepare_training_data()
-    
-    # Krok 2: Przesłanie pliku treningowego
-    print("\n2. Przesyłanie pliku treningowego...")
-    file_id = upload_training_file()
-    if not file_id:
-        print("Nie udało się przesłać pliku treningowego")
+    if use_local:
+        # Wariant bez API: lokalny klasyfikator zamiast finetuningu
+        print("\n1. Trenowanie lokalnego klasyfikatora n-gramowego...")
+        classifier, held_out, held_out_labels, local_predictions = train_local_classifier()
+        
+        if compare_model:
+            print(f"\n2. Porównanie z modelem {compare_model}...")
+            compare_with_fine_tuned_model(compare_model, held_out, held_out_labels, local_predictions)
+        
+        print("\n3. Walidacja danych z verify.txt...")
+        correct_ids = validate_locally(classifier)
+        print(f"Znalezione poprawne ID: {correct_ids}")
+        
+        print("\n4. Wysyłanie odpowiedzi do centrali...")
+        if send_answer_to_centrala(correct_ids):
+            print("Zadanie zakończone pomyślnie!")
+        else:
+            print("Wystąpił błąd podczas wysyłania odpowiedzi")
         return
     
-    # Krok 3: Utworzenie zadania finetuningu
-    print("\n3. Tworzenie zadania finetuningu...")
-    job_id = create_fine_tune_job(file_id)
-    if not job_id:
-        print("Nie udało się utworzyć zadania finetuningu")
+    if model_name:
+        # Model już wytrenowany - od razu walidacja
+        print(f"\nWalidacja danych z verify.txt modelem {model_name}...")
+        correct_ids = validate_with_fine_tuned_model(model_name, workers, pack_size)
+        print(f"Znalezione poprawne ID: {correct_ids}")
+        if send_answer_to_centrala(correct_ids):
+            print("Zadanie zakończone pomyślnie!")
+        else:
+            print("Wystąpił błąd podczas wysyłania odpowiedzi")
         return
     
-    # Krok 4: Oczekiwanie na zakończenie treningu
-    print("\n4. Oczekiwanie na zakończenie treningu...")
-    print("To może potrwać od kilku minut do 2 godzin...")
+    # Stan zadania z poprzedniego uruchomienia (fine_tune_state.json)
+    monitor = FineTuneJobMonitor(client.fine_tuning.jobs)
+    model_name = None if new_job else monitor.finished_model()
+    job_id = None if new_job else monitor.active_job()
     
-    while True:
-        status, model_name = check_fine_tune_status(job_id)
-        print(f"Status: {status}")
+    if model_name:
+        print(f"\nModel wytrenowany w poprzednim uruchomieniu: {model_name}")
+    else:
+        if job_id:
+            print(f"\nPodłączam się do trwającego zadania finetuningu {job_id}")
+        else:
+            # Krok 1: Przygotowanie danych treningowych
+            print("\n1. Przygotowywanie danych treningowych...")
+            manifest = prepare_training_data()
+            if not manifest:
+                return
+            
+            # Krok 2: Przesłanie plików treningowego i walidacyjnego
+            print("\n2. Przesyłanie pliku treningowego...")
+            file_id = upload_training_file(manifest["train"][0]["path"])
+            if not file_id:
+                print("Nie udało się przesłać pliku treningowego")
+                return
+            validation_file_id = None
+            if manifest["validation"]:
+                validation_file_id = upload_training_file(manifest["validation"][0]["path"])
+            
+            # Krok 3: Utworzenie zadania finetuningu
+            print("\n3. Tworzenie zadania finetuningu...")
+            job_id = create_fine_tune_job(file_id, validation_file_id)
+            if not job_id:
+                print("Nie udało się utworzyć zadania finetuningu")
+                return
+            monitor.start(job_id, file_id)
         
-        if status == "succeeded":
-            print(f"Trening zakończony pomyślnie! Model: {model_name}")
-            break
-        elif status == "failed":
+        # Krok 4: Oczekiwanie na zakończenie treningu - śledzimy zdarzenia zadania
+        print("\n4. Oczekiwanie na zakończenie treningu...")
+        print("To może potrwać od kilku minut do 2 godzin...")
+        
+        model_name = monitor.wait_for_model(job_id)
+        if not model_name:
             print("Trening nie powiódł się!")
             return
-        else:
-            print("Trening w toku... Sprawdzam ponownie za 30 sekund")
-            time.sleep(30)
+        print(f"Trening zakończony pomyślnie! Model: {model_name}")
     
     # Krok 5: Walidacja danych
     print("\n5. Walidacja danych z verify.txt...")
-    correct_ids = validate_with_fine_tuned_model(model_name)
+    correct_ids = validate_with_fine_tuned_model(model_name, workers, pack_size)
     print(f"Znalezione poprawne ID: {correct_ids}")
     
     # Krok 6: Wysłanie odpowiedzi
@@ -209,4 +316,19 @@ def main():
         print("Wystąpił błąd podczas wysyłania odpowiedzi")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Zadanie research - walidacja danych')
+    parser.add_argument('--local', action='store_true',
+                        help='użyj lokalnego klasyfikatora n-gramowego zamiast finetuningu')
+    parser.add_argument('--compare-model', metavar='MODEL',
+                        help='(z --local) porównaj lokalny klasyfikator z podanym modelem po finetuningu')
+    parser.add_argument('--model', metavar='MODEL',
+                        help='pomiń finetuning i waliduj podanym, już wytrenowanym modelem')
+    parser.add_argument('--workers', type=int, default=VALIDATION_WORKERS,
+                        help=f'liczba równoległych zapytań przy walidacji (domyślnie {VALIDATION_WORKERS})')
+    parser.add_argument('--pack-size', type=int, default=VALIDATION_PACK_SIZE,
+                        help='ile linii wysyłać w jednym zapytaniu (domyślnie 0 - jedna linia na zapytanie)')
+    parser.add_argument('--new-job', action='store_true',
+                        help='zignoruj zapisany stan (fine_tune_state.json) i uruchom nowy finetuning')
+    args = parser.parse_args()
+    main(use_local=args.local, compare_model=args.compare_model, model_name=args.model,
+         workers=args.workers, pack_size=args.pack_size, new_job=args.new_job) 
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Side-by-side benchmark of page extraction: BeautifulSoup + html2text (previous path)
+versus lxml blocks, with and without the question token budget.
+
+Usage:
+    python benchmark_extract.py                      # crawl softo.ag3nts.org (up to --max-pages)
+    python benchmark_extract.py page1.html page2.html --question "Podaj adres email"
+"""
+
+import sys
+import time
+import argparse
+from collections import deque
+from urllib.parse import urljoin, urlparse
+
+import requests
+import html2text
+from bs4 import BeautifulSoup
+
+from page_extract import extract_page, PageTextBuilder, count_tokens
+
+BASE_URL = "https://softo.ag3nts.org"
+
+
+def markdown_extract(url, html):
+    """Previous SoftoAgent extraction: html.parser, drop script/style, html2text"""
+    converter = html2text.HTML2Text()
+    converter.ignore_links = False
+    converter.ignore_images = True
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    content = converter.handle(str(soup))
+    links = [urljoin(url, a['href']) for a in soup.find_all('a', href=True) if a.get_text(strip=True)]
+    return content, links
+
+
+def crawl(base_url, max_pages):
+    """Fetch up to max_pages pages of the site, breadth first"""
+    host = urlparse(base_url).netloc
+    queue = deque([base_url])
+    seen = {base_url}
+    pages = []
+    session = requests.Session()
+    while queue and len(pages) < max_pages:
+        url = queue.popleft()
+        try:
+            response = session.get(url, timeout=10)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Error fetching {url}: {e}")
+            continue
+        pages.append((url, response.content))
+        for link in markdown_extract(url, response.content)[1]:
+            link = link.split('#')[0]
+            if urlparse(link).netloc == host and link not in seen:
+                seen.add(link)
+                queue.append(link)
+    return pages
+
+
+def timed(function, *args, repeat=5):
+    """Best of several runs, in milliseconds"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare page extraction speed and token counts')
+    parser.add_argument('files', nargs='*', help='HTML files (default: crawl the Softo site)')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--max-pages', type=int, default=20)
+    parser.add_argument('--question', default='Podaj adres mailowy do firmy SoftoAI')
+    args = parser.parse_args()
+
+    if args.files:
+        pages = []
+        for path in args.files:
+            with open(path, 'rb') as f:
+                pages.append((f"file://{path}", f.read()))
+    else:
+        pages = crawl(args.base_url, args.max_pages)
+    if not pages:
+        print("No pages to benchmark")
+        sys.exit(1)
+
+    builder = PageTextBuilder()
+    totals = [0.0, 0.0, 0, 0, 0]
+    print(f"{'page':<45} {'bs4 ms':>8} {'lxml ms':>8} {'bs4 tok':>8} {'lxml tok':>9} {'budget tok':>11}")
+    for url, html in pages:
+        (markdown, _), old_ms = timed(markdown_extract, url, html)
+        page, new_ms = timed(extract_page, url, html)
+        old_tokens = count_tokens(markdown)
+        new_tokens = count_tokens('\n'.join(page['blocks']))
+        budget_tokens = count_tokens(builder.build(url, page, args.question))
+
+        for i, value in enumerate((old_ms, new_ms, old_tokens, new_tokens, budget_tokens)):
+            totals[i] += value
+        name = url if len(url) <= 45 else '...' + url[-42:]
+        print(f"{name:<45} {old_ms:>8.2f} {new_ms:>8.2f} {old_tokens:>8} {new_tokens:>9} {budget_tokens:>11}")
+
+    count = len(pages)
+    print(f"{'average':<45} {totals[0] / count:>8.2f} {totals[1] / count:>8.2f} "
+          f"{totals[2] / count:>8.0f} {totals[3] / count:>9.0f} {totals[4] / count:>11.0f}")
+    # The LLM reads each page twice per hop (answer check and link choice)
+    print(f"Tokens per hop (x2): {2 * totals[2] / count:.0f} -> {2 * totals[4] / count:.0f}")
+
+
+if __name__ == "__main__":
+    main()
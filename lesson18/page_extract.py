@@ -0,0 +1,149 @@
+import re
+import hashlib
+from urllib.parse import urljoin
+
+import lxml.html
+
+from relevance import stems
+
+try:
+    import tiktoken
+    ENCODING = tiktoken.get_encoding("o200k_base")
+except ImportError:
+    # Without tiktoken tokens are estimated (about 4 characters per token)
+    ENCODING = None
+
+# Elements that never carry page content
+DROP_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "head", "button"]
+# Site chrome: menus are already passed to the LLM as the list of links
+BOILERPLATE_TAGS = ["nav"]
+BOILERPLATE_PATTERN = re.compile(r'\b(nav|navbar|menu|breadcrumbs?|cookies?|skip-link|sidebar)\b', re.IGNORECASE)
+BLOCK_TAGS = ["p", "div", "section", "article", "main", "header", "footer", "aside", "li", "ul", "ol",
+              "table", "tr", "td", "th", "dl", "dt", "dd", "pre", "blockquote", "br", "address",
+              "h1", "h2", "h3", "h4", "h5", "h6"]
+# Token budget of the page text sent to the LLM
+PAGE_TOKEN_BUDGET = 1500
+
+
+def count_tokens(text):
+    if ENCODING:
+        return len(ENCODING.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def block_hash(text):
+    return hashlib.sha1(text.lower().encode('utf-8')).hexdigest()[:16]
+
+
+def extract_page(url, html, is_valid_link=lambda link_url: True):
+    """
+    Parse a page with lxml and return {'blocks': [...], 'links': [...]}.
+    Blocks are lines of visible text without scripts, menus and repeated fragments;
+    links are taken from the whole page, menus included.
+    """
+    if isinstance(html, bytes) and not html.lstrip().startswith(b'<?xml'):
+        try:
+            html = html.decode('utf-8')
+        except UnicodeDecodeError:
+            # Leave the bytes to lxml, which reads <meta charset>
+            pass
+    doc = lxml.html.fromstring(html)
+    doc.make_links_absolute(url, resolve_base_href=True)
+
+    links = []
+    seen_links = set()
+    for element, attribute, link_url, _ in doc.iterlinks():
+        if element.tag != 'a' or attribute != 'href':
+            continue
+        link_url = urljoin(url, link_url)
+        link_text = ' '.join(element.text_content().split())
+        if link_text and is_valid_link(link_url) and (link_url, link_text) not in seen_links:
+            seen_links.add((link_url, link_text))
+            links.append({'url': link_url, 'text': link_text})
+
+    for element in list(doc.iter(*DROP_TAGS, *BOILERPLATE_TAGS)):
+        element.drop_tree()
+    for element in list(doc.iter()):
+        if not isinstance(element.tag, str) or element.getparent() is None:
+            continue
+        marker = f"{element.get('class', '')} {element.get('id', '')} {element.get('role', '')}"
+        if BOILERPLATE_PATTERN.search(marker):
+            element.drop_tree()
+
+    # Keep link targets visible - the answer may be the address itself
+    for element in doc.iter('a'):
+        href = element.get('href', '')
+        if href.startswith('mailto:'):
+            href = href[len('mailto:'):]
+        text = element.text_content().strip()
+        if href and not href.startswith('javascript:') and text and text != href:
+            element.tail = f" ({href})" + (element.tail or '')
+
+    # Mark block boundaries and headings, then split the text into lines
+    for element in doc.iter(*BLOCK_TAGS):
+        prefix = '#' * int(element.tag[1]) + ' ' if element.tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6') else ''
+        element.text = '\n' + prefix + (element.text or '')
+        element.tail = '\n' + (element.tail or '')
+
+    blocks = []
+    seen_blocks = set()
+    for line in doc.text_content().split('\n'):
+        line = ' '.join(line.split())
+        if not line:
+            continue
+        digest = block_hash(line)
+        if digest in seen_blocks:
+            continue
+        seen_blocks.add(digest)
+        blocks.append(line)
+
+    return {'blocks': blocks, 'links': links}
+
+
+def relevance(text, terms):
+    """Share of question stems present in the text"""
+    if not terms:
+        return 0.0
+    return len(terms & stems(text)) / len(terms)
+
+
+class PageTextBuilder:
+    def __init__(self, token_budget=PAGE_TOKEN_BUDGET):
+        """
+        Builds the page text for the LLM.
+        Within one question's crawl, blocks repeated across pages (headers, footers) are shown only
+        on the first page they appeared on, unless they are relevant to the question.
+        """
+        self.token_budget = token_budget
+        self.block_owner = {}
+
+    def start_question(self):
+        """Forget block ownership - pages seen for earlier questions must not hide blocks now"""
+        self.block_owner.clear()
+
+    def build(self, url, page, question):
+        blocks = page.get('blocks')
+        if blocks is None:
+            # Pages stored before the lxml extraction only have markdown
+            blocks = [line for line in page.get('content', '').split('\n') if line.strip()]
+
+        terms = stems(question)
+        kept = []
+        for block in blocks:
+            owner = self.block_owner.setdefault(block_hash(block), url)
+            if owner == url or relevance(block, terms) > 0:
+                kept.append(block)
+
+        costs = [count_tokens(block) + 1 for block in kept]
+        if sum(costs) <= self.token_budget:
+            return '\n'.join(kept)
+
+        # Over budget: keep the blocks most related to the question, in page order
+        order = sorted(range(len(kept)), key=lambda i: (-relevance(kept[i], terms), i))
+        chosen = set()
+        used = 0
+        for i in order:
+            if used + costs[i] <= self.token_budget:
+                chosen.add(i)
+                used += costs[i]
+        return '\n'.join(kept[i] for i in sorted(chosen))
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag, urlparse
+
+import requests
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'softo_pages.json')
+
+# Politeness budget per host: parallel requests and minimum gap between request starts
+HOST_MAX_CONCURRENT = 2
+HOST_MIN_INTERVAL = 0.5
+# Threads fetching pages (the agent's own fetches and background prefetches)
+FETCH_WORKERS = 4
+
+
+def normalize_url(url):
+    """Drop the #fragment so the same page is stored once"""
+    return urldefrag(url)[0]
+
+
+class HostLimiter:
+    def __init__(self, max_concurrent=HOST_MAX_CONCURRENT, min_interval=HOST_MIN_INTERVAL):
+        """Limits parallel requests and request rate separately for every host"""
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.next_start = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            semaphore = self.semaphores.setdefault(host, threading.Semaphore(self.max_concurrent))
+        with semaphore:
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, self.next_start.get(host, now))
+                self.next_start[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class PageStore:
+    def __init__(self, parse_page, cache_path=CACHE_PATH, timeout=10, workers=FETCH_WORKERS):
+        """
+        parse_page(url, html) -> {'content': ..., 'links': [...]} - converts a fetched page
+        Every URL is fetched at most once per run; pages stored by earlier runs are
+        revalidated with If-None-Match/If-Modified-Since instead of being downloaded again.
+        Failed fetches (HTTP errors, timeouts) are remembered for the run and not retried.
+        """
+        self.parse_page = parse_page
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.pages = self.load()
+        # URLs already fetched or revalidated in this run
+        self.fresh = set()
+        # url -> {'status': HTTP status or None, 'error': message} for fetches that failed in this run
+        self.failures = {}
+        self.stats = {"fetched": 0, "revalidated": 0, "memory_hits": 0, "errors": 0, "failure_hits": 0,
+                      "prefetched": 0, "prefetch_hits": 0}
+        self.limiter = HostLimiter()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # url -> Future of a fetch in progress, so a page is never requested twice at once
+        self.in_flight = {}
+        self.prefetched = set()
+
+    def load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                pages = json.load(f)
+            print(f"Loaded {len(pages)} pages from {os.path.basename(self.cache_path)}")
+            return pages
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading page store: {e}")
+            return {}
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self.lock:
+            snapshot = dict(self.pages)
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+
+    def is_fresh(self, url):
+        """True if the page can be served without a network request"""
+        url = normalize_url(url)
+        return url in self.fresh or url in self.failures
+
+    def failure(self, url):
+        """Why the page could not be fetched in this run ({'status', 'error'}) or None"""
+        return self.failures.get(normalize_url(url))
+
+    def get(self, url):
+        """Return the parsed page ({'content', 'links'}) or None if it can't be fetched"""
+        url = normalize_url(url)
+        with self.lock:
+            if url in self.failures:
+                self.stats["failure_hits"] += 1
+                return None
+            if url in self.fresh:
+                self.stats["memory_hits"] += 1
+                if url in self.prefetched:
+                    self.stats["prefetch_hits"] += 1
+                    self.prefetched.discard(url)
+                return self.pages.get(url)
+            future = self._submit(url)
+        # A page being prefetched right now is awaited instead of requested again
+        page = future.result()
+        with self.lock:
+            if url in self.prefetched:
+                self.stats["prefetch_hits"] += 1
+                self.prefetched.discard(url)
+        return page
+
+    def prefetch(self, urls):
+        """Start fetching pages in the background; get() later returns them without waiting"""
+        with self.lock:
+            for url in urls:
+                url = normalize_url(url)
+                if url in self.fresh or url in self.failures or url in self.in_flight:
+                    continue
+                self.prefetched.add(url)
+                self.stats["prefetched"] += 1
+                self._submit(url)
+
+    def _submit(self, url):
+        """Must be called with self.lock held"""
+        future = self.in_flight.get(url)
+        if future is None:
+            future = self.executor.submit(self._fetch, url)
+            self.in_flight[url] = future
+        return future
+
+    def _fetch(self, url):
+        with self.lock:
+            stored = self.pages.get(url)
+
+        headers = {}
+        if stored:
+            if stored.get('etag'):
+                headers['If-None-Match'] = stored['etag']
+            if stored.get('last_modified'):
+                headers['If-Modified-Since'] = stored['last_modified']
+
+        try:
+            with self.limiter.slot(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if stored and response.status_code == 304:
+                with self.lock:
+                    self.fresh.add(url)
+                    self.stats["revalidated"] += 1
+                    self.in_flight.pop(url, None)
+                return stored
+            response.raise_for_status()
+            page = self.parse_page(url, response.content)
+        except Exception as e:
+            print(f"Error fetching {url}: {e}")
+            status = e.response.status_code if getattr(e, 'response', None) is not None else None
+            with self.lock:
+                self.failures[url] = {"status": status, "error": str(e)}
+                self.stats["errors"] += 1
+                self.in_flight.pop(url, None)
+                self.prefetched.discard(url)
+            return None
+
+        page['etag'] = response.headers.get('ETag')
+        page['last_modified'] = response.headers.get('Last-Modified')
+        page['fetched_at'] = time.time()
+        with self.lock:
+            self.pages[url] = page
+            self.fresh.add(url)
+            self.stats["fetched"] += 1
+            self.in_flight.pop(url, None)
+        return page
+
+    def links(self, url):
+        """Outgoing links of a stored page (the link graph shared by all questions)"""
+        page = self.pages.get(normalize_url(url))
+        return page['links'] if page else []
+
+    def close(self):
+        """Stop background prefetches that haven't started yet"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,130 @@
+import re
+import math
+from urllib.parse import urlparse
+
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+# Prefix length used as a stem - enough to match Polish inflected forms (firma/firmy, adres/adresu)
+STEM_LENGTH = 4
+STOPWORDS = {
+    "jaki", "jaka", "jakie", "jakich", "jakim", "który", "która", "które", "gdzie", "kiedy", "czy", "jest",
+    "są", "się", "oraz", "lub", "dla", "przez", "podaj", "proszę", "mnie", "nam", "ten", "tej", "tego",
+    "the", "and", "what", "which", "how", "dwa", "dwie", "trzy",
+}
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(\.[\w-]+)+')
+URL_PATTERN = re.compile(r'https?://[^\s)\]"\'<>]+', re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r'\b\d[\d\s.,/-]*\d\b|\b\d\b')
+
+# Question words hinting at the expected answer type
+ANSWER_TYPES = {
+    "email": re.compile(r'e-?mail|mailow', re.IGNORECASE),
+    "url": re.compile(r'\bwww\b|\burl\b|adres\w* stron|link|interfejs\w* webow|witryn', re.IGNORECASE),
+    "number": re.compile(r'\bile\b|liczb|numer|telefon|\brok\w*\b|kiedy', re.IGNORECASE),
+}
+
+# Pages at or above this score go to the LLM
+PAGE_SCORE_THRESHOLD = 0.35
+# Terms present on more than this share of known pages (menu words) or in the site's host name
+# (the company name) carry little weight
+COMMON_TERM_SHARE = 0.6
+COMMON_TERM_WEIGHT = 0.2
+
+
+def stems(text):
+    return {word.lower()[:STEM_LENGTH] for word in WORD_PATTERN.findall(text)
+            if len(word) > 2 and word.lower() not in STOPWORDS}
+
+
+def expected_answer_types(question):
+    return [answer_type for answer_type, pattern in ANSWER_TYPES.items() if pattern.search(question)]
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class RelevanceScorer:
+    def __init__(self, site_host, embed=None, threshold=PAGE_SCORE_THRESHOLD):
+        """
+        site_host - host of the crawled site; only links to other hosts count as URL answers
+        embed(texts) -> list of vectors - optional embedding function blended into page scores
+        """
+        self.site_host = site_host
+        self.site_terms = stems(site_host.replace('.', ' '))
+        self.embed = embed
+        self.threshold = threshold
+        # How many known pages contain each stem
+        self.document_frequency = {}
+        self.documents = set()
+        self.embedding_cache = {}
+
+    def observe(self, url, text):
+        """Count the page's stems once, so terms common to the whole site get a lower weight"""
+        if url in self.documents:
+            return
+        self.documents.add(url)
+        for stem in stems(text):
+            self.document_frequency[stem] = self.document_frequency.get(stem, 0) + 1
+
+    def term_weight(self, stem):
+        if stem in self.site_terms:
+            return COMMON_TERM_WEIGHT
+        if len(self.documents) < 3:
+            return 1.0
+        share = self.document_frequency.get(stem, 0) / len(self.documents)
+        return COMMON_TERM_WEIGHT if share > COMMON_TERM_SHARE else 1.0
+
+    def overlap(self, question, text):
+        """Weighted share of question stems present in the text"""
+        terms = stems(question)
+        if not terms:
+            return 0.0
+        present = stems(text)
+        total = sum(self.term_weight(term) for term in terms)
+        return sum(self.term_weight(term) for term in terms if term in present) / total
+
+    def has_answer_type(self, answer_type, text):
+        if answer_type == "email":
+            return bool(EMAIL_PATTERN.search(text))
+        if answer_type == "url":
+            return any(urlparse(url).netloc not in ('', self.site_host) for url in URL_PATTERN.findall(text))
+        if answer_type == "number":
+            return bool(NUMBER_PATTERN.search(text))
+        return False
+
+    def embedding(self, text):
+        if text not in self.embedding_cache:
+            self.embedding_cache[text] = self.embed([text])[0]
+        return self.embedding_cache[text]
+
+    def score_page(self, question, url, text):
+        """
+        0..1 estimate that the page can answer the question: expected answer type present
+        (email/external URL/number) and overlap with the question's terms.
+        """
+        self.observe(url, text)
+        score = self.overlap(question, text)
+
+        answer_types = expected_answer_types(question)
+        if answer_types:
+            type_hit = any(self.has_answer_type(answer_type, text) for answer_type in answer_types)
+            score = 0.5 * type_hit + 0.5 * score
+
+        if self.embed and text:
+            try:
+                score = 0.7 * score + 0.3 * max(0.0, cosine(self.embedding(question), self.embedding(text[:8000])))
+            except Exception as e:
+                print(f"Error computing embeddings: {e}")
+        return score
+
+    def score_link(self, question, link, page_score=None):
+        """Score of a link: its text and address, or the target page's score if it is already known"""
+        link_score = self.overlap(question, f"{link['text']} {urlparse(link['url']).path.replace('/', ' ')}")
+        if page_score is not None:
+            return max(page_score, link_score)
+        return link_score
+
+    def passes(self, score):
+        return score >= self.threshold
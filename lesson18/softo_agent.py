@@ -6,11 +6,27 @@ import html2text
 from openai import OpenAI
 from dotenv import load_dotenv
 from urllib.parse import urljoin, urlparse
-import time
+
+from page_store import PageStore
+from relevance import RelevanceScorer
+
+try:
+    from page_extract import extract_page, PageTextBuilder
+    LXML_AVAILABLE = True
+except ImportError:
+    # Without lxml pages are converted to full markdown with BeautifulSoup/html2text
+    LXML_AVAILABLE = False
 
 # Load environment variables
 load_dotenv('../../3rd-devs/.env')
 
+# How many unvisited links of the current page to fetch in the background while the LLM decides
+PREFETCH_LINKS = 3
+# How many pages rejected by the local relevance filter to show the LLM before giving up
+FALLBACK_PAGES = 2
+# Blend OpenAI embeddings into the local relevance score (one extra embedding call per page)
+USE_EMBEDDINGS = False
+
 class SoftoAgent:
     def __init__(self):
         self.api_key = os.getenv('PERSONAL_API_KEY')
@@ -21,6 +37,14 @@ class SoftoAgent:
         self.html_converter = html2text.HTML2Text()
         self.html_converter.ignore_links = False
         self.html_converter.ignore_images = True
+        # Pages and their links are shared by all questions and stored between runs
+        self.pages = PageStore(self.parse_page)
+        # Question-ranked page text within a token budget, repeated blocks shown once
+        self.page_text = PageTextBuilder() if LXML_AVAILABLE else None
+        # Local page scoring decides which pages and links need the LLM
+        self.scorer = RelevanceScorer(urlparse(self.base_url).netloc,
+                                      embed=self.embed if USE_EMBEDDINGS else None)
+        self.llm_stats = {"answer": 0, "link": 0, "skipped": 0, "direct": 0}
         
     def fetch_questions(self):
         """Fetch questions from centrala API"""
@@ -34,41 +58,60 @@ class SoftoAgent:
             return None
     
     def fetch_page_content(self, url):
-        """Fetch and convert HTML page to markdown"""
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # Parse HTML and convert to markdown
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Convert to markdown
-            markdown_content = self.html_converter.handle(str(soup))
-            
-            # Extract links for navigation
-            links = []
-            for link in soup.find_all('a', href=True):
-                href = link.get('href')
-                if href:
-                    full_url = urljoin(url, href)
-                    link_text = link.get_text(strip=True)
-                    if link_text and self.is_valid_link(full_url):
-                        links.append({
-                            'url': full_url,
-                            'text': link_text
-                        })
-            
-            return {
-                'content': markdown_content,
-                'links': links
-            }
-        except Exception as e:
-            print(f"Error fetching {url}: {e}")
-            return None
+        """Return page markdown and links, fetching the page at most once per run"""
+        return self.pages.get(url)
+    
+    def parse_page(self, url, html):
+        """Extract page text blocks and links"""
+        if LXML_AVAILABLE:
+            return extract_page(url, html, self.is_valid_link)
+        return self.parse_page_markdown(url, html)
+    
+    def parse_page_markdown(self, url, html):
+        """Convert HTML page to markdown and extract links"""
+        # Parse HTML and convert to markdown
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        # Convert to markdown
+        markdown_content = self.html_converter.handle(str(soup))
+        
+        # Extract links for navigation
+        links = []
+        for link in soup.find_all('a', href=True):
+            href = link.get('href')
+            if href:
+                full_url = urljoin(url, href)
+                link_text = link.get_text(strip=True)
+                if link_text and self.is_valid_link(full_url):
+                    links.append({
+                        'url': full_url,
+                        'text': link_text
+                    })
+        
+        return {
+            'content': markdown_content,
+            'links': links
+        }
+    
+    def page_content(self, url, page_data, question):
+        """Page text passed to the LLM for this question"""
+        if self.page_text:
+            return self.page_text.build(url, page_data, question)
+        return self.raw_page_text(page_data)
+    
+    @staticmethod
+    def raw_page_text(page_data):
+        """Whole page text without the budget and block ownership - used to score pages not yet visited"""
+        return page_data.get('content') or '\n'.join(page_data.get('blocks', []))
+    
+    def embed(self, texts):
+        """Embeddings for the relevance scorer"""
+        response = self.openai_client.embeddings.create(model="text-embedding-3-small", input=texts)
+        return [item.embedding for item in response.data]
     
     def is_valid_link(self, url):
         """Check if link is valid for navigation"""
@@ -184,14 +227,48 @@ Wybierz link, który najprawdopodobniej doprowadzi do odpowiedzi na pytanie.
             print(f"Raw response: {response_text if 'response_text' in locals() else 'No response'}")
             return None
     
+    def rank_links(self, question, links, lookahead=PREFETCH_LINKS):
+        """
+        Order links by local relevance, best first. The top `lookahead` links are scored
+        by their raw page content (they are being prefetched), the rest by link text and address.
+        Scoring does not go through the page text builder, so look-ahead pages do not take
+        ownership of repeated blocks.
+        Returns a list of (link, score, page_known).
+        """
+        by_text = sorted(links, key=lambda link: -self.scorer.score_link(question, link))
+        ranked = []
+        for i, link in enumerate(by_text):
+            page_score = None
+            if i < lookahead:
+                page = self.fetch_page_content(link['url'])
+                if page:
+                    page_score = self.scorer.score_page(question, link['url'], self.raw_page_text(page))
+            ranked.append((link, self.scorer.score_link(question, link, page_score), page_score is not None))
+        ranked.sort(key=lambda item: -item[1])
+        return ranked
+    
+    def check_page_with_llm(self, page_content, question):
+        """Ask the LLM about a page; returns the answer or None"""
+        self.llm_stats["answer"] += 1
+        llm_response = self.ask_llm_for_answer(page_content, question)
+        print(f"LLM analysis: {llm_response['reasoning']}")
+        if llm_response['has_answer'] and llm_response['answer']:
+            print(f"Found answer: {llm_response['answer']}")
+            return llm_response['answer']
+        return None
+    
     def search_for_answer(self, question, max_depth=5):
         """Search for answer to a specific question"""
         print(f"\nSearching for answer to: {question}")
         
-        # Reset visited URLs for each question
+        # Reset visited URLs and block ownership for each question (fetched pages stay in self.pages)
         self.visited_urls.clear()
+        if self.page_text:
+            self.page_text.start_question()
         current_url = self.base_url
         depth = 0
+        # Pages not shown to the LLM: (score, content), checked as a last resort
+        skipped_pages = []
         
         while depth < max_depth:
             print(f"Depth {depth}: Visiting {current_url}")
@@ -208,28 +285,44 @@ Wybierz link, który najprawdopodobniej doprowadzi do odpowiedzi na pytanie.
                 print("Failed to fetch page content")
                 break
             
-            # Ask LLM if page contains answer
-            llm_response = self.ask_llm_for_answer(page_data['content'], question)
-            print(f"LLM analysis: {llm_response['reasoning']}")
+            # Filter out already visited links and fetch the most promising ones in the background
+            unvisited_links = [link for link in page_data['links'] if link['url'] not in self.visited_urls]
+            unvisited_links.sort(key=lambda link: -self.scorer.score_link(question, link))
+            self.pages.prefetch([link['url'] for link in unvisited_links[:PREFETCH_LINKS]])
+            
+            page_content = self.page_content(current_url, page_data, question)
+            page_score = self.scorer.score_page(question, current_url, page_content)
             
-            if llm_response['has_answer'] and llm_response['answer']:
-                print(f"Found answer: {llm_response['answer']}")
-                return llm_response['answer']
+            # Ask LLM if page contains answer - only for pages that look relevant locally
+            if self.scorer.passes(page_score):
+                answer = self.check_page_with_llm(page_content, question)
+                if answer:
+                    return answer
+            else:
+                print(f"Skipping LLM answer check (relevance {page_score:.2f})")
+                self.llm_stats["skipped"] += 1
+                skipped_pages.append((page_score, page_content))
             
-            # If no answer, ask LLM which link to follow
+            # If no answer, choose the next link
             if page_data['links']:
-                # Filter out already visited links
-                unvisited_links = [link for link in page_data['links'] if link['url'] not in self.visited_urls]
-                
                 if not unvisited_links:
                     print("No unvisited links available")
                     break
                 
-                next_url = self.ask_llm_for_link(page_data['content'], question, unvisited_links)
+                ranked = self.rank_links(question, unvisited_links)
+                best_link, best_score, page_known = ranked[0]
+                if page_known and self.scorer.passes(best_score):
+                    # The target page is already fetched and looks relevant - no need to ask the LLM
+                    print(f"Following {best_link['url']} (relevance {best_score:.2f})")
+                    self.llm_stats["direct"] += 1
+                    next_url = best_link['url']
+                else:
+                    self.llm_stats["link"] += 1
+                    next_url = self.ask_llm_for_link(page_content, question, [link for link, _, _ in ranked])
                 if next_url:
+                    # Request pacing per host is handled by the page store
                     current_url = next_url
                     depth += 1
-                    time.sleep(1)  # Be respectful to the server
                 else:
                     print("LLM couldn't select a link")
                     break
@@ -237,6 +330,14 @@ Wybierz link, który najprawdopodobniej doprowadzi do odpowiedzi na pytanie.
                 print("No links available on page")
                 break
         
+        # The local filter may have been wrong - check the best skipped pages before giving up
+        skipped_pages.sort(key=lambda item: -item[0])
+        for page_score, page_content in skipped_pages[:FALLBACK_PAGES]:
+            print(f"Checking skipped page with LLM (relevance {page_score:.2f})")
+            answer = self.check_page_with_llm(page_content, question)
+            if answer:
+                return answer
+        
         print(f"Could not find answer after {depth} steps")
         return None
     
@@ -287,6 +388,17 @@ Wybierz link, który najprawdopodobniej doprowadzi do odpowiedzi na pytanie.
                     print(f"No answer found for question {question_id}")
                     answers[question_id] = "Nie znaleziono odpowiedzi"
         
+        self.pages.close()
+        self.pages.save()
+        stats = self.pages.stats
+        print(f"\nPages: {stats['fetched']} fetched, {stats['revalidated']} revalidated (304), "
+              f"{stats['memory_hits']} served from memory, {len(self.pages.pages)} in store, "
+              f"{stats['errors']} failed ({stats['failure_hits']} repeated requests skipped)")
+        print(f"Prefetch: {stats['prefetched']} pages started, {stats['prefetch_hits']} used by the agent")
+        llm = self.llm_stats
+        print(f"LLM calls: {llm['answer']} answer checks, {llm['link']} link choices; "
+              f"{llm['skipped']} pages skipped and {llm['direct']} links followed by local relevance")
+        
         print(f"\n{'='*50}")
         print("Final answers:")
         for qid, ans in answers.items():
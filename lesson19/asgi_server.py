@@ -0,0 +1,151 @@
+"""
+Produkcyjny serwer webhooka: aplikacja ASGI (Starlette) z asynchronicznymi handlerami,
+uruchamiana przez uvicorn w kilku procesach (workerach).
+Zapytania do LLM nie blokują workera - w tym czasie obsługuje on kolejne instrukcje.
+
+Uruchomienie:
+    python asgi_server.py                      # worker na każdy rdzeń, port 5000
+    python asgi_server.py --workers 8 --port 8000
+    LLM_STUB=1 python asgi_server.py           # lokalna atrapa LLM (testy obciążenia)
+"""
+
+import os
+import time
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+
+import uvicorn
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from navigation import (GRID, LLM_MODEL, SYSTEM_PROMPT, build_llm_prompt, position_from_reply,
+                        create_instruction_cache, read_drones, resolve_positions, build_response, test_payload)
+from llm_stub import StubLLM, stub_enabled
+
+# Ładowanie zmiennych środowiskowych z różnych lokalizacji
+load_dotenv()  # Current directory
+load_dotenv("../.env")  # Parent directory
+
+# Jeden worker na rdzeń - handlery są asynchroniczne, więc worker nie czeka bezczynnie na LLM
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Limit czasu odpowiedzi LLM - Centrala czeka na webhook najwyżej 15 s
+LLM_TIMEOUT = 10
+
+# Każdy worker ma własną pamięć instrukcji i własnego klienta LLM
+instruction_cache = create_instruction_cache()
+stub_llm = StubLLM() if stub_enabled() else None
+client = None
+
+
+async def parse_with_llm(instruction, start=None):
+    """Oblicza końcową pozycję drona przy pomocy LLM; None gdy odpowiedź jest nieczytelna"""
+    try:
+        if stub_llm:
+            result = await stub_llm.complete_async(instruction)
+        else:
+            response = await client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": build_llm_prompt(instruction, start)}
+                ],
+                temperature=0,
+                timeout=LLM_TIMEOUT
+            )
+            result = response.choices[0].message.content.strip()
+        print(f"LLM response for '{instruction}': {result}")
+        return position_from_reply(result)
+    except Exception as e:
+        print(f"Error parsing instruction: {e}")
+        return None
+
+
+async def parse_movement_instructions(drones):
+    """Parser regułowy i pamięć odpowiedzi dla wszystkich dronów naraz, LLM równolegle dla niejednoznacznych"""
+    # Parsowanie i symulacja dużych partii dronów poza pętlą zdarzeń
+    positions = await asyncio.to_thread(resolve_positions, drones, instruction_cache)
+    unresolved = [i for i, position in enumerate(positions) if position is None]
+    if not unresolved:
+        return positions
+
+    replies = await asyncio.gather(*(parse_with_llm(*drones[i]) for i in unresolved))
+    llm_positions = []
+    for i, position in zip(unresolved, replies):
+        instruction, start = drones[i]
+        if position is None:
+            # Błędu LLM nie zapamiętujemy - dron zostaje na starcie, następnym razem spróbujemy ponownie
+            positions[i] = start
+        else:
+            positions[i] = position
+            if start == GRID.start:
+                llm_positions.append((instruction, position))
+    # Tylko pamięć procesu - zapis na dysk odbywa się w tle
+    instruction_cache.put_many(llm_positions)
+    return positions
+
+
+async def webhook(request):
+    """Endpoint webhook przyjmujący instrukcje ruchu drona (jednego lub wielu)"""
+    start_time = time.perf_counter()
+    try:
+        data = await request.json()
+        drones = read_drones(data)
+        if not drones:
+            return JSONResponse({"description": "znacznik"})
+
+        final_positions = await parse_movement_instructions(drones)
+        return JSONResponse(build_response(data, final_positions),
+                            headers={"Server-Timing": f"app;dur={(time.perf_counter() - start_time) * 1000:.2f}"})
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        print(f"Error in webhook: {e}")
+        return JSONResponse({"description": "znacznik"})
+
+
+async def test(request):
+    """Test endpoint"""
+    # Mapa jest zserializowana raz przy starcie
+    return Response(test_payload(instruction_cache, "stub" if stub_llm else LLM_MODEL),
+                    media_type='application/json', headers={"X-Worker-Pid": str(os.getpid())})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global client
+    if not stub_llm:
+        if not os.getenv('OPENAI_API_KEY'):
+            print("Warning: OPENAI_API_KEY not set - ambiguous instructions will fall back to the start position")
+        client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY', 'missing'))
+    yield
+    if client:
+        await client.close()
+
+
+app = Starlette(routes=[
+    Route('/webhook', webhook, methods=['POST']),
+    Route('/test', test, methods=['GET']),
+], lifespan=lifespan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Production ASGI webhook server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', DEFAULT_WORKERS)))
+    args = parser.parse_args()
+
+    print(f"Starting ASGI webhook server on port {args.port} with {args.workers} workers"
+          f"{' (LLM stub)' if stub_llm else ''}...")
+    print(f"Map: {GRID.name} ({GRID.rows}x{GRID.cols}, start {GRID.start})")
+    # Workery startują jako osobne procesy i importują aplikację po nazwie
+    uvicorn.run("asgi_server:app", host=args.host, port=args.port, workers=args.workers,
+                log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
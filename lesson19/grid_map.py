@@ -0,0 +1,133 @@
+"""
+Silnik mapy N x M dla drona: mapa wczytywana z pliku JSON do tablic NumPy
+(indeks opisu dla każdego pola + lista unikalnych opisów), symulacja ruchów
+wielu dronów naraz i gotowy (zserializowany raz) JSON mapy dla /test.
+
+Format pliku mapy:
+    {"name": "...", "start": [0, 0], "cells": [["znacznik", "dom", ...], ...]}
+"""
+
+import json
+import hashlib
+
+import numpy as np
+
+from movement_parser import apply_moves
+
+
+class GridMap:
+    def __init__(self, cells, start=(0, 0), name="map"):
+        """cells - lista wierszy z opisami pól (wszystkie wiersze tej samej długości)"""
+        if not cells or not cells[0]:
+            raise ValueError("Map has no cells")
+        self.rows = len(cells)
+        self.cols = len(cells[0])
+        if any(len(row) != self.cols for row in cells):
+            raise ValueError("Map rows must have the same length")
+        self.name = name
+        self.start = tuple(start)
+        if not self.contains(self.start):
+            raise ValueError(f"Start position {self.start} is outside the {self.rows}x{self.cols} map")
+
+        # Każdy opis zapisany raz; pole trzyma tylko jego indeks
+        self.labels = []
+        index = {}
+        codes = []
+        for row in cells:
+            for label in row:
+                if label not in index:
+                    index[label] = len(self.labels)
+                    self.labels.append(label)
+                codes.append(index[label])
+        dtype = np.uint16 if len(self.labels) <= np.iinfo(np.uint16).max else np.uint32
+        self.cells = np.array(codes, dtype=dtype).reshape(self.rows, self.cols)
+        self.label_array = np.array(self.labels, dtype=object)
+        self.upper = np.array([self.rows - 1, self.cols - 1])
+        # Ruch "do krawędzi" to ruch o więcej pól, niż ma mapa
+        self.edge_steps = max(self.rows, self.cols)
+        self._map_json = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data["cells"], start=data.get("start", (0, 0)), name=data.get("name", path))
+
+    @property
+    def fingerprint(self):
+        """Identyfikator zawartości mapy - pozycje zapamiętane dla innej mapy są nieważne"""
+        digest = hashlib.sha1(f"{self.rows}x{self.cols}:{self.start}".encode('utf-8'))
+        digest.update(self.cells.tobytes())
+        digest.update('\n'.join(self.labels).encode('utf-8'))
+        return digest.hexdigest()[:12]
+
+    def contains(self, position):
+        row, col = position
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def describe(self, position):
+        if not self.contains(position):
+            return "nieznane"
+        return self.labels[self.cells[position]]
+
+    def describe_many(self, positions):
+        """Opisy wielu pozycji jednym indeksowaniem tablicy"""
+        if not positions:
+            return []
+        points = np.array(positions, dtype=np.int64).reshape(-1, 2)
+        inside = ((points >= 0) & (points <= self.upper)).all(axis=1)
+        clipped = np.clip(points, 0, self.upper)
+        labels = self.label_array[self.cells[clipped[:, 0], clipped[:, 1]]]
+        return [label if ok else "nieznane" for label, ok in zip(labels.tolist(), inside.tolist())]
+
+    def simulate(self, move_lists, starts=None):
+        """
+        Końcowe pozycje dronów. move_lists - listy ruchów z movement_parser.parse_moves.
+        Kolejny ruch wszystkich dronów liczony jest jedną operacją na tablicy,
+        więc koszt rośnie z liczbą ruchów, a nie z rozmiarem mapy.
+        """
+        starts = [tuple(start) for start in starts] if starts else [self.start] * len(move_lists)
+        if len(move_lists) == 1:
+            # Dla jednego drona zwykła pętla jest szybsza niż budowanie tablic
+            return [apply_moves(move_lists[0], self.rows, self.cols, starts[0])]
+        if not move_lists:
+            return []
+
+        # Ruchy spisane w płaskie listy i wpisane do tablic jednym przypisaniem
+        move_steps, move_drones, move_deltas = [], [], []
+        reset_steps, reset_drones = [], []
+        for drone, moves in enumerate(move_lists):
+            for step, move in enumerate(moves):
+                if move == 'reset':
+                    reset_steps.append(step)
+                    reset_drones.append(drone)
+                    continue
+                (d_row, d_col), count, edge = move
+                steps = self.edge_steps if edge else (count if count is not None else 1)
+                move_steps.append(step)
+                move_drones.append(drone)
+                move_deltas.append((d_row * steps, d_col * steps))
+
+        length = max(len(moves) for moves in move_lists)
+        deltas = np.zeros((length, len(move_lists), 2), dtype=np.int64)
+        resets = np.zeros((length, len(move_lists)), dtype=bool)
+        if move_deltas:
+            deltas[move_steps, move_drones] = move_deltas
+        resets[reset_steps, reset_drones] = True
+
+        origin = np.array(starts, dtype=np.int64)
+        positions = origin.copy()
+        for step in range(length):
+            # Ruchy poza mapę zatrzymują się na krawędzi
+            positions = np.clip(positions + deltas[step], 0, self.upper)
+            if resets[step].any():
+                positions[resets[step]] = origin[resets[step]]
+        return [tuple(position) for position in positions.tolist()]
+
+    def map_json(self):
+        """Mapa {"wiersz,kolumna": opis} jako gotowy JSON (bajty), budowana tylko raz"""
+        if self._map_json is None:
+            cells = {f"{row},{col}": self.labels[self.cells[row, col]]
+                     for row in range(self.rows) for col in range(self.cols)}
+            self._map_json = json.dumps(cells, ensure_ascii=False).encode('utf-8')
+        return self._map_json
@@ -0,0 +1,170 @@
+"""
+Pamięć odpowiedzi webhooka: znormalizowana instrukcja -> końcowa pozycja drona.
+Centrala powtarza te same instrukcje, więc o każdą niejednoznaczną pytamy LLM tylko raz.
+"""
+
+import os
+import json
+import atexit
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    # Windows - zapisy workerów nie są wtedy szeregowane blokadą pliku
+    fcntl = None
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instruction_cache.json')
+CACHE_MAX_SIZE = 1024
+# Zmiany trafiają na dysk w tle, najwyżej raz na tyle sekund
+SAVE_INTERVAL = 5.0
+
+
+def normalize_instruction(instruction):
+    """Instrukcje różniące się tylko wielkością liter i białymi znakami mają ten sam klucz"""
+    return ' '.join(instruction.split()).lower()
+
+
+class InstructionCache:
+    def __init__(self, max_size=CACHE_MAX_SIZE, cache_path=CACHE_PATH, namespace='', save_interval=SAVE_INTERVAL):
+        """
+        LRU instrukcja -> (wiersz, kolumna).
+        cache_path=None - tylko pamięć procesu, bez zapisu na dysk.
+        namespace - np. identyfikator mapy; pozycje zapisane dla innej mapy nie są używane.
+        save_interval - opóźnienie zapisu zmian na dysk (zapis w wątku w tle, nie w obsłudze żądania).
+        """
+        self.max_size = max_size
+        self.cache_path = cache_path
+        self.prefix = f"{namespace}|" if namespace else ''
+        self.save_interval = save_interval
+
+        self.lock = threading.Lock()
+        # Zapis w tle i zapis przy zamknięciu procesu nie mogą się wyprzedzić
+        self.save_lock = threading.RLock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.save_timer = None
+        self.load()
+        if self.cache_path:
+            # Zmiany czekające na zapis nie giną przy zamknięciu procesu
+            atexit.register(self.flush)
+
+    def read_file(self):
+        """Wpisy zapisane na dysku (także przez inne workery)"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def load(self):
+        if not self.cache_path:
+            return
+        try:
+            stored = self.read_file()
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading instruction cache: {e}")
+            return
+        for key, position in stored.items():
+            self.entries[key] = tuple(position)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        if self.entries:
+            print(f"Loaded {len(self.entries)} cached instructions from {os.path.basename(self.cache_path)}")
+
+    def save(self):
+        """
+        Dopisuje wpisy tego procesu do pliku. Plik jest najpierw wczytywany, więc workery
+        serwera ASGI nie nadpisują sobie nawzajem zapamiętanych pozycji.
+        """
+        if not self.cache_path:
+            return
+        with self.save_lock, open(f"{self.cache_path}.lock", 'w') as lock_file:
+            with self.lock:
+                self.dirty = False
+                own = [(key, list(position)) for key, position in self.entries.items()]
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                merged = self.read_file()
+            except (OSError, json.JSONDecodeError):
+                merged = {}
+            for key, position in own:
+                merged.pop(key, None)
+                merged[key] = position
+            # Najstarsze wpisy (na początku) odpadają po przekroczeniu limitu
+            merged = dict(list(merged.items())[-self.max_size:]) if self.max_size else {}
+            # Zapis przez plik tymczasowy, żeby przerwany zapis nie zostawił uszkodzonego JSON-a
+            temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+
+    def flush(self):
+        """Zapisuje zmiany, jeśli jakieś czekają (po zakończeniu trwającego zapisu)"""
+        with self.save_lock:
+            with self.lock:
+                self.save_timer = None
+                if not self.dirty:
+                    return
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Error saving instruction cache: {e}")
+
+    def schedule_save(self):
+        """Zapis w wątku w tle po save_interval; kolejne zmiany w tym czasie trafią do tego samego zapisu"""
+        with self.lock:
+            if self.save_timer is not None:
+                return
+            self.save_timer = threading.Timer(self.save_interval, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def key(self, instruction):
+        return self.prefix + normalize_instruction(instruction)
+
+    def get(self, instruction):
+        """Pozycja z pamięci albo None"""
+        key = self.key(instruction)
+        with self.lock:
+            position = self.entries.get(key)
+            if position is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return position
+
+    def put(self, instruction, position):
+        self.put_many([(instruction, position)])
+
+    def put_many(self, items):
+        """Zapamiętuje pary (instrukcja, pozycja); na dysk trafiają później, w tle"""
+        if not items:
+            return
+        with self.lock:
+            for instruction, position in items:
+                key = self.key(instruction)
+                self.entries[key] = tuple(position)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            self.dirty = True
+        if self.cache_path:
+            self.schedule_save()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "persistent": bool(self.cache_path),
+            }
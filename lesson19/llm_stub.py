@@ -0,0 +1,40 @@
+"""
+Lokalna atrapa LLM do testów obciążenia: odpowiada po zadanym opóźnieniu
+pozycją z korpusu instrukcji, bez zapytań do OpenAI.
+Włączana zmienną LLM_STUB=1 (opóźnienie w sekundach: LLM_STUB_DELAY, domyślnie 0.8).
+"""
+
+import os
+import json
+import time
+import asyncio
+
+from instruction_cache import normalize_instruction
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instructions_corpus.json')
+STUB_DELAY = 0.8
+
+
+def stub_enabled():
+    return os.getenv('LLM_STUB', '') not in ('', '0')
+
+
+class StubLLM:
+    def __init__(self, corpus_path=CORPUS_PATH, delay=None):
+        self.delay = float(os.getenv('LLM_STUB_DELAY', STUB_DELAY)) if delay is None else delay
+        with open(corpus_path, 'r', encoding='utf-8') as f:
+            self.answers = {normalize_instruction(case["instruction"]): tuple(case["expected_position"])
+                            for case in json.load(f)}
+
+    def reply(self, instruction):
+        """Odpowiedź w formacie modelu: '(wiersz, kolumna)'"""
+        row, col = self.answers.get(normalize_instruction(instruction), (0, 0))
+        return f"({row}, {col})"
+
+    def complete(self, instruction):
+        time.sleep(self.delay)
+        return self.reply(instruction)
+
+    async def complete_async(self, instruction):
+        await asyncio.sleep(self.delay)
+        return self.reply(instruction)
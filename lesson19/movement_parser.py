@@ -0,0 +1,162 @@
+"""
+Parser instrukcji ruchu drona oparty na regułach.
+Rozumie polskie liczebniki, kierunki, ruchy "na sam dół"/"do końca w prawo"
+oraz sekwencje ruchów. Zwraca None, gdy instrukcja jest niejednoznaczna albo zawiera
+nieznane słowo - wtedy decyduje LLM.
+"""
+
+import re
+import unicodedata
+
+# Litery, których NFKD nie rozkłada na literę bazową i znak diakrytyczny
+SPECIAL_FOLDS = str.maketrans({'ł': 'l', 'Ł': 'L'})
+
+TOKEN_PATTERN = re.compile(r'\d+|\w+|[,;.!?]')
+
+NUMBERS = {
+    'jeden': 1, 'jedno': 1, 'jedna': 1, 'jednego': 1, 'jednym': 1, 'raz': 1, 'pojedyncze': 1,
+    'dwa': 2, 'dwie': 2, 'dwoch': 2, 'dwoma': 2, 'dwu': 2, 'dwukrotnie': 2,
+    'trzy': 3, 'trzech': 3, 'trzema': 3, 'trzykrotnie': 3,
+    'cztery': 4, 'czterech': 4, 'czterema': 4,
+    'piec': 5, 'pieciu': 5, 'szesc': 6, 'szesciu': 6, 'siedem': 7, 'siedmiu': 7,
+    'osiem': 8, 'osmiu': 8, 'dziewiec': 9, 'dziewieciu': 9, 'dziesiec': 10, 'dziesieciu': 10,
+}
+
+# (zmiana wiersza, zmiana kolumny)
+DIRECTIONS = {
+    'prawo': (0, 1), 'prawa': (0, 1), 'prawej': (0, 1), 'wschod': (0, 1),
+    'lewo': (0, -1), 'lewa': (0, -1), 'lewej': (0, -1), 'zachod': (0, -1),
+    'dol': (1, 0), 'dolu': (1, 0), 'nizej': (1, 0), 'poludnie': (1, 0),
+    'gore': (-1, 0), 'gora': (-1, 0), 'gory': (-1, 0), 'wyzej': (-1, 0), 'polnoc': (-1, 0),
+}
+
+# Ruch aż do krawędzi mapy: "na sam dół", "do końca w prawo", "maksymalnie w lewo"
+EDGE_WORDS = {'sam', 'sama', 'samo', 'samego', 'samej', 'samiusienki', 'maksymalnie', 'maksa', 'koniec',
+              'konca', 'krawedz', 'krawedzi', 'oporu', 'granicy', 'skraju', 'brzegu'}
+
+# Powrót do punktu startowego
+RESET_WORDS = {'start', 'startu', 'startowe', 'startowy', 'startowego', 'poczatek', 'poczatku'}
+
+# Powrót zapisany czasownikiem - pewny tylko razem z celem: "wróciłem na start"
+RETURN_WORDS = {'wroc', 'wrocilem', 'wrocilam', 'wracam', 'powrot'}
+
+# Granice kolejnych ruchów
+SEPARATORS = {',', ';', '.', '!', '?', 'potem', 'nastepnie', 'pozniej', 'czym', 'oraz', 'i', 'a', 'dalej'}
+
+# Poprawki i nieokreślone odległości - takie instrukcje oddajemy do LLM
+AMBIGUOUS_WORDS = {'nie', 'jednak', 'zart', 'zartowalem', 'zapomnij', 'cofam', 'pomylilem', 'czekaj',
+                   'albo', 'lub', 'kilka', 'kilku', 'pare', 'troche', 'wiele', 'sporo'}
+
+# Słowa bez znaczenia dla ruchu; każde inne nieznane słowo oddaje instrukcję do LLM
+FILLER_WORDS = {
+    'w', 'we', 'na', 'do', 'o', 'po', 'z',
+    'pole', 'pola', 'pol', 'polu', 'kratke', 'kratki', 'kratek', 'razy', 'lot',
+    'lec', 'lece', 'lecimy', 'lecial', 'leciala', 'lecialem', 'lecialam',
+    'polec', 'polecial', 'poleciala', 'polecialem', 'polecialam', 'przelecialem', 'przelecialam',
+    'ruszam', 'zaczynam',
+}
+
+
+def fold(text):
+    """Małe litery bez polskich znaków: 'Dół' -> 'dol'"""
+    decomposed = unicodedata.normalize('NFKD', text.translate(SPECIAL_FOLDS))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(instruction):
+    return TOKEN_PATTERN.findall(fold(instruction))
+
+
+def word_follows(tokens, start, words):
+    """Czy przed końcem bieżącego ruchu pojawia się jeszcze słowo z podanego zbioru"""
+    for token in tokens[start:]:
+        if token in SEPARATORS:
+            return False
+        if token in words:
+            return True
+    return False
+
+
+def direction_follows(tokens, start):
+    return word_follows(tokens, start, DIRECTIONS)
+
+
+def parse_moves(instruction):
+    """
+    Zamienia instrukcję na listę ruchów [(kierunek, liczba pól lub None, do krawędzi)]
+    lub 'reset' dla powrotu na start. Zwraca None, gdy instrukcji nie da się pewnie zinterpretować.
+    """
+    tokens = tokenize(instruction)
+    if any(token in AMBIGUOUS_WORDS for token in tokens):
+        return None
+
+    moves = []
+    count = None
+    edge = False
+    # Ruch, do którego może się jeszcze odnieść określenie "do końca" stojące za kierunkiem
+    open_move = None
+
+    for i, token in enumerate(tokens):
+        if token in SEPARATORS:
+            if count is not None or edge:
+                # Liczba lub "do końca" bez kierunku: "w prawo, trzy"
+                return None
+            open_move = None
+        elif token.isdigit() or token in NUMBERS:
+            number = int(token) if token.isdigit() else NUMBERS[token]
+            if count is not None:
+                return None
+            if open_move is not None and not direction_follows(tokens, i + 1):
+                if moves[open_move][1] is not None:
+                    # Druga liczba dla tego samego ruchu: "w dół dwa pola w prawo jedno"
+                    return None
+                # Liczba za kierunkiem: "w prawo dwa pola", "w dół dwukrotnie"
+                moves[open_move] = (moves[open_move][0], number, False)
+            else:
+                count = number
+        elif token in EDGE_WORDS:
+            if open_move is not None and moves[open_move][1] is None:
+                direction, _, _ = moves[open_move]
+                moves[open_move] = (direction, None, True)
+            else:
+                edge = True
+        elif token in DIRECTIONS:
+            moves.append((DIRECTIONS[token], count, edge and count is None))
+            open_move = len(moves) - 1
+            count, edge = None, False
+        elif token in RESET_WORDS:
+            moves.append('reset')
+            count, edge, open_move = None, False, None
+        elif token in RETURN_WORDS:
+            # "i wróć" bez celu - nie wiadomo, dokąd dron wraca
+            if not word_follows(tokens, i + 1, RESET_WORDS):
+                return None
+        elif token not in FILLER_WORDS:
+            # Nieznane słowo może zmieniać sens ruchu ("zawróć", "ominąłem") - decyduje LLM
+            return None
+
+    if not moves or count is not None or edge:
+        return None
+    return moves
+
+
+def apply_moves(moves, rows, cols, start=(0, 0)):
+    """Wykonuje ruchy na mapie rows x cols; ruchy poza mapę zatrzymują się na krawędzi"""
+    row, col = start
+    for move in moves:
+        if move == 'reset':
+            row, col = start
+            continue
+        (d_row, d_col), count, edge = move
+        steps = max(rows, cols) if edge else (count if count is not None else 1)
+        row = min(max(row + d_row * steps, 0), rows - 1)
+        col = min(max(col + d_col * steps, 0), cols - 1)
+    return row, col
+
+
+def parse_instruction(instruction, rows=4, cols=4, start=(0, 0)):
+    """Końcowa pozycja (wiersz, kolumna) lub None, gdy potrzebny jest LLM"""
+    moves = parse_moves(instruction)
+    if moves is None:
+        return None
+    return apply_moves(moves, rows, cols, start)
@@ -0,0 +1,158 @@
+"""
+Wspólna logika serwerów webhook: mapa, odczyt żądań (jeden dron lub wiele), prompt dla LLM
+i odczyt pozycji z odpowiedzi.
+Używana przez serwer deweloperski Flask (webhook_server.py) i produkcyjny serwer ASGI (asgi_server.py).
+"""
+
+import os
+import re
+import json
+
+from grid_map import GridMap
+from instruction_cache import InstructionCache
+from movement_parser import parse_moves
+
+# Mapa wczytywana z pliku (DRONE_MAP - ścieżka do innej mapy N x M)
+MAP_PATH = os.getenv('DRONE_MAP') or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                   'maps', 'centrala_4x4.json')
+GRID = GridMap.load(MAP_PATH)
+
+LLM_MODEL = "gpt-4"
+SYSTEM_PROMPT = "Jesteś ekspertem od nawigacji dronów. Analizujesz instrukcje ruchu i obliczasz pozycje na mapie."
+# Do takiego rozmiaru prompt zawiera pełną siatkę współrzędnych
+PROMPT_GRID_LIMIT = 36
+
+POSITION_PATTERN = re.compile(r'\((\d+),\s*(\d+)\)')
+
+
+def coordinates_text(grid):
+    """Opis układu współrzędnych mapy dla LLM"""
+    if grid.rows * grid.cols > PROMPT_GRID_LIMIT:
+        return (f"    - wiersze od 0 (góra) do {grid.rows - 1} (dół)\n"
+                f"    - kolumny od 0 (lewo) do {grid.cols - 1} (prawo)")
+    lines = []
+    for row in range(grid.rows):
+        cells = ' '.join(f"({row},{col})" for col in range(grid.cols))
+        note = " (góra)" if row == 0 else " (dół)" if row == grid.rows - 1 else ""
+        lines.append(f"    - {cells}  <- wiersz {row}{note}")
+    return '\n'.join(lines)
+
+
+def build_llm_prompt(instruction, start=None):
+    """Prompt dla LLM do analizy instrukcji"""
+    start = start or GRID.start
+    corner = " w lewym górnym rogu" if tuple(start) == (0, 0) else ""
+    return f"""
+    Dron startuje na pozycji ({start[0]}, {start[1]}){corner} mapy {GRID.rows}x{GRID.cols}.
+
+    Mapa ma współrzędne:
+{coordinates_text(GRID)}
+
+    Kierunki:
+    - W prawo = zwiększ drugą współrzędną (kolumnę)
+    - W lewo = zmniejsz drugą współrzędną (kolumnę)
+    - W dół = zwiększ pierwszą współrzędną (wiersz)
+    - W górę = zmniejsz pierwszą współrzędną (wiersz)
+
+    Instrukcja ruchu: "{instruction}"
+
+    Przeanalizuj instrukcję i oblicz końcową pozycję drona.
+    Odpowiedz TYLKO współrzędnymi w formacie: (wiersz, kolumna)
+
+    Przykłady (start w (0, 0)):
+    - "poleciałem jedno pole w prawo" -> (0, 1)
+    - "poleciałem dwa pola w dół" -> (2, 0)
+    - "poleciałem jedno pole w prawo, potem jedno w dół" -> (1, 1)
+    """
+
+
+def position_from_reply(reply):
+    """Współrzędne z odpowiedzi LLM; None gdy odpowiedź jest nieczytelna albo poza mapą"""
+    match = POSITION_PATTERN.search(reply)
+    if match:
+        position = (int(match.group(1)), int(match.group(2)))
+        if GRID.contains(position):
+            return position
+    return None
+
+
+def create_instruction_cache():
+    """
+    Pamięć instrukcji wg INSTRUCTION_CACHE:
+    domyślnie z zapisem na dysk, 'memory' - tylko w procesie, 'off' - wyłączona (np. do testów obciążenia)
+    """
+    mode = os.getenv('INSTRUCTION_CACHE', 'disk')
+    if mode == 'off':
+        return InstructionCache(max_size=0, cache_path=None)
+    if mode == 'memory':
+        return InstructionCache(cache_path=None, namespace=GRID.fingerprint)
+    return InstructionCache(namespace=GRID.fingerprint)
+
+
+def read_drones(data):
+    """
+    Lista (instrukcja, start) z żądania:
+        {"instruction": "..."}                                   - jeden dron (format Centrali)
+        {"instructions": ["...", ...]}                            - wiele instrukcji ze startu mapy
+        {"drones": [{"instruction": "...", "start": [w, k]}, ...]} - wiele dronów z własnymi startami
+    Zwraca None, gdy w żądaniu nie ma instrukcji; ValueError przy błędnych danych.
+    """
+    if not isinstance(data, dict):
+        return None
+    if 'instruction' in data:
+        return [(str(data['instruction']), GRID.start)]
+    if 'instructions' in data:
+        return [(str(instruction), GRID.start) for instruction in data['instructions']]
+    if 'drones' in data:
+        drones = []
+        for drone in data['drones']:
+            if not isinstance(drone, dict) or 'instruction' not in drone:
+                raise ValueError(f"Drone without instruction: {drone}")
+            start = tuple(drone.get('start', GRID.start))
+            if len(start) != 2 or not all(isinstance(value, int) for value in start) or not GRID.contains(start):
+                raise ValueError(f"Invalid start position: {drone.get('start')}")
+            drones.append((str(drone['instruction']), start))
+        return drones
+    return None
+
+
+def resolve_positions(drones, cache):
+    """
+    Pozycje końcowe z parsera regułowego (wszystkie drony symulowane razem) i z pamięci odpowiedzi LLM.
+    None tam, gdzie instrukcję musi zinterpretować LLM.
+    Wyniki parsera nie trafiają do pamięci - policzenie ich od nowa jest tańsze niż zapis.
+    """
+    positions = [None] * len(drones)
+    pending = []
+    for i, (instruction, start) in enumerate(drones):
+        moves = parse_moves(instruction)
+        if moves is not None:
+            pending.append((i, moves))
+        elif start == GRID.start:
+            # Pamięć dotyczy tylko lotów ze startu mapy
+            positions[i] = cache.get(instruction)
+
+    if pending:
+        simulated = GRID.simulate([moves for _, moves in pending], [drones[i][1] for i, _ in pending])
+        for (i, _), position in zip(pending, simulated):
+            positions[i] = position
+    return positions
+
+
+def build_response(data, positions):
+    """Odpowiedź w formacie żądania: opis, lista opisów albo pozycje i opisy dronów"""
+    descriptions = GRID.describe_many(positions)
+    if 'instruction' in data:
+        return {"description": descriptions[0]}
+    if 'instructions' in data:
+        return {"descriptions": descriptions}
+    return {"drones": [{"position": list(position), "description": description}
+                       for position, description in zip(positions, descriptions)]}
+
+
+def test_payload(cache, llm):
+    """Odpowiedź /test: mapa serializowana raz przy starcie, doklejane tylko bieżące statystyki"""
+    status = json.dumps({"name": GRID.name, "rows": GRID.rows, "cols": GRID.cols, "llm": llm,
+                         "cache": cache.stats()}, ensure_ascii=False)
+    return (b'{"status": "Server is running", "map": ' + GRID.map_json() + b', '
+            + status[1:].encode('utf-8'))
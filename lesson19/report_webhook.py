@@ -99,15 +99,8 @@ def main():
         webhook_url = tunnel.get_webhook_url()
         print(f"\n🎯 Automatyczny URL webhook: {webhook_url}")
         
-        # Przetestuj tunnel
-        try:
-            test_response = requests.get(f"{tunnel.tunnel_url}/test", timeout=10)
-            if test_response.status_code == 200:
-                print("✅ Tunnel działa poprawnie")
-            else:
-                print(f"⚠️  Tunnel zwraca status {test_response.status_code}")
-        except Exception as e:
-            print(f"⚠️  Nie udało się przetestować tunnel: {e}")
+        # start_tunnel kończy się dopiero, gdy /test odpowiada przez tunel - można od razu zgłaszać
+        print(f"✅ Tunnel {tunnel.provider} działa poprawnie (gotowy po {tunnel.startup_time:.1f} s)")
         
         # Zgłoś do Centrali
         report_webhook_url(webhook_url)
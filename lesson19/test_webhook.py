@@ -1,38 +1,65 @@
-import requests
+import os
+import sys
 import json
+import time
+import asyncio
+import argparse
+import requests
+
+from movement_parser import parse_instruction
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instructions_corpus.json')
+
+def load_corpus(path=CORPUS_PATH):
+    """Wczytuje korpus instrukcji z oczekiwanymi pozycjami"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# Centrala czeka na odpowiedź webhooka najwyżej 15 s
+REQUEST_TIMEOUT = 15
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def test_parser_corpus(corpus=None):
+    """
+    Sprawdza parser regułowy na korpusie instrukcji (bez serwera i bez LLM).
+    Działa też pod pytest: błędna pozycja kończy test niepowodzeniem.
+    """
+    corpus = corpus or load_corpus()
+    print("🧪 Testing rule-based parser on instruction corpus...")
+    
+    passed = failed = needs_llm = 0
+    latencies = []
+    for case in corpus:
+        start_time = time.perf_counter()
+        position = parse_instruction(case["instruction"])
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        
+        if position is None:
+            needs_llm += 1
+            status = "✅ LLM" if case.get("needs_llm") else "❌ FAIL - parser gave up"
+            if not case.get("needs_llm"):
+                failed += 1
+            print(f"{status}: {case['instruction']}")
+        elif position == tuple(case["expected_position"]):
+            passed += 1
+        else:
+            failed += 1
+            print(f"❌ FAIL: {case['instruction']} -> {position}, expected {tuple(case['expected_position'])}")
+    
+    print(f"Parser: {passed} passed, {failed} failed, {needs_llm} sent to LLM (of {len(corpus)})")
+    print(f"Latency: p50 {percentile(latencies, 0.5):.3f} ms, p95 {percentile(latencies, 0.95):.3f} ms")
+    assert failed == 0, f"{failed} corpus instructions parsed incorrectly"
 
-def test_webhook(base_url="http://localhost:5000"):
+def check_webhook(base_url="http://localhost:5000"):
     """
-    Testuje webhook lokalnie
+    Testuje webhook lokalnie (wymaga uruchomionego serwera, więc nie jest zbierany przez pytest).
+    Zwraca True, gdy wszystkie odpowiedzi są poprawne.
     """
     
-    test_cases = [
-        {
-            "instruction": "poleciałem jedno pole w prawo",
-            "expected_position": (0, 1),
-            "expected_description": "pień drzewa"
-        },
-        {
-            "instruction": "poleciałem dwa pola w prawo",
-            "expected_position": (0, 2), 
-            "expected_description": "drzewo"
-        },
-        {
-            "instruction": "poleciałem jedno pole w dół",
-            "expected_position": (1, 0),
-            "expected_description": "trawa"
-        },
-        {
-            "instruction": "poleciałem jedno pole w prawo, potem jedno w dół",
-            "expected_position": (1, 1),
-            "expected_description": "wiatrak"
-        },
-        {
-            "instruction": "poleciałem dwa pola w dół, potem dwa w prawo",
-            "expected_position": (2, 2),
-            "expected_description": "skały"
-        }
-    ]
+    test_cases = load_corpus()
     
     print("🧪 Testing webhook locally...")
     print(f"Base URL: {base_url}")
@@ -42,14 +69,18 @@ def test_webhook(base_url="http://localhost:5000"):
         response = requests.get(f"{base_url}/test")
         print(f"✅ Status endpoint: {response.status_code}")
         print(f"Response: {response.json()}")
+        map_json = response.json()["map"]
     except Exception as e:
         print(f"❌ Status endpoint failed: {e}")
-        return
+        return False
     
     print("\n" + "="*50)
     print("Testing webhook endpoint...")
+    failures = 0
     
     for i, test_case in enumerate(test_cases, 1):
+        row, col = test_case["expected_position"]
+        test_case["expected_description"] = map_json.get(f"{row},{col}")
         print(f"\n🔸 Test {i}: {test_case['instruction']}")
         
         payload = {"instruction": test_case["instruction"]}
@@ -68,16 +99,124 @@ def test_webhook(base_url="http://localhost:5000"):
                 if description == test_case["expected_description"]:
                     print("✅ PASS")
                 else:
+                    failures += 1
                     print("❌ FAIL - description mismatch")
             else:
+                failures += 1
                 print(f"❌ HTTP Error: {response.status_code}")
                 print(f"Response: {response.text}")
                 
         except Exception as e:
+            failures += 1
             print(f"❌ Request failed: {e}")
     
+    # Powtórzone instrukcje powinny trafiać w pamięć serwera
+    try:
+        cache = requests.get(f"{base_url}/test").json().get("cache")
+        if cache:
+            print(f"\n🗄️ Instruction cache: {cache['hits']} hits, {cache['misses']} misses, "
+                  f"hit ratio {cache['hit_ratio']:.0%}, {cache['size']} entries")
+    except Exception as e:
+        print(f"❌ Cache stats failed: {e}")
+    
     print("\n" + "="*50)
-    print("Testing complete!")
+    print(f"Testing complete! {failures} failed of {len(test_cases)}")
+    return failures == 0
+
+async def send_instruction(session, base_url, case, expected, results):
+    """Jedno żądanie testu obciążenia: zapisuje czas i wynik"""
+    start_time = time.perf_counter()
+    try:
+        async with session.post(f"{base_url}/webhook", json={"instruction": case["instruction"]}) as response:
+            body = await response.json()
+            latency = (time.perf_counter() - start_time) * 1000
+            if response.status != 200:
+                results.append(("http_error", latency))
+            elif body.get("description") != expected:
+                results.append(("wrong", latency))
+            else:
+                results.append(("ok", latency))
+    except asyncio.TimeoutError:
+        results.append(("timeout", (time.perf_counter() - start_time) * 1000))
+    except Exception:
+        results.append(("http_error", (time.perf_counter() - start_time) * 1000))
+
+async def run_load(base_url, corpus, map_json, rps, duration):
+    """
+    Odtwarza korpus w pętli ze stałym tempem rps (otwarta pętla: kolejne żądania
+    wysyłane są według harmonogramu, niezależnie od tego, czy poprzednie już wróciły)
+    """
+    # aiohttp potrzebny jest tylko w teście obciążenia
+    import aiohttp
+    
+    total = int(rps * duration)
+    results = []
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        tasks = []
+        start_time = time.perf_counter()
+        for i in range(total):
+            delay = start_time + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            case = corpus[i % len(corpus)]
+            row, col = case["expected_position"]
+            expected = map_json.get(f"{row},{col}")
+            tasks.append(asyncio.create_task(send_instruction(session, base_url, case, expected, results)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start_time
+    return results, elapsed
+
+def load_test(base_url="http://localhost:5000", rps=50, duration=10):
+    """
+    Test obciążenia: korpus instrukcji wysyłany z zadanym tempem.
+    Serwer uruchom z atrapą LLM, żeby nie płacić za zapytania:
+        LLM_STUB=1 INSTRUCTION_CACHE=off python asgi_server.py
+    """
+    corpus = load_corpus()
+    print(f"🚀 Load test: {base_url}, {rps} req/s for {duration} s")
+    try:
+        status = requests.get(f"{base_url}/test", timeout=5).json()
+    except Exception as e:
+        print(f"❌ Status endpoint failed: {e}")
+        return False
+    print(f"Server LLM: {status.get('llm', 'unknown')}")
+    
+    results, elapsed = asyncio.run(run_load(base_url, corpus, status["map"], rps, duration))
+    
+    counts = {outcome: 0 for outcome in ("ok", "wrong", "http_error", "timeout")}
+    for outcome, _ in results:
+        counts[outcome] += 1
+    latencies = [latency for _, latency in results]
+    errors = counts["http_error"] + counts["timeout"]
+    
+    print(f"Sent {len(results)} requests in {elapsed:.1f} s ({len(results) / elapsed:.1f} req/s)")
+    print(f"✅ OK: {counts['ok']}, ❌ wrong description: {counts['wrong']}, "
+          f"❌ HTTP errors: {counts['http_error']}, ⏱️ timeouts: {counts['timeout']}")
+    print(f"Error rate: {errors / len(results):.2%}, wrong answers: {counts['wrong'] / len(results):.2%}")
+    print(f"Latency: p50 {percentile(latencies, 0.5):.1f} ms, p95 {percentile(latencies, 0.95):.1f} ms, "
+          f"p99 {percentile(latencies, 0.99):.1f} ms, max {max(latencies):.1f} ms")
+    return errors == 0
 
 if __name__ == "__main__":
-    test_webhook() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Test parsera i webhooka drona')
+    parser.add_argument('base_url', nargs='?', default="http://localhost:5000")
+    parser.add_argument('--offline', action='store_true', help='tylko parser na korpusie (bez serwera)')
+    parser.add_argument('--load', type=float, metavar='RPS', help='test obciążenia z zadanym tempem żądań')
+    parser.add_argument('--duration', type=float, default=10, help='czas testu obciążenia w sekundach')
+    args = parser.parse_args()
+    
+    if args.load:
+        sys.exit(0 if load_test(args.base_url, args.load, args.duration) else 1)
+    
+    ok = True
+    try:
+        test_parser_corpus()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        ok = False
+    if not args.offline:
+        print("\n" + "="*50)
+        ok = check_webhook(args.base_url) and ok
+    sys.exit(0 if ok else 1)
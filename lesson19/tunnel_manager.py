@@ -1,17 +1,40 @@
 #!/usr/bin/env python3
 import subprocess
 import sys
+import re
 import time
+import queue
+import shutil
+import signal
+import threading
 import requests
 import json
 import os
 from pathlib import Path
 
+# Kolejność, w jakiej startujemy tunele (wszystkie naraz - wygrywa pierwszy działający)
+PROVIDERS = ['ngrok', 'localtunnel', 'cloudflared']
+
+# Komunikaty, w których narzędzia podają publiczny URL
+URL_PATTERNS = {
+    'ngrok': re.compile(r'url=(https?://\S+)'),
+    'localtunnel': re.compile(r'your url is: (https://\S+)'),
+    'cloudflared': re.compile(r'(https://[-\w]+\.trycloudflare\.com)'),
+}
+
+# Najdłuższy czas oczekiwania na działający tunel
+STARTUP_TIMEOUT = 30
+# Co ile sekund sprawdzamy ngrok API i czy tunel już przekazuje ruch
+POLL_INTERVAL = 0.2
+HEALTH_PATH = '/test'
+
 class TunnelManager:
     def __init__(self, port=5000):
         self.port = port
         self.tunnel_url = None
         self.tunnel_process = None
+        self.provider = None
+        self.startup_time = None
     
     def check_ngrok(self):
         """Sprawdza czy ngrok jest zainstalowany"""
@@ -44,47 +67,33 @@ class TunnelManager:
         print("4. Uruchom ponownie ten skrypt")
         return False
     
+    def provider_command(self, provider):
+        """Komenda uruchamiająca tunel"""
+        if provider == 'ngrok':
+            # Log na stdout - URL pojawia się w linii "started tunnel"
+            return ['ngrok', 'http', str(self.port), '--log', 'stdout', '--log-format', 'logfmt']
+        if provider == 'localtunnel':
+            return ['npx', 'localtunnel', '--port', str(self.port)]
+        return ['cloudflared', 'tunnel', '--url', f'http://localhost:{self.port}']
+    
+    def is_available(self, provider):
+        """Sprawdza czy narzędzie tunelu jest zainstalowane"""
+        if provider == 'ngrok':
+            if self.check_ngrok():
+                return True
+            return sys.platform == 'win32' and self.install_ngrok_windows()
+        if provider == 'localtunnel':
+            return shutil.which('npx') is not None
+        return shutil.which('cloudflared') is not None
+    
     def start_ngrok(self):
         """Uruchamia ngrok tunnel"""
-        if not self.check_ngrok():
-            if sys.platform == 'win32':
-                if not self.install_ngrok_windows():
-                    return False
-            else:
-                print("❌ ngrok nie jest zainstalowany")
-                return False
-        
-        print(f"🚀 Uruchamiam ngrok na porcie {self.port}...")
-        
-        try:
-            # Uruchom ngrok w tle
-            self.tunnel_process = subprocess.Popen(
-                ['ngrok', 'http', str(self.port)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            # Czekaj na uruchomienie
-            time.sleep(3)
-            
-            # Pobierz URL z ngrok API
-            tunnel_url = self.get_ngrok_url()
-            if tunnel_url:
-                self.tunnel_url = tunnel_url
-                print(f"✅ Ngrok uruchomiony: {tunnel_url}")
-                return True
-            else:
-                print("❌ Nie udało się pobrać URL ngrok")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Błąd uruchamiania ngrok: {e}")
-            return False
+        return self.start_tunnel(['ngrok'])
     
     def get_ngrok_url(self):
         """Pobiera URL tunelu z ngrok API"""
         try:
-            response = requests.get('http://127.0.0.1:4040/api/tunnels')
+            response = requests.get('http://127.0.0.1:4040/api/tunnels', timeout=1)
             data = response.json()
             
             for tunnel in data['tunnels']:
@@ -96,92 +105,144 @@ class TunnelManager:
     
     def start_localtunnel(self):
         """Alternatywa - localtunnel przez npx"""
-        print(f"🔄 Próbuję localtunnel jako alternatywę...")
-        
-        try:
-            # Sprawdź czy jest npx/npm
-            subprocess.run(['npx', '--version'], capture_output=True, check=True)
-            
-            print(f"🚀 Uruchamiam localtunnel na porcie {self.port}...")
-            
-            # Uruchom localtunnel
-            self.tunnel_process = subprocess.Popen(
-                ['npx', 'localtunnel', '--port', str(self.port)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Czekaj na URL
-            time.sleep(5)
-            
-            # Sprawdź output
-            output = self.tunnel_process.stdout.readline()
-            if 'https://' in output:
-                self.tunnel_url = output.strip().split()[-1]
-                print(f"✅ Localtunnel uruchomiony: {self.tunnel_url}")
-                return True
-            
-            return False
-            
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            print("❌ npm/npx nie dostępne")
-            return False
+        return self.start_tunnel(['localtunnel'])
     
     def start_cloudflared(self):
         """Alternatywa - cloudflared tunnel"""
-        print(f"🔄 Próbuję cloudflared jako alternatywę...")
-        
+        return self.start_tunnel(['cloudflared'])
+    
+    def watch_output(self, provider, stream, events):
+        """
+        Czyta wyjście procesu tunelu linia po linii i zgłasza URL, gdy tylko się pojawi.
+        Czyta do końca, żeby zapełniony bufor potoku nie zatrzymał procesu.
+        """
+        announced = False
+        for line in iter(stream.readline, ''):
+            match = URL_PATTERNS[provider].search(line)
+            if match and not announced:
+                announced = True
+                url = match.group(1).replace('http://', 'https://')
+                events.put(('url', provider, url))
+        stream.close()
+    
+    def watch_ngrok_api(self, process, events):
+        """Starsze wersje ngrok nie logują URL na stdout - wtedy odpytujemy lokalne API"""
+        while process.poll() is None:
+            url = self.get_ngrok_url()
+            if url:
+                events.put(('url', 'ngrok', url))
+                return
+            time.sleep(POLL_INTERVAL)
+    
+    def watch_exit(self, provider, process, events):
+        process.wait()
+        events.put(('exit', provider, process.returncode))
+    
+    def check_health(self, provider, url, events, deadline, stopped):
+        """Tunel jest gotowy, gdy przez publiczny URL odpowiada nasz serwer"""
+        while time.monotonic() < deadline and not stopped.is_set():
+            try:
+                # Nagłówek pomija stronę przypominajki localtunnel
+                response = requests.get(f"{url}{HEALTH_PATH}", timeout=5,
+                                        headers={'bypass-tunnel-reminder': '1'})
+                if response.status_code == 200:
+                    events.put(('healthy', provider, url))
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(POLL_INTERVAL)
+    
+    def launch(self, provider, events):
+        """Uruchamia proces tunelu i wątki śledzące jego wyjście"""
+        print(f"🚀 Uruchamiam {provider} na porcie {self.port}...")
+        process = subprocess.Popen(
+            self.provider_command(provider),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            # Własna grupa procesów - npx uruchamia localtunnel jako proces potomny, który też trzeba zatrzymać
+            start_new_session=(os.name != 'nt')
+        )
+        # cloudflared wypisuje URL w stderr, pozostałe w stdout
+        for stream in (process.stdout, process.stderr):
+            threading.Thread(target=self.watch_output, args=(provider, stream, events), daemon=True).start()
+        if provider == 'ngrok':
+            threading.Thread(target=self.watch_ngrok_api, args=(process, events), daemon=True).start()
+        threading.Thread(target=self.watch_exit, args=(provider, process, events), daemon=True).start()
+        return process
+    
+    def terminate(self, process):
+        """Zatrzymuje proces tunelu razem z jego procesami potomnymi"""
+        if process.poll() is not None:
+            return
+        if os.name == 'nt':
+            process.terminate()
+            return
         try:
-            # Sprawdź czy jest cloudflared
-            subprocess.run(['cloudflared', '--version'], capture_output=True, check=True)
-            
-            print(f"🚀 Uruchamiam cloudflared na porcie {self.port}...")
-            
-            # Uruchom cloudflared
-            self.tunnel_process = subprocess.Popen(
-                ['cloudflared', 'tunnel', '--url', f'http://localhost:{self.port}'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Szukaj URL w output
-            time.sleep(5)
-            
-            # Cloudflared wypisuje URL w stderr
-            for _ in range(10):
-                line = self.tunnel_process.stderr.readline()
-                if 'https://' in line and 'trycloudflare.com' in line:
-                    # Wyciągnij URL
-                    self.tunnel_url = line.split('https://')[1].split()[0]
-                    self.tunnel_url = f"https://{self.tunnel_url}"
-                    print(f"✅ Cloudflared uruchomiony: {self.tunnel_url}")
-                    return True
-            
-            return False
-            
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            print("❌ cloudflared nie dostępne")
-            return False
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
     
-    def start_tunnel(self):
-        """Próbuje uruchomić tunnel używając dostępnych opcji"""
+    def start_tunnel(self, providers=None, timeout=STARTUP_TIMEOUT):
+        """
+        Uruchamia równolegle wszystkie dostępne tunele i zostawia pierwszy, który przekazuje ruch
+        do serwera. Kończy się w chwili, gdy tunel jest gotowy, zamiast czekać stały czas.
+        """
         print("🌐 Uruchamiam HTTPS tunnel...")
+        start_time = time.monotonic()
+        deadline = start_time + timeout
+        events = queue.Queue()
+        stopped = threading.Event()
+        processes = {}
         
-        # Próbuj ngrok
-        if self.start_ngrok():
-            return True
+        for provider in providers or PROVIDERS:
+            if not self.is_available(provider):
+                print(f"❌ {provider} nie jest dostępny")
+                continue
+            try:
+                processes[provider] = self.launch(provider, events)
+            except OSError as e:
+                print(f"❌ Błąd uruchamiania {provider}: {e}")
         
-        # Próbuj localtunnel
-        if self.start_localtunnel():
-            return True
+        running = set(processes)
+        announced = set()
+        winner = None
+        while running and winner is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⏱️ Żaden tunel nie był gotowy w ciągu {timeout} s")
+                break
+            try:
+                kind, provider, value = events.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            
+            if kind == 'url' and provider not in announced:
+                announced.add(provider)
+                print(f"🔗 {provider} podał URL po {time.monotonic() - start_time:.1f} s: {value}")
+                threading.Thread(target=self.check_health, args=(provider, value, events, deadline, stopped),
+                                 daemon=True).start()
+            elif kind == 'healthy':
+                winner = (provider, value)
+            elif kind == 'exit':
+                running.discard(provider)
+                print(f"❌ {provider} zakończył się (kod {value})")
+        
+        stopped.set()
+        for provider, process in processes.items():
+            if winner is None or provider != winner[0]:
+                self.terminate(process)
         
-        # Próbuj cloudflared
-        if self.start_cloudflared():
+        if winner:
+            self.provider, self.tunnel_url = winner
+            self.tunnel_process = processes[self.provider]
+            self.startup_time = time.monotonic() - start_time
+            print(f"✅ {self.provider} gotowy po {self.startup_time:.1f} s: {self.tunnel_url}")
             return True
         
-        print("❌ Nie udało się uruchomić żadnego tunnela")
+        print("❌ Nie udało się uruchomić żadnego tunela")
         print("📋 Opcje instalacji:")
         print("1. ngrok: https://ngrok.com/download")
         print("2. npm/npx: https://nodejs.org/")
@@ -197,7 +258,7 @@ class TunnelManager:
     def stop_tunnel(self):
         """Zatrzymuje tunnel"""
         if self.tunnel_process:
-            self.tunnel_process.terminate()
+            self.terminate(self.tunnel_process)
             print("🛑 Tunnel zatrzymany")
 
 def main():
@@ -1,5 +1,8 @@
 import os
+import re
 import json
+import time
+import threading
 import requests
 import fitz  # PyMuPDF
 from PIL import Image
@@ -7,10 +10,15 @@ import io
 from openai import OpenAI
 from dotenv import load_dotenv
 import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Load environment variables
 load_dotenv('../.env')
 
+# Questions answered at the same time (bounded to stay under the OpenAI rate limits)
+ANSWER_WORKERS = 4
+MAX_ITERATIONS = 5
+
 class NotesAnalyzer:
     def __init__(self):
         self.personal_api_key = os.getenv('CENTRALA_API_KEY')
@@ -30,6 +38,10 @@ class NotesAnalyzer:
         self.questions_url = f"{self.centrala_url}/data/{self.personal_api_key}/notes.json"
         self.submit_url = f"{self.centrala_url}/report"
         
+        # Tokens spent on answering questions, updated from worker threads
+        self.usage_lock = threading.Lock()
+        self.token_usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        
     def download_pdf(self):
         """Download PDF from the URL"""
         print("Downloading PDF...")
@@ -272,6 +284,10 @@ ODPOWIEDŹ:
             )
             
             answer = response.choices[0].message.content.strip()
+            if response.usage:
+                with self.usage_lock:
+                    self.token_usage["prompt_tokens"] += response.usage.prompt_tokens
+                    self.token_usage["completion_tokens"] += response.usage.completion_tokens
             print(f"Answer: {answer}")
             return answer
             
@@ -279,6 +295,21 @@ ODPOWIEDŹ:
             print(f"Error answering question: {e}")
             return "Error"
     
+    def answer_questions(self, questions, question_ids, context, question_attempts):
+        """Answer the given questions concurrently; returns {question_id: answer}"""
+        answers = {}
+        with ThreadPoolExecutor(max_workers=min(ANSWER_WORKERS, len(question_ids))) as executor:
+            futures = {
+                executor.submit(self.answer_question, questions[question_id], context,
+                                question_attempts.get(question_id, "")): question_id
+                for question_id in question_ids
+            }
+            for future in as_completed(futures):
+                question_id = futures[future]
+                answers[question_id] = future.result()
+                print(f"Question {question_id} answered: {answers[question_id]}")
+        return answers
+    
     def submit_answers(self, answers):
         """Submit answers to the API"""
         print("Submitting answers...")
@@ -327,28 +358,34 @@ ODPOWIEDŹ:
         # Track attempts for each question
         question_attempts = {}
         
-        max_iterations = 5
-        for iteration in range(max_iterations):
+        # Per-question state: the latest answer, and whether Centrala already accepted it.
+        # Centrala checks answers in question order and reports the first wrong one, so every
+        # question before the reported one is accepted and frozen; only failing questions are re-asked.
+        answers = {}
+        accepted = set()
+        to_ask = sorted(questions.keys())
+        result = {}
+        
+        for iteration in range(MAX_ITERATIONS):
             print(f"\n=== ITERATION {iteration + 1} ===")
+            print(f"Asking {len(to_ask)} question(s): {to_ask}, frozen: {sorted(accepted)}")
             
-            # Answer questions
-            answers = {}
-            for question_id, question_text in questions.items():
-                previous_attempts = question_attempts.get(question_id, "")
-                if previous_attempts:
-                    print(f"Previous attempts for question {question_id}: {previous_attempts}")
-                answer = self.answer_question(question_text, context, previous_attempts)
-                answers[question_id] = answer
+            # Answer only the questions that are not settled, all at once
+            started = time.perf_counter()
+            tokens_before = sum(self.token_usage.values())
+            answers.update(self.answer_questions(questions, to_ask, context, question_attempts))
+            print(f"Answered {len(to_ask)} question(s) in {time.perf_counter() - started:.1f}s, "
+                  f"{sum(self.token_usage.values()) - tokens_before} tokens")
             
             print(f"All answers for iteration {iteration + 1}: {answers}")
             
-            # Submit answers
+            # Submit answers as soon as all of them are ready
             result = self.submit_answers(answers)
-            print(f"Submission result: {result}")
             
             # Check if successful (code 0 or positive message)
             if result.get('code') == 0:
                 print("SUCCESS! All answers correct.")
+                print(f"Token usage: {self.token_usage}")
                 return result
             
             # Parse error message and extract which question failed
@@ -364,9 +401,6 @@ ODPOWIEDŹ:
             failed_question = None
             sent_answer = ""
             
-            # Try to extract question number from various error message formats
-            import re
-            
             # Format: "Answer for question 01 is incorrect"
             question_match = re.search(r'question (\d+)', error_message)
             if question_match:
@@ -379,7 +413,7 @@ ODPOWIEDŹ:
                 sent_answer = debug_info.strip()
             
             # If we identified a failed question, record the attempt
-            if failed_question:
+            if failed_question in questions:
                 attempt_record = f"""
 POPRZEDNIA BŁĘDNA PRÓBA:
 - Pytanie: {questions.get(failed_question, 'Unknown')}
@@ -394,13 +428,17 @@ POPRZEDNIA BŁĘDNA PRÓBA:
                     question_attempts[failed_question] = attempt_record
                 
                 print(f"Recorded failed attempt for question {failed_question}")
+                
+                # Questions checked before the failed one are correct - keep their answers
+                accepted.update(q_id for q_id in questions if q_id < failed_question)
+                to_ask = [failed_question]
             else:
                 # If we couldn't parse the specific question, it might be a general error
-                # Try to find patterns or assume it's question 01 if unclear
                 print("Could not identify specific failed question, assuming general error")
                 
-                # Add error info to all questions that might be wrong
-                for q_id in questions.keys():
+                # Add error info to all questions that are not accepted yet and ask them again
+                to_ask = sorted(q_id for q_id in questions if q_id not in accepted)
+                for q_id in to_ask:
                     attempt_record = f"""
 POPRZEDNIA OGÓLNA BŁĘDNA PRÓBA:
 - Błąd: {error_message}
@@ -414,10 +452,11 @@ POPRZEDNIA OGÓLNA BŁĘDNA PRÓBA:
                         question_attempts[q_id] = attempt_record
             
             # If last iteration, break
-            if iteration == max_iterations - 1:
+            if iteration == MAX_ITERATIONS - 1:
                 print("Maximum iterations reached.")
                 break
         
+        print(f"Token usage: {self.token_usage}")
         return result
     
     def run(self):
@@ -1,8 +1,17 @@
 import os
+import sys
 import base64
 from openai import OpenAI
 from dotenv import load_dotenv
 
+# Shared image cache/preprocessing lives in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+try:
+    from image_prep import ImagePreprocessor, prompt_key
+except ImportError:
+    # Without Pillow the maps are sent as full-size PNGs on every run
+    ImagePreprocessor = None
+
 # Load environment variables from .env file (if you have one)
 load_dotenv()
 
@@ -81,15 +90,23 @@ def analyze_maps(map_folder):
         {"type": "text", "text": prompt}
     ]
     
+    images = ImagePreprocessor() if ImagePreprocessor else None
+    map_keys = []
+    
     # Add each map image to the content
     for i, map_file in enumerate(map_files, 1):
         try:
-            base64_image = encode_image(map_file)
+            if images:
+                # Downscaled to the resolution the API uses for detail=high anyway
+                image_url, map_key = images.data_url(map_file, "map")
+                map_keys.append(map_key)
+            else:
+                image_url = f"data:image/png;base64,{encode_image(map_file)}"
             content.append(
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/png;base64,{base64_image}",
+                        "url": image_url,
                         "detail": "high"
                     }
                 }
@@ -98,17 +115,23 @@ def analyze_maps(map_folder):
         except Exception as e:
             print(f"Error processing map {i}: {e}")
     
-    # Call the OpenAI API
-    try:
+    def request_analysis():
         print("Sending request to OpenAI API...")
         response = client.chat.completions.create(
             model="gpt-4o",
             messages=[{"role": "user", "content": content}],
             max_tokens=3000  # Increased token limit for more detailed analysis
         )
+        return response.choices[0].message.content
+    
+    # Call the OpenAI API (the same maps with the same prompt are answered from the cache)
+    try:
+        if images:
+            result = images.memoize(["maps-v1", prompt_key(prompt, "gpt-4o"), *sorted(map_keys)], request_analysis)
+        else:
+            result = request_analysis()
         
-        # Extract and print the response
-        result = response.choices[0].message.content
+        # Print the response
         print("\n" + "="*50)
         print("ANALYSIS RESULT:")
         print("="*50)